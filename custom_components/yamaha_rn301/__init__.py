@@ -1,7 +1,20 @@
+import logging
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import homeassistant.helpers.config_validation as cv
-from .const import DOMAIN, DATA_YAMAHA
+from .const import DOMAIN, DATA_YAMAHA, DATA_STATE_VIEW, CONF_DEVICE, CONF_UPNP_EVENTS
+from .config_flow import unique_id_for
+from .coordinator import YamahaCoordinator
+from .receiver import MAIN_ZONE, ZONE_TAGS, YamahaReceiver, config_from_dict
+from .services import async_setup_services
+from .storage import YamahaStore
+from .view import YamahaStateView
+
+_LOGGER = logging.getLogger(__name__)
 
 # Since this integration supports both config entries and YAML configuration,
 # we need to define a CONFIG_SCHEMA
@@ -15,19 +28,84 @@ def setup(hass, config):
 
     return True
 
+def create_coordinator(hass: HomeAssistant, host, upnp_events=False, store=None,
+                       device_config=None) -> YamahaCoordinator:
+    """Create the shared poll for a receiver; no device I/O happens here"""
+    receiver = YamahaReceiver(async_get_clientsession(hass), host)
+    return YamahaCoordinator(hass, receiver, upnp_events, store, device_config)
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up Yamaha R-N301 receiver from a config entry."""
+    store = YamahaStore(hass, entry.entry_id)
+    await store.async_load()
+    device = entry.data.get(CONF_DEVICE)
+    coordinator = create_coordinator(
+        hass, entry.data[CONF_HOST], entry.options.get(CONF_UPNP_EVENTS, False), store,
+        config_from_dict(device) if device else None)
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
+
+    # Entries and entities created before System_ID was used are keyed by host;
+    # re-key them once the serial is known, from the cache now or the device later
+    _async_migrate_unique_ids(hass, entry, coordinator)
+    entry.async_on_unload(coordinator.async_add_config_listener(
+        lambda: _async_migrate_unique_ids(hass, entry, coordinator)))
+
+    if not hass.data.get(DATA_STATE_VIEW):
+        # One scrape returns every receiver, for monitoring
+        hass.http.register_view(YamahaStateView())
+        hass.data[DATA_STATE_VIEW] = True
+
+    async_setup_services(hass)
     await hass.config_entries.async_forward_entry_setups(entry, ["media_player"])
-    
+
+    # Entities exist now with restored state; talk to the receiver without blocking startup
+    entry.async_create_background_task(
+        hass, coordinator.async_initialize(), f"{DOMAIN} initialize {entry.data[CONF_HOST]}")
+
     # Listen for config entry updates
+    settings = (dict(entry.data), dict(entry.options))
+
+    async def update_listener(hass: HomeAssistant, entry: ConfigEntry):
+        """Reload for changed data or options; a unique ID migration needs none"""
+        if (dict(entry.data), dict(entry.options)) != settings:
+            await hass.config_entries.async_reload(entry.entry_id)
+
     entry.async_on_unload(entry.add_update_listener(update_listener))
-    
+
     return True
 
-async def update_listener(hass: HomeAssistant, entry: ConfigEntry):
-    """Handle config entry update."""
-    await hass.config_entries.async_reload(entry.entry_id)
+@callback
+def _async_migrate_unique_ids(hass: HomeAssistant, entry: ConfigEntry, coordinator: YamahaCoordinator):
+    """Key the entry and its entities by the receiver's System_ID once it is known"""
+    receiver = coordinator.receiver
+    if not receiver.config.system_id:
+        return
+    registry = er.async_get(hass)
+    for entity in er.async_entries_for_config_entry(registry, entry.entry_id):
+        zone = next((zone for zone in ZONE_TAGS[1:] if entity.unique_id.endswith(f"_{zone.lower()}")), MAIN_ZONE)
+        unique_id = coordinator.zone_unique_id(zone)
+        if entity.unique_id != unique_id and registry.async_get_entity_id(entity.domain, DOMAIN, unique_id) is None:
+            # Same entity_id, name and customisations under the new key
+            registry.async_update_entity(entity.entity_id, new_unique_id=unique_id)
+    unique_id = unique_id_for(receiver)
+    if entry.unique_id == unique_id:
+        return
+    for other in hass.config_entries.async_entries(DOMAIN):
+        if other.entry_id != entry.entry_id and other.unique_id == unique_id:
+            _LOGGER.warning("%s is configured twice (%s and %s); remove one of the entries",
+                            receiver.host, entry.title, other.title)
+            return
+    _LOGGER.debug("Migrating unique ID of %s from %s to %s", receiver.host, entry.unique_id, unique_id)
+    hass.config_entries.async_update_entry(entry, unique_id=unique_id)
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Handle removal of receiver entry."""
-    return await hass.config_entries.async_unload_platforms(entry, ["media_player"])
\ No newline at end of file
+    unloaded = await hass.config_entries.async_unload_platforms(entry, ["media_player"])
+    if unloaded:
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.async_stop()
+    return unloaded
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Delete the persisted cache of a removed receiver."""
+    await YamahaStore(hass, entry.entry_id).async_remove()
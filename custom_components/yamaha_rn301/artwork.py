@@ -0,0 +1,211 @@
+"""Album art and station logo cache in front of the receivers' embedded web server."""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import (
+    ARTWORK_DISK_BYTES,
+    ARTWORK_MAX_AGE,
+    ARTWORK_MEMORY_BYTES,
+    ARTWORK_THUMBNAIL_SIZE,
+    DATA_ARTWORK,
+    DEFAULT_TIMEOUT,
+    DOMAIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+Image = Tuple[bytes, str]   # (content, content type)
+
+
+def _thumbnail(content: bytes, content_type: str) -> Optional[Image]:
+    """Downscale to a JPEG thumbnail; Pillow is optional, without it images pass through"""
+    try:
+        from PIL import Image as PILImage
+    except ImportError:
+        return (content, content_type) if content_type.startswith("image/") else None
+    try:
+        with PILImage.open(io.BytesIO(content)) as image:
+            image.thumbnail((ARTWORK_THUMBNAIL_SIZE, ARTWORK_THUMBNAIL_SIZE))
+            output = io.BytesIO()
+            image.convert("RGB").save(output, "JPEG", quality=85)
+    except (OSError, ValueError) as e:
+        _LOGGER.debug("Cannot decode artwork (%s): %s", content_type, e)
+        return None
+    return output.getvalue(), "image/jpeg"
+
+
+class ArtworkCache:
+    """Two-level cache of thumbnails keyed by art URL and the receiver's art ID
+
+    Receivers reuse one URL for every track (e.g. /YamahaRemoteControl/
+    AlbumART/AlbumART.ymf) and change only the Album_ART ID, so both form
+    the key. A memory LRU serves repeat dashboard views; the disk copy,
+    revalidated with ETag/Last-Modified once older than ARTWORK_MAX_AGE,
+    survives restarts. Images are downscaled once, when fetched. Concurrent
+    requests for the same image share one fetch.
+    """
+
+    def __init__(self, hass: HomeAssistant, directory: str,
+                 memory_bytes: int = ARTWORK_MEMORY_BYTES, disk_bytes: int = ARTWORK_DISK_BYTES):
+        self._hass = hass
+        self._session = async_get_clientsession(hass)
+        self._directory = directory
+        self._memory: "OrderedDict[str, Image]" = OrderedDict()
+        self._memory_bytes = memory_bytes
+        self._memory_used = 0
+        self._disk_bytes = disk_bytes
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    async def async_get(self, url: str, art_id: Optional[str] = None) -> Optional[Image]:
+        key = f"{url}#{art_id}" if art_id else url
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = self._hass.loop.create_future()
+        self._pending[key] = future
+        try:
+            image = await self._async_load(key, url)
+            if image is not None:
+                # A failed fetch is retried on the next request
+                self._remember(key, image)
+            future.set_result(image)
+            return image
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't leave "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    def _remember(self, key: str, image: Image) -> None:
+        self._memory[key] = image
+        self._memory_used += len(image[0])
+        while self._memory_used > self._memory_bytes and len(self._memory) > 1:
+            _key, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted[0])
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self._directory, name + ".img"), os.path.join(self._directory, name + ".json")
+
+    async def _async_load(self, key: str, url: str) -> Optional[Image]:
+        image_path, meta_path = self._paths(key)
+        cached = await self._hass.async_add_executor_job(self._read_disk, image_path, meta_path)
+        headers = {}
+        if cached is not None:
+            image, meta = cached
+            if time.time() - meta.get("checked", 0) < ARTWORK_MAX_AGE:
+                self.hits += 1
+                return image
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        self.misses += 1
+        try:
+            async with self._session.get(url, headers=headers,
+                                         timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)) as resp:
+                if resp.status == 304 and cached is not None:
+                    self.revalidated += 1
+                    image, meta = cached
+                    meta["checked"] = time.time()
+                    await self._hass.async_add_executor_job(self._write_meta, meta_path, meta)
+                    return image
+                if resp.status != 200:
+                    _LOGGER.debug("Artwork %s: HTTP %d", url, resp.status)
+                    return cached[0] if cached is not None else None
+                content = await resp.read()
+                content_type = resp.headers.get("Content-Type", "application/octet-stream")
+                meta = {
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "checked": time.time(),
+                }
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            _LOGGER.debug("Artwork %s unavailable: %s", url, e)
+            # Serve the old copy rather than nothing while the receiver is busy
+            return cached[0] if cached is not None else None
+        return await self._hass.async_add_executor_job(self._store, image_path, meta_path, content, content_type, meta)
+
+    @staticmethod
+    def _read_disk(image_path: str, meta_path: str):
+        try:
+            with open(meta_path, encoding="utf-8") as file:
+                meta = json.load(file)
+            with open(image_path, "rb") as file:
+                return (file.read(), meta["content_type"]), meta
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: dict) -> None:
+        with open(meta_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+
+    def _store(self, image_path: str, meta_path: str, content: bytes, content_type: str,
+               meta: dict) -> Optional[Image]:
+        """Thumbnail and write to disk (executor)"""
+        image = _thumbnail(content, content_type)
+        if image is None:
+            return None
+        os.makedirs(self._directory, exist_ok=True)
+        with open(image_path, "wb") as file:
+            file.write(image[0])
+        self._write_meta(meta_path, {**meta, "content_type": image[1]})
+        self._prune_disk()
+        return image
+
+    def _prune_disk(self) -> None:
+        """Delete the least recently written images beyond the disk budget"""
+        entries = []
+        for entry in os.scandir(self._directory):
+            if entry.name.endswith(".img"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= self._disk_bytes:
+                break
+            for stale in (path, path[:-len(".img")] + ".json"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+
+    def as_dict(self) -> dict:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+        }
+
+
+def async_get_artwork_cache(hass: HomeAssistant) -> ArtworkCache:
+    """The cache shared by all receivers"""
+    cache = hass.data.get(DATA_ARTWORK)
+    if cache is None:
+        cache = hass.data[DATA_ARTWORK] = ArtworkCache(hass, hass.config.path(".cache", DOMAIN, "artwork"))
+    return cache
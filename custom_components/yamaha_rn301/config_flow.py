@@ -1,40 +1,71 @@
 import voluptuous as vol
-import aiohttp
-import asyncio
 import logging
+from typing import Dict, Optional
+from urllib.parse import urlparse
 from homeassistant import config_entries
 from homeassistant.core import callback
 from homeassistant.const import CONF_HOST, CONF_NAME
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from .const import DOMAIN, DEFAULT_NAME, DEFAULT_TIMEOUT
+from .const import DOMAIN, DEFAULT_NAME, CONF_DEVICE, CONF_NETWORK, CONF_UPNP_EVENTS
+from .discovery import async_discover, local_network
+from .receiver import YamahaReceiver, config_as_dict
 
 _LOGGER = logging.getLogger(__name__)
 
+async def async_probe_receiver(hass, host) -> Optional[YamahaReceiver]:
+    """Validate a host and capture its configuration in one probe; None if unreachable"""
+    receiver = YamahaReceiver(async_get_clientsession(hass), host)
+    if not await receiver.async_probe():
+        return None
+    return receiver
+
+def entry_data(receiver: YamahaReceiver, name) -> dict:
+    """Config entry data for a probed receiver"""
+    return {
+        CONF_HOST: receiver.host,
+        CONF_NAME: name,
+        CONF_DEVICE: config_as_dict(receiver.config) if receiver.config_loaded else None,
+    }
+
+def unique_id_for(receiver: YamahaReceiver) -> str:
+    """Device serial when the receiver reports one, else the host as before"""
+    if receiver.config.system_id:
+        return f"rn301_{receiver.config.system_id}"
+    return f"rn301_{receiver.host}"
+
 class YamahaRN301ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Yamaha R-N301 configuration flow class."""
 
     VERSION = 1
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_POLL
 
+    def __init__(self):
+        self._receiver: Optional[YamahaReceiver] = None
+        self._discovered: Dict[str, str] = {}
+
+    async def _async_create_from(self, receiver: YamahaReceiver, name):
+        # A known serial at a new address just moves the existing entry
+        await self.async_set_unique_id(unique_id_for(receiver))
+        self._abort_if_unique_id_configured(updates={CONF_HOST: receiver.host})
+        return self.async_create_entry(title=name, data=entry_data(receiver, name))
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step of the configuration flow."""
         errors = {}
 
         if user_input is not None:
-            host = user_input[CONF_HOST]
+            host = user_input.get(CONF_HOST, "").strip()
+            if not host:
+                # No address given: look for receivers on the network instead
+                return await self.async_step_scan()
+            # Entries made before System_ID keys are only recognisable by host
+            self._async_abort_entries_match({CONF_HOST: host})
             
             # Test connection to the receiver
             try:
-                if await self._test_connection(host, self.hass):
-                    # Create unique ID
-                    await self.async_set_unique_id(f"rn301_{host}")
-                    self._abort_if_unique_id_configured()
-                    
-                    name = user_input.get(CONF_NAME, DEFAULT_NAME)
-                    return self.async_create_entry(
-                        title=name,
-                        data={CONF_HOST: host, CONF_NAME: name}
-                    )
+                receiver = await async_probe_receiver(self.hass, host)
+                if receiver is not None:
+                    return await self._async_create_from(receiver, user_input.get(CONF_NAME, DEFAULT_NAME))
                 else:
                     errors["base"] = "cannot_connect"
             except Exception:
@@ -42,7 +73,7 @@ class YamahaRN301ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors["base"] = "unknown"
 
         data_schema = vol.Schema({
-            vol.Required(CONF_HOST): str,
+            vol.Optional(CONF_HOST, default=""): str,
             vol.Optional(CONF_NAME, default=DEFAULT_NAME): str,
         })
 
@@ -50,26 +81,88 @@ class YamahaRN301ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=data_schema, errors=errors
         )
 
+    async def async_step_scan(self, user_input=None):
+        """Search by SSDP and probe every address of a subnet in parallel."""
+        errors = {}
+
+        if user_input is not None:
+            configured = {entry.data.get(CONF_HOST) for entry in self._async_current_entries()}
+            try:
+                found = await async_discover(async_get_clientsession(self.hass), user_input.get(CONF_NETWORK))
+            except ValueError:
+                errors[CONF_NETWORK] = "invalid_network"
+            else:
+                self._discovered = {
+                    receiver.host: f"{receiver.model} ({receiver.host})"
+                    for receiver in found if receiver.host not in configured
+                }
+                if self._discovered:
+                    return await self.async_step_pick()
+                errors["base"] = "no_devices_found"
+
+        return self.async_show_form(
+            step_id="scan",
+            data_schema=vol.Schema({
+                vol.Optional(CONF_NETWORK, default=local_network() or ""): str,
+            }),
+            errors=errors
+        )
+
+    async def async_step_pick(self, user_input=None):
+        """Choose one of the receivers found by the scan."""
+        errors = {}
+
+        if user_input is not None and CONF_HOST in user_input:
+            receiver = await async_probe_receiver(self.hass, user_input[CONF_HOST])
+            if receiver is not None:
+                return await self._async_create_from(receiver, user_input.get(CONF_NAME, DEFAULT_NAME))
+            errors["base"] = "cannot_connect"
+
+        return self.async_show_form(
+            step_id="pick",
+            data_schema=vol.Schema({
+                vol.Required(CONF_HOST): vol.In(self._discovered),
+                vol.Optional(CONF_NAME, default=DEFAULT_NAME): str,
+            }),
+            errors=errors
+        )
+
+    async def async_step_ssdp(self, discovery_info):
+        """Handle a MediaRenderer announced by Home Assistant's SSDP discovery."""
+        host = urlparse(discovery_info.ssdp_location).hostname
+        if not host:
+            return self.async_abort(reason="cannot_connect")
+        self._async_abort_entries_match({CONF_HOST: host})
+        receiver = await async_probe_receiver(self.hass, host)
+        if receiver is None:
+            # Another Yamaha renderer without the YamahaRemoteControl API
+            return self.async_abort(reason="not_supported")
+        await self.async_set_unique_id(unique_id_for(receiver))
+        self._abort_if_unique_id_configured(updates={CONF_HOST: host})
+        self._receiver = receiver
+        self.context["title_placeholders"] = {"name": f"{receiver.config.model} ({host})"}
+        return await self.async_step_confirm()
+
+    async def async_step_confirm(self, user_input=None):
+        """Confirm adding a receiver found by SSDP."""
+        if user_input is not None:
+            name = user_input.get(CONF_NAME, DEFAULT_NAME)
+            return self.async_create_entry(title=name, data=entry_data(self._receiver, name))
+
+        return self.async_show_form(
+            step_id="confirm",
+            data_schema=vol.Schema({
+                vol.Optional(CONF_NAME, default=DEFAULT_NAME): str,
+            }),
+            description_placeholders={"host": self._receiver.host},
+        )
+
     @staticmethod
     @callback
     def async_get_options_flow(config_entry):
         """Return the options flow for this config entry."""
         return OptionsFlowHandler()
 
-    async def _test_connection(self, host, hass):
-        """Test connection to Yamaha receiver."""
-        try:
-            url = f"http://{host}/YamahaRemoteControl/ctrl"
-            data = '<?xml version="1.0" encoding="utf-8"?><YAMAHA_AV cmd="GET"><Main_Zone><Basic_Status>GetParam</Basic_Status></Main_Zone></YAMAHA_AV>'
-            
-            session = async_get_clientsession(hass)
-            timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
-            
-            async with session.post(url, data=data, timeout=timeout) as response:
-                return response.status == 200
-        except Exception:
-            return False
-
 class OptionsFlowHandler(config_entries.OptionsFlow):
     """Handle integration options flow."""
 
@@ -83,12 +176,13 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 host = user_input[CONF_HOST]
                 if host != self.config_entry.data.get(CONF_HOST):
                     # Test new host
-                    if not await self._test_connection(host):
+                    receiver = await async_probe_receiver(self.hass, host)
+                    if receiver is None:
                         errors["base"] = "cannot_connect"
                     else:
-                        # Update the config entry with new host
+                        # Update the config entry with new host and its capabilities
                         new_data = dict(self.config_entry.data)
-                        new_data[CONF_HOST] = host
+                        new_data.update(entry_data(receiver, new_data.get(CONF_NAME, DEFAULT_NAME)))
                         # Also update name if changed
                         if CONF_NAME in user_input:
                             new_data[CONF_NAME] = user_input[CONF_NAME]
@@ -97,30 +191,21 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                         )
             
             if not errors:
-                return self.async_create_entry(title="", data={})
+                return self.async_create_entry(
+                    title="",
+                    data={CONF_UPNP_EVENTS: user_input.get(CONF_UPNP_EVENTS, False)}
+                )
 
         current_host = self.config_entry.data.get(CONF_HOST, "")
         current_name = self.config_entry.data.get(CONF_NAME, DEFAULT_NAME)
+        current_upnp = self.config_entry.options.get(CONF_UPNP_EVENTS, False)
         
         return self.async_show_form(
             step_id="init",
             data_schema=vol.Schema({
                 vol.Required(CONF_HOST, default=current_host): str,
                 vol.Required(CONF_NAME, default=current_name): str,
+                vol.Optional(CONF_UPNP_EVENTS, default=current_upnp): bool,
             }),
             errors=errors
         )
-    
-    async def _test_connection(self, host):
-        """Test connection to Yamaha receiver."""
-        try:
-            url = f"http://{host}/YamahaRemoteControl/ctrl"
-            data = '<?xml version="1.0" encoding="utf-8"?><YAMAHA_AV cmd="GET"><Main_Zone><Basic_Status>GetParam</Basic_Status></Main_Zone></YAMAHA_AV>'
-            
-            session = async_get_clientsession(self.hass)
-            timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
-            
-            async with session.post(url, data=data, timeout=timeout) as response:
-                return response.status == 200
-        except Exception:
-            return False
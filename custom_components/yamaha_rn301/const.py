@@ -1,5 +1,112 @@
 # const.py
+from datetime import timedelta
+
 DOMAIN = "yamaha_rn301"
 DATA_YAMAHA = 'yamaha_data'
 DEFAULT_NAME = 'Yamaha R-N301'
 DEFAULT_TIMEOUT = 5
+DEFAULT_SCAN_INTERVAL = timedelta(seconds=10)
+BASE_URL = 'http://{0}/YamahaRemoteControl/ctrl'
+
+# Display name -> Input_Sel value of the R-N301 inputs; used as the input
+# table when a receiver does not answer the Input_Sel_Item query
+SOURCE_MAPPING = {
+    'Optical': 'OPTICAL',
+    'CD': 'CD',
+    'Spotify': 'Spotify',
+    'Line 1': 'LINE1',
+    'Line 2': 'LINE2',
+    'Line 3': 'LINE3',
+    'Net Radio': 'NET RADIO',
+    'Server': 'SERVER',
+    'Tuner': 'TUNER'
+}
+
+CONF_UPNP_EVENTS = 'upnp_events'
+# Entry data key holding the configuration captured by the config flow probe
+CONF_DEVICE = 'device'
+UPNP_DESCRIPTION_URL = 'http://{0}:8080/MediaRenderer/desc.xml'
+UPNP_SUBSCRIPTION_TIMEOUT = 300
+UPNP_RESUBSCRIBE_INTERVAL = 60
+UPNP_RESUBSCRIBE_MAX_INTERVAL = 3600
+# While events are flowing, a full poll still runs this often as a safety net
+UPNP_SAFETY_POLL_INTERVAL = 300
+UPNP_EVENT_DEBOUNCE = 0.2
+
+STORAGE_VERSION = 1
+# Seconds to coalesce store writes; the last state is saved at most this often
+STORAGE_SAVE_DELAY = 30
+
+# Discovery: seconds to collect SSDP answers, per-host probe timeout and
+# parallel probes; a /24 sweep takes about 254 / 64 * SCAN_TIMEOUT at worst
+SSDP_SEARCH_TIMEOUT = 3
+SCAN_TIMEOUT = 1.5
+SCAN_CONCURRENCY = 64
+SCAN_MAX_HOSTS = 1024
+CONF_NETWORK = 'network'
+
+# Command macros: how long and how often to poll for the receiver to settle
+# after power-on, input changes and list selections
+MACRO_READY_TIMEOUT = 15
+MACRO_READY_INTERVAL = 0.25
+# Power-on is polled tighter since every switch from Standby waits on it
+WAKE_POLL_INTERVAL = 0.1
+# List_Info Menu_Status stays Busy while a menu loads
+LIST_READY_TIMEOUT = 5
+LIST_READY_INTERVAL = 0.1
+# NET RADIO takes a few seconds to connect before Play_Info names the station
+PLAY_VERIFY_TIMEOUT = 10
+PLAY_VERIFY_INTERVAL = 0.5
+
+# hass.data key marking the bulk state view as registered
+DATA_STATE_VIEW = f"{DOMAIN}_state_view"
+STATE_VIEW_URL = f"/api/{DOMAIN}/state"
+
+# Responses of at least this many characters are parsed in the executor
+# (a List_Info page is ~2 kB, Basic_Status ~1 kB); smaller ones inline
+EXECUTOR_PARSE_THRESHOLD = 32768
+# BrowseMedia trees with at least this many children are built in the executor
+EXECUTOR_ITEMS_THRESHOLD = 200
+
+# hass.data key of {entity_id: zone entity}, the targets of the broadcast service
+DATA_ZONE_ENTITIES = f"{DOMAIN}_zones"
+BROADCAST_MAX_PARALLEL = 16
+BROADCAST_TIMEOUT = 30
+
+# Album art / station logo cache shared by all receivers (hass.data key)
+DATA_ARTWORK = f"{DOMAIN}_artwork"
+ARTWORK_MEMORY_BYTES = 8 * 1024 * 1024
+ARTWORK_DISK_BYTES = 64 * 1024 * 1024
+# Disk copies older than this are revalidated with the receiver (seconds)
+ARTWORK_MAX_AGE = 24 * 3600
+ARTWORK_THUMBNAIL_SIZE = 500
+
+# Volume fades: steps are spaced FADE_LATENCY_HEADROOM times the measured
+# command round trip (FADE_DEFAULT_LATENCY until one is known), never closer
+# than FADE_MIN_INTERVAL, so polls still get through between steps
+FADE_MIN_INTERVAL = 0.1
+FADE_LATENCY_HEADROOM = 2
+FADE_DEFAULT_LATENCY = 0.1
+FADE_MAX_DURATION = 3600
+FADE_MAX_FAILURES = 3
+
+# Fired on now-playing changes; Tuner Radio_Text must hold this many seconds
+EVENT_NOW_PLAYING = f"{DOMAIN}_now_playing"
+NOW_PLAYING_RDS_DEBOUNCE = 15
+
+# On-demand profiling: hass.data key of the running profile, window limits
+# (seconds) and stack sampling interval
+DATA_PROFILER = f"{DOMAIN}_profiler"
+PROFILE_DEFAULT_DURATION = 30
+PROFILE_MAX_DURATION = 600
+PROFILE_INTERVAL = 0.005
+
+# Tuner scan: seconds to let the tuner lock after each step, to wait for an
+# RDS name once locked (polling every TUNER_SCAN_RDS_INTERVAL), between
+# checks whether a zone still listens to the Tuner, and rejected tune
+# commands in a row after which the scan gives up
+TUNER_SCAN_SETTLE = 1.0
+TUNER_SCAN_RDS_WAIT = 6
+TUNER_SCAN_RDS_INTERVAL = 1
+TUNER_SCAN_IDLE_RECHECK = 30
+TUNER_SCAN_MAX_REJECTS = 5
@@ -0,0 +1,328 @@
+"""Shared polling for all zone entities of one receiver."""
+import asyncio
+import logging
+import time
+import xml.etree.ElementTree as ET
+from datetime import timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .const import (
+    DEFAULT_SCAN_INTERVAL,
+    DOMAIN,
+    UPNP_EVENT_DEBOUNCE,
+    UPNP_SAFETY_POLL_INTERVAL,
+)
+from .navigation import LineNavigator, ListNavigator, TitleNavigator
+from .parsing import ParseTimer
+from .receiver import (
+    MAIN_ZONE,
+    PRIORITY_BACKGROUND,
+    PRIORITY_POLL,
+    YamahaReceiver,
+    ZoneStatus,
+    basic_status_request,
+    parse_basic_status,
+    play_info_request,
+    request_priority,
+)
+from .tuner import TunerScanError, TunerScanner, TunerStation
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PollResult(NamedTuple):
+    """Data shared with the zone entities after each poll"""
+    zones: Dict[str, ZoneStatus]
+    play_info: Dict[str, str]   # Play_Info section -> raw GET response
+
+
+class YamahaCoordinator(DataUpdateCoordinator):
+    """Poll every zone's Basic_Status and each active source's Play_Info once per cycle"""
+
+    def __init__(self, hass: HomeAssistant, receiver: YamahaReceiver, upnp_events=False, store=None,
+                 device_config=None):
+        super().__init__(
+            hass, _LOGGER, name=f"{DOMAIN} {receiver.host}",
+            update_interval=DEFAULT_SCAN_INTERVAL,
+        )
+        self.receiver = receiver
+        self.store = store
+        self.parse_timer = ParseTimer(hass)
+        # Shared by all zones: the menu cursors are per device
+        self.net_radio = TitleNavigator(receiver, "NET_RADIO", "NET RADIO", self.parse_timer.async_parse)
+        self.server = LineNavigator(receiver, "SERVER", "Server", self.parse_timer.async_parse)
+        self._navigators: Dict[str, ListNavigator] = {"NET_RADIO": self.net_radio, "SERVER": self.server}
+        self.stations: List[TunerStation] = store.stations if store is not None else []
+        self.tuner_scan: Optional[TunerScanner] = None
+        self._tuner_scan_task: Optional[asyncio.Task] = None
+        self._tuner_scan_error: Optional[str] = None
+        config = None
+        if store is not None:
+            # Serve the last known configuration and state until the device confirms them
+            config = store.config
+            if config is not None:
+                receiver.config = config
+                receiver.presets = store.presets
+            state = store.state
+            if state is not None:
+                self.data = PollResult(*state)
+        if config is None and device_config is not None:
+            # Captured by the config flow probe; re-read like a cached one, so
+            # firmware updates and changed inputs or zones are picked up
+            receiver.config = device_config
+        self._upnp_listener = None
+        if upnp_events:
+            # aiohttp.web is only needed for the NOTIFY server, so import on demand
+            from .upnp import UpnpEventListener
+            self._upnp_listener = UpnpEventListener(
+                hass, async_get_clientsession(hass), receiver.host,
+                self._async_handle_upnp_event, self._handle_upnp_state,
+            )
+        self._pending_refresh = set()
+        self._cancel_event_refresh = None
+        self._config_listeners: List[Callable[[], None]] = []
+        self.polls = 0
+        self.poll_failures = 0
+        self.last_poll_duration: Optional[float] = None
+        self.last_poll: Optional[float] = None
+
+    async def async_initialize(self) -> None:
+        """Read the device configuration, run the first poll and start events
+
+        Runs as a background task so an offline receiver doesn't delay
+        Home Assistant startup; entities show their restored state meanwhile.
+        """
+        with request_priority(PRIORITY_POLL):
+            await self._async_load_config()
+        await self.async_refresh()
+        if self._upnp_listener is not None:
+            await self._upnp_listener.async_start()
+
+    @callback
+    def async_add_config_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener whenever the receiver configuration has been (re)read"""
+        self._config_listeners.append(listener)
+
+        @callback
+        def remove_listener() -> None:
+            self._config_listeners.remove(listener)
+
+        return remove_listener
+
+    async def _async_load_config(self) -> None:
+        if await self.receiver.async_load_config():
+            if self.store is not None:
+                self.store.async_set_config(self.receiver.config, self.receiver.presets)
+            for listener in list(self._config_listeners):
+                listener()
+
+    def list_navigator(self, section: str) -> ListNavigator:
+        """The navigator owning a section's menu cursor; every List_Control goes through it"""
+        navigator = self._navigators.get(section)
+        if navigator is None:
+            navigator = self._navigators[section] = LineNavigator(
+                self.receiver, section, section, self.parse_timer.async_parse)
+        return navigator
+
+    def zone_unique_id(self, zone: str) -> str:
+        """Entity unique ID of a zone
+
+        Config entry entities are keyed by System_ID, so a new address keeps
+        them; YAML setups and firmwares without a System_ID use the host.
+        """
+        system_id = self.receiver.config.system_id if self.store is not None else None
+        unique_id = f"yamaha_rn301_{system_id or self.receiver.host.replace('.', '_')}"
+        return unique_id if zone == MAIN_ZONE else f"{unique_id}_{zone.lower()}"
+
+    def tuner_in_use(self) -> bool:
+        """True while a powered zone is set to the Tuner"""
+        data = self.data
+        return data is not None and any(
+            status.power and status.input_sel == "TUNER" for status in data.zones.values())
+
+    def in_standby(self) -> bool:
+        """True when the last poll found every zone in Standby"""
+        data = self.data
+        return data is not None and bool(data.zones) and not any(
+            status.power for status in data.zones.values())
+
+    @callback
+    def async_start_tuner_scan(self, band: str, step: Optional[int] = None) -> bool:
+        """Scan a band in the background; False if a scan is already running"""
+        if self._tuner_scan_task is not None:
+            return False
+        scanner = self.tuner_scan = TunerScanner(self.receiver, self.tuner_in_use, band, step)
+        self._tuner_scan_error = None
+        self._tuner_scan_task = self.hass.async_create_background_task(
+            self._async_tuner_scan(scanner), f"{DOMAIN} tuner scan {self.receiver.host}")
+        return True
+
+    async def _async_tuner_scan(self, scanner: TunerScanner) -> None:
+        try:
+            with request_priority(PRIORITY_BACKGROUND):
+                stations = await scanner.async_run()
+        except TunerScanError as e:
+            _LOGGER.warning("Tuner scan stopped: %s", e)
+            self._tuner_scan_error = str(e)
+            return
+        finally:
+            self._tuner_scan_task = None
+        # Replace the scanned band, keep the other
+        self.stations = sorted(
+            [station for station in self.stations if station.band != scanner.band] + stations,
+            key=lambda station: (station.band, station.val))
+        _LOGGER.info("Tuner scan of %s found %d %s stations", self.receiver.host, len(stations), scanner.band)
+        if self.store is not None:
+            self.store.async_set_stations(self.stations)
+
+    async def async_stop(self) -> None:
+        """Stop event handling and a running Tuner scan"""
+        if self._tuner_scan_task is not None:
+            self._tuner_scan_task.cancel()
+        if self._cancel_event_refresh is not None:
+            self._cancel_event_refresh()
+            self._cancel_event_refresh = None
+        if self._upnp_listener is not None:
+            await self._upnp_listener.async_stop()
+
+    async def _async_update_data(self) -> PollResult:
+        # Polls yield to user commands waiting for the receiver
+        with request_priority(PRIORITY_POLL):
+            return await self._async_poll_all()
+
+    async def _async_poll_all(self) -> PollResult:
+        if not self.receiver.config_loaded:
+            # Receiver was unreachable at startup
+            await self._async_load_config()
+        start = time.monotonic()
+        self.polls += 1
+        try:
+            result = await self._async_poll(basic=True, media=True)
+        except UpdateFailed:
+            self.poll_failures += 1
+            raise
+        self.last_poll_duration = time.monotonic() - start
+        self.last_poll = time.time()
+        return result
+
+    def as_dict(self) -> dict:
+        """In-memory snapshot of state and health; no device I/O"""
+        receiver = self.receiver
+        config = receiver.config
+        zones = {}
+        if self.data is not None:
+            for zone, status in self.data.zones.items():
+                item = config.input_by_param(zone, status.input_sel) if status.input_sel else None
+                zones[zone] = {
+                    "power": status.power,
+                    "volume": status.volume,
+                    "muted": status.muted,
+                    "input": item.name if item else status.input_sel,
+                    "play_info": status.src_name if status.src_name in self.data.play_info else None,
+                }
+        listener = self._upnp_listener
+        return {
+            "host": receiver.host,
+            "model": config.model,
+            "system_id": config.system_id,
+            "config_loaded": receiver.config_loaded,
+            "zones": zones,
+            "coordinator": {
+                "last_update_success": self.last_update_success,
+                "update_interval_s": self.update_interval.total_seconds() if self.update_interval else None,
+                "polls": self.polls,
+                "poll_failures": self.poll_failures,
+                "last_poll": self.last_poll,
+                "last_poll_ms": round(self.last_poll_duration * 1000, 1) if self.last_poll_duration is not None else None,
+                "batch_supported": receiver.batch_supported,
+                "upnp_active": listener.active if listener is not None else None,
+                "upnp_events": listener.events_received if listener is not None else None,
+                "wake_time": receiver.wake_time,
+            },
+            "tuner": {
+                "stations": len(self.stations),
+                "scan_running": self._tuner_scan_task is not None,
+                "scan_band": self.tuner_scan.band if self.tuner_scan is not None else None,
+                "scan_progress": round(self.tuner_scan.progress, 3) if self.tuner_scan is not None else None,
+                "scan_hits": self.tuner_scan.hits if self.tuner_scan is not None else None,
+                "scan_error": self._tuner_scan_error,
+            },
+            "requests": receiver.stats.as_dict(),
+            "scheduling": receiver.scheduler.as_dict(),
+            "parsing": self.parse_timer.as_dict(),
+        }
+
+    async def _async_poll(self, basic: bool, media: bool) -> PollResult:
+        previous = self.data
+        zone_names = self.receiver.config.zones if basic or previous is None else ()
+        # Play_Info sections depend on Basic_Status; guess them from the last
+        # poll so both usually go out in one batched request
+        guessed = sorted(previous.play_info) if previous is not None and media else []
+        responses = await self.receiver.async_get_many(
+            [basic_status_request(zone) for zone in zone_names]
+            + [play_info_request(section) for section in guessed])
+
+        if zone_names:
+            zones = {}
+            for zone, data in zip(zone_names, responses):
+                if not data:
+                    raise UpdateFailed(f"No response from {self.receiver.host}")
+                try:
+                    status = self.parse_timer.run_inline(parse_basic_status, data)
+                except ET.ParseError as e:
+                    raise UpdateFailed(f"Failed to parse XML response: {e}") from e
+                if status is not None:
+                    zones[zone] = status
+        else:
+            zones = previous.zones
+
+        # Zones playing the same source share one Play_Info request
+        sections = {status.src_name for status in zones.values() if status.power and status.src_name}
+        fetched = dict(zip(guessed, responses[len(zone_names):]))
+        if media or previous is None or not sections.issubset(previous.play_info):
+            missing = sorted(sections.difference(fetched))
+            if missing:
+                fetched.update(zip(missing, await self.receiver.async_get_many(
+                    [play_info_request(section) for section in missing])))
+            play_info = {}
+            for section in sections:
+                data = fetched.get(section)
+                if not data and previous is not None:
+                    data = previous.play_info.get(section)
+                if data:
+                    play_info[section] = data
+        else:
+            play_info = previous.play_info
+
+        if self.store is not None:
+            self.store.async_set_state(zones, play_info)
+        return PollResult(zones, play_info)
+
+    @callback
+    def _handle_upnp_state(self, active: bool) -> None:
+        """Stretch the poll interval while events flow, restore it when they lapse"""
+        self.update_interval = timedelta(seconds=UPNP_SAFETY_POLL_INTERVAL) if active else DEFAULT_SCAN_INTERVAL
+
+    async def _async_handle_upnp_event(self, service, variables) -> None:
+        """Queue a targeted refresh for the section a NOTIFY reports on"""
+        self._pending_refresh.add("basic" if service == "RenderingControl" else "media")
+        if self._cancel_event_refresh is None:
+            # Coalesce NOTIFY bursts (track change emits several) into one refresh
+            self._cancel_event_refresh = async_call_later(
+                self.hass, UPNP_EVENT_DEBOUNCE, self._async_event_refresh)
+
+    async def _async_event_refresh(self, _now=None) -> None:
+        self._cancel_event_refresh = None
+        pending, self._pending_refresh = self._pending_refresh, set()
+        try:
+            with request_priority(PRIORITY_POLL):
+                result = await self._async_poll(basic="basic" in pending, media="media" in pending)
+        except UpdateFailed as e:
+            _LOGGER.debug("Event refresh of %s failed: %s", self.receiver.host, e)
+            return
+        self.async_set_updated_data(result)
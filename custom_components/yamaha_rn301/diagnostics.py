@@ -0,0 +1,20 @@
+"""Diagnostics support for Yamaha R-N301."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .artwork import async_get_artwork_cache
+from .const import DOMAIN
+
+TO_REDACT = {CONF_HOST, "host", "system_id"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Entry configuration, last poll, request health, event loop blocking time and artwork cache"""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": async_redact_data({"data": dict(entry.data), "options": dict(entry.options)}, TO_REDACT),
+        "receiver": async_redact_data(coordinator.as_dict(), TO_REDACT),
+        "artwork": async_get_artwork_cache(hass).as_dict(),
+    }
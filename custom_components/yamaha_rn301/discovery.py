@@ -0,0 +1,144 @@
+"""Finding YamahaRemoteControl receivers on the local network."""
+import asyncio
+import ipaddress
+import logging
+import socket
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from .const import (
+    BASE_URL,
+    SCAN_CONCURRENCY,
+    SCAN_MAX_HOSTS,
+    SCAN_TIMEOUT,
+    SSDP_SEARCH_TIMEOUT,
+)
+from .receiver import SYSTEM_CONFIG_REQUEST, parse_system_config
+
+_LOGGER = logging.getLogger(__name__)
+
+SSDP_ADDRESS = ("239.255.255.250", 1900)
+SSDP_TARGET = "urn:schemas-upnp-org:device:MediaRenderer:1"
+
+
+class DiscoveredReceiver(NamedTuple):
+    host: str
+    model: str
+    system_id: Optional[str]
+
+
+def local_network(prefix: int = 24) -> Optional[str]:
+    """Best guess of the LAN this host is on, e.g. "192.168.1.0/24" (no packets are sent)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect(("10.255.255.255", 1))
+        address = sock.getsockname()[0]
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+async def async_probe_host(session: aiohttp.ClientSession, host: str,
+                           timeout: float = SCAN_TIMEOUT) -> Optional[DiscoveredReceiver]:
+    """Quietly check one host for a YamahaRemoteControl endpoint"""
+    data = '<?xml version="1.0" encoding="utf-8"?><YAMAHA_AV cmd="GET">' + SYSTEM_CONFIG_REQUEST + '</YAMAHA_AV>'
+    try:
+        async with session.post(BASE_URL.format(host), data=data,
+                                timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            if resp.status != 200:
+                return None
+            body = await resp.text()
+        model, system_id, _version, _zones, _features = parse_system_config(body)
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ET.ParseError, UnicodeDecodeError):
+        return None
+    return DiscoveredReceiver(host, model, system_id)
+
+
+async def async_probe_hosts(session: aiohttp.ClientSession, hosts: Iterable[str],
+                            concurrency: int = SCAN_CONCURRENCY,
+                            timeout: float = SCAN_TIMEOUT) -> List[DiscoveredReceiver]:
+    """Probe hosts concurrently, at most `concurrency` connections at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe(host):
+        async with semaphore:
+            return await async_probe_host(session, host, timeout)
+
+    results = await asyncio.gather(*(probe(host) for host in hosts))
+    return [result for result in results if result is not None]
+
+
+async def async_scan_network(session: aiohttp.ClientSession, network: str,
+                             concurrency: int = SCAN_CONCURRENCY,
+                             timeout: float = SCAN_TIMEOUT) -> List[DiscoveredReceiver]:
+    """Probe every host address of a subnet; raises ValueError for bad or oversized networks"""
+    net = ipaddress.ip_network(network, strict=False)
+    if net.num_addresses > SCAN_MAX_HOSTS:
+        raise ValueError(f"{network} is larger than {SCAN_MAX_HOSTS} addresses")
+    return await async_probe_hosts(session, (str(ip) for ip in net.hosts()), concurrency, timeout)
+
+
+class _SsdpSearchProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.responses: Dict[str, str] = {}
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        headers = {}
+        for line in data.decode("utf-8", "replace").split("\r\n")[1:]:
+            key, sep, value = line.partition(":")
+            if sep:
+                headers[key.strip().upper()] = value.strip()
+        location = headers.get("LOCATION")
+        if location:
+            self.responses[urlparse(location).hostname or addr[0]] = location
+
+
+async def async_ssdp_search(timeout: float = SSDP_SEARCH_TIMEOUT, target: str = SSDP_TARGET,
+                            address: Tuple[str, int] = SSDP_ADDRESS) -> Dict[str, str]:
+    """Send one M-SEARCH and collect {host: description location} answers"""
+    message = "\r\n".join([
+        "M-SEARCH * HTTP/1.1",
+        f"HOST: {address[0]}:{address[1]}",
+        'MAN: "ssdp:discover"',
+        f"MX: {max(int(timeout), 1)}",
+        f"ST: {target}",
+        "", "",
+    ]).encode()
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        _SsdpSearchProtocol, local_addr=("0.0.0.0", 0), family=socket.AF_INET)
+    try:
+        transport.sendto(message, address)
+        await asyncio.sleep(timeout)
+    finally:
+        transport.close()
+    return protocol.responses
+
+
+async def async_discover(session: aiohttp.ClientSession, network: Optional[str] = None,
+                         ssdp_timeout: float = SSDP_SEARCH_TIMEOUT) -> List[DiscoveredReceiver]:
+    """SSDP search, plus a subnet scan when a network is given; results deduplicated by host"""
+    found: Dict[str, DiscoveredReceiver] = {}
+    try:
+        candidates = await async_ssdp_search(ssdp_timeout)
+    except OSError as e:
+        _LOGGER.debug("SSDP search failed: %s", e)
+        candidates = {}
+    for receiver in await async_probe_hosts(session, candidates):
+        found[receiver.host] = receiver
+    if network:
+        for receiver in await async_scan_network(session, network):
+            found.setdefault(receiver.host, receiver)
+    return sorted(found.values(), key=_host_key)
+
+
+def _host_key(receiver: DiscoveredReceiver):
+    try:
+        return (0, int(ipaddress.ip_address(receiver.host)), "")
+    except ValueError:
+        return (1, 0, receiver.host)
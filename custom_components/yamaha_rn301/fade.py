@@ -0,0 +1,92 @@
+"""Volume fades paced by the receiver's measured command round trip."""
+import asyncio
+import logging
+import time
+
+from .const import (
+    FADE_DEFAULT_LATENCY,
+    FADE_LATENCY_HEADROOM,
+    FADE_MAX_FAILURES,
+    FADE_MIN_INTERVAL,
+)
+from .receiver import YamahaReceiver, response_ok, volume_command
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class VolumeFade:
+    """Move one zone's volume linearly from start to target over duration seconds
+
+    Exactly one Volume PUT is in flight at a time. Each tick sends the level
+    due at that moment, so a slow response makes the fade skip levels
+    instead of queueing stale ones, and it still ends on time. Ticks are
+    spaced by the current RTT average, re-read after every step. cancel()
+    stops the fade after the PUT in flight, if any, has been answered.
+    """
+
+    def __init__(self, receiver: YamahaReceiver, zone: str, start: float, target: float,
+                 duration: float):
+        self._receiver = receiver
+        self._zone = zone
+        self._start = round(start * 100)
+        self._target = round(target * 100)
+        self._duration = duration
+        self._cancel = asyncio.Event()
+        self._finished = asyncio.Event()
+        self.level = self._start
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    async def async_cancel(self) -> None:
+        """Stop the fade and wait until its last PUT has been answered"""
+        self._cancel.set()
+        await self._finished.wait()
+
+    def _interval(self) -> float:
+        latency = self._receiver.stats.avg_latency or FADE_DEFAULT_LATENCY
+        interval = max(FADE_MIN_INTERVAL, latency * FADE_LATENCY_HEADROOM)
+        levels = abs(self._target - self._start)
+        # Never faster than one volume unit per tick
+        return max(interval, self._duration / levels) if levels else interval
+
+    async def async_run(self) -> dict:
+        begin = time.monotonic()
+        steps = failures = 0
+        interval = self._interval()
+        try:
+            while not self._cancel.is_set():
+                fraction = min(1.0, (time.monotonic() - begin) / self._duration) if self._duration > 0 else 1.0
+                level = round(self._start + (self._target - self._start) * fraction)
+                if level != self.level or (fraction >= 1.0 and steps == 0):
+                    steps += 1
+                    command = volume_command(self._zone, level / 100, self._receiver.config.volume)
+                    if response_ok(await self._receiver.async_put(command)):
+                        self.level = level
+                    else:
+                        failures += 1
+                        if failures >= FADE_MAX_FAILURES:
+                            _LOGGER.warning("Volume fade on %s aborted after %d rejected steps",
+                                            self._receiver.host, failures)
+                            break
+                if fraction >= 1.0 and self.level == self._target:
+                    break
+                interval = self._interval()
+                # Wake for the next tick (the last one exactly at the end), or at once when cancelled
+                remaining = begin + self._duration - time.monotonic()
+                try:
+                    async with asyncio.timeout(min(interval, remaining) if remaining > 0 else interval):
+                        await self._cancel.wait()
+                except TimeoutError:
+                    pass
+        finally:
+            self._finished.set()
+        return {
+            "completed": self.level == self._target,
+            "cancelled": self._cancel.is_set(),
+            "volume": self.level / 100,
+            "steps": steps,
+            "failures": failures,
+            "interval_ms": round(interval * 1000, 1),
+            "elapsed_ms": round((time.monotonic() - begin) * 1000, 1),
+        }
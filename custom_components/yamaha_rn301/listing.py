@@ -0,0 +1,130 @@
+"""Compact storage for List_Info pages returned by SERVER and NET RADIO."""
+import sys
+import xml.etree.ElementTree as ET
+from typing import NamedTuple, Optional, Tuple
+
+# Lines per List_Info page; Direct_Sel addresses Line_1..Line_8 of the visible page
+PAGE_SIZE = 8
+
+ATTR_CONTAINER = sys.intern("Container")
+ATTR_ITEM = sys.intern("Item")
+
+
+def page_start(line: int) -> int:
+    """Absolute line number shown as Line_1 on the page containing line"""
+    return (line - 1) // PAGE_SIZE * PAGE_SIZE + 1
+
+
+class ListItem(NamedTuple):
+    """A single List_Info line; tuples carry no per-instance __dict__"""
+    line_id: str
+    title: str
+    attribute: str
+
+    @property
+    def is_container(self) -> bool:
+        return self.attribute == ATTR_CONTAINER
+
+
+class ListPage:
+    """One parsed List_Info response.
+
+    Items are stored as ListItem tuples with interned line IDs and attribute
+    strings; the browse path they live under is stored once per page and
+    content IDs are only built when an item is materialised.
+    """
+
+    __slots__ = ('menu_name', 'menu_layer', 'menu_status', 'current_line', 'max_line',
+                 'base_path', 'items')
+
+    def __init__(self, menu_name, menu_layer=1, menu_status=None, current_line=1, max_line=1,
+                 base_path="", items=()):
+        self.menu_name = menu_name
+        self.menu_layer = menu_layer
+        self.menu_status = menu_status
+        self.current_line = current_line
+        self.max_line = max_line
+        self.base_path = base_path
+        self.items: Tuple[ListItem, ...] = tuple(items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def busy(self) -> bool:
+        return self.menu_status == "Busy"
+
+    @property
+    def first_line(self) -> int:
+        """Absolute line number of Line_1 on this page"""
+        return page_start(self.current_line)
+
+    def absolute_line(self, item: ListItem) -> int:
+        return self.first_line + int(item.line_id[len("Line_"):]) - 1
+
+    def item_path(self, item: ListItem) -> str:
+        """Browse path of an item: the page's base path plus its absolute line number"""
+        line = str(self.absolute_line(item))
+        return f"{self.base_path}:{line}" if self.base_path else line
+
+    def as_dict(self) -> dict:
+        """JSON-serialisable form for the persistent store"""
+        return {
+            "menu_name": self.menu_name,
+            "menu_layer": self.menu_layer,
+            "current_line": self.current_line,
+            "max_line": self.max_line,
+            "base_path": self.base_path,
+            "items": [list(item) for item in self.items],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ListPage":
+        intern = sys.intern
+        return cls(
+            data["menu_name"], data["menu_layer"], None, data["current_line"], data["max_line"],
+            data["base_path"],
+            (ListItem(intern(line_id), title, intern(attribute))
+             for line_id, title, attribute in data["items"]),
+        )
+
+
+def _int_text(node, default=1):
+    return int(node.text) if node is not None and node.text else default
+
+
+def parse_list_info(data: str, default_menu: str, base_path: str = "") -> Optional[ListPage]:
+    """Parse a <List_Info> GET response into a ListPage
+
+    Raises ET.ParseError on malformed XML; returns None if the envelope
+    does not contain a list.
+    """
+    tree = ET.fromstring(data)
+    try:
+        section = tree[0][0]
+    except IndexError:
+        return None
+
+    page = ListPage(default_menu, base_path=base_path)
+    items = []
+    intern = sys.intern
+    for node in section:
+        if node.tag == "Menu_Name":
+            page.menu_name = node.text or default_menu
+        elif node.tag == "Menu_Layer":
+            page.menu_layer = _int_text(node)
+        elif node.tag == "Menu_Status":
+            page.menu_status = node.text
+        elif node.tag == "Cursor_Position":
+            page.current_line = _int_text(node.find("Current_Line"))
+            page.max_line = _int_text(node.find("Max_Line"))
+        elif node.tag == "Current_List":
+            for line in node:
+                if not line.tag.startswith("Line_"):
+                    continue
+                title = line.findtext("Txt")
+                attribute = line.findtext("Attribute")
+                if title and attribute:
+                    items.append(ListItem(intern(line.tag), title, intern(attribute)))
+    page.items = tuple(items)
+    return page
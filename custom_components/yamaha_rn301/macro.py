@@ -0,0 +1,180 @@
+"""Run a list of receiver commands back to back, waiting only where the device needs it."""
+import asyncio
+import logging
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from .const import MACRO_READY_INTERVAL, MACRO_READY_TIMEOUT, WAKE_POLL_INTERVAL
+from .navigation import ListNavigator, NavigationError
+from .receiver import (
+    YamahaReceiver,
+    basic_status_request,
+    input_command,
+    mute_command,
+    parse_basic_status,
+    playback_command,
+    power_command,
+    preset_command,
+    response_ok,
+    volume_command,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STEP_POWER = "power"
+STEP_SOURCE = "source"
+STEP_VOLUME = "volume"
+STEP_MUTE = "mute"
+STEP_PRESET = "preset"
+STEP_LINE = "line"
+STEP_PLAYBACK = "playback"
+STEP_DELAY = "delay"
+
+
+class MacroError(Exception):
+    """A step could not be sent or the device never became ready"""
+
+
+class StepReport(NamedTuple):
+    step: str
+    value: Any
+    ok: bool
+    command_ms: float   # PUT round trip
+    ready_ms: float     # time spent waiting for the device afterwards
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {"step": self.step, "value": self.value, "ok": self.ok,
+                "command_ms": round(self.command_ms, 1), "ready_ms": round(self.ready_ms, 1),
+                "error": self.error}
+
+
+class MacroRunner:
+    """Execute macro steps for one zone
+
+    Commands go out as soon as the previous one is acknowledged; only power-on,
+    input changes and list selections are followed by readiness polling.
+    The shared aiohttp session keeps the connection to the receiver alive
+    between steps.
+    """
+
+    def __init__(self, receiver: YamahaReceiver, zone: str, section: Optional[str] = None,
+                 navigators: Optional[Callable[[str], ListNavigator]] = None,
+                 ready_timeout: float = MACRO_READY_TIMEOUT,
+                 ready_interval: float = MACRO_READY_INTERVAL):
+        self._receiver = receiver
+        self._zone = zone
+        # Play_Info/List_Info section of the active input, updated by source steps
+        self._section = section
+        # section -> navigator owning its menu cursor, shared with browsing
+        self._navigators = navigators
+        self._ready_timeout = ready_timeout
+        self._ready_interval = ready_interval
+
+    async def async_run(self, steps: List[Dict[str, Any]]) -> List[StepReport]:
+        """Run steps in order, stopping at the first failure"""
+        reports = []
+        for step in steps:
+            (kind, value), = step.items()
+            start = time.monotonic()
+            try:
+                ready_ms = await getattr(self, f"_async_{kind}")(value)
+                error = None
+            except MacroError as e:
+                ready_ms, error = 0.0, str(e)
+            elapsed = (time.monotonic() - start) * 1000
+            report = StepReport(kind, value, error is None, elapsed - ready_ms, ready_ms, error)
+            _LOGGER.debug("Macro step on %s: %s", self._receiver.host, report)
+            reports.append(report)
+            if error is not None:
+                break
+        return reports
+
+    async def _async_put(self, data: str, retry: bool = False) -> None:
+        """Send a command; with retry, keep resending while the device rejects it"""
+        deadline = time.monotonic() + self._ready_timeout
+        while not response_ok(await self._receiver.async_put(data)):
+            if not retry or time.monotonic() >= deadline:
+                raise MacroError(f"{self._receiver.host} rejected {data}")
+            await asyncio.sleep(self._ready_interval)
+
+    async def _async_wait(self, request: str, ready: Callable[[str], bool], what: str,
+                          interval: Optional[float] = None) -> float:
+        """Poll request until ready(response) holds; returns the time waited in ms"""
+        start = time.monotonic()
+        deadline = start + self._ready_timeout
+        while True:
+            data = await self._receiver.async_get(request)
+            try:
+                if data and ready(data):
+                    return (time.monotonic() - start) * 1000
+            except ET.ParseError:
+                pass
+            if time.monotonic() >= deadline:
+                raise MacroError(f"{self._receiver.host} not ready after {what}")
+            await asyncio.sleep(interval or self._ready_interval)
+
+    async def _async_power(self, on: bool) -> float:
+        start = time.monotonic()
+        await self._async_put(power_command(self._zone, on))
+        if not on:
+            return 0.0
+
+        def powered(data):
+            status = parse_basic_status(data)
+            return status is not None and status.power
+
+        waited = await self._async_wait(basic_status_request(self._zone), powered, "power on",
+                                        WAKE_POLL_INTERVAL)
+        self._receiver.wake_time = round(time.monotonic() - start, 2)
+        return waited
+
+    async def _async_source(self, name: str) -> float:
+        config = self._receiver.config
+        item = config.input_by_name(self._zone, name) or config.input_by_param(self._zone, name)
+        if item is None:
+            raise MacroError(f"Unknown source {name}")
+        # Right after power-on the unit reports On but may still refuse inputs
+        await self._async_put(input_command(self._zone, item.param), retry=True)
+        self._section = item.src_name or None
+
+        def selected(data):
+            status = parse_basic_status(data)
+            return status is not None and status.input_sel == item.param
+
+        return await self._async_wait(basic_status_request(self._zone), selected, f"selecting {name}")
+
+    async def _async_volume(self, volume: float) -> float:
+        await self._async_put(volume_command(self._zone, volume, self._receiver.config.volume))
+        return 0.0
+
+    async def _async_mute(self, mute: bool) -> float:
+        await self._async_put(mute_command(self._zone, mute))
+        return 0.0
+
+    async def _async_preset(self, preset: int) -> float:
+        await self._async_put(preset_command(preset))
+        return 0.0
+
+    async def _async_line(self, line: int) -> float:
+        """Select a line of the active input's list (a NET RADIO bookmark, a SERVER entry)"""
+        if not self._section or self._navigators is None:
+            raise MacroError("The active source has no list")
+        start = time.monotonic()
+        try:
+            # Waits for the list before and after, queued behind a browse in progress
+            await self._navigators(self._section).async_select_line(line)
+        except NavigationError as e:
+            raise MacroError(str(e)) from e
+        return (time.monotonic() - start) * 1000
+
+    async def _async_playback(self, command: str) -> float:
+        if not self._section:
+            raise MacroError("The active source has no playback control")
+        await self._async_put(playback_command(self._section, command))
+        return 0.0
+
+    async def _async_delay(self, seconds: float) -> float:
+        await asyncio.sleep(seconds)
+        return seconds * 1000
@@ -1,18 +1,19 @@
 import logging
+import re
 import xml.etree.ElementTree as ET
-from datetime import datetime
+from datetime import timedelta
 
 from typing import Optional
-import asyncio
 
 import voluptuous as vol
-import aiohttp
 
 from homeassistant.components.media_player import (
     MediaPlayerEntity, PLATFORM_SCHEMA)
 
 from homeassistant.components.media_player.const import (
-    ATTR_MEDIA_CONTENT_ID, ATTR_MEDIA_CONTENT_TYPE, MediaType, MediaClass)
+    ATTR_MEDIA_CONTENT_ID, ATTR_MEDIA_CONTENT_TYPE, ATTR_INPUT_SOURCE, ATTR_MEDIA_ALBUM_NAME,
+    ATTR_MEDIA_ARTIST, ATTR_MEDIA_TITLE, ATTR_MEDIA_VOLUME_LEVEL, ATTR_MEDIA_VOLUME_MUTED,
+    MediaType, MediaClass)
 try:
     from homeassistant.components.media_player.browse_media import BrowseMedia
 except ImportError:
@@ -21,10 +22,35 @@ from homeassistant.components.media_player import (
     MediaPlayerEntityFeature)
 from homeassistant.const import (
     CONF_HOST, CONF_NAME, STATE_OFF, STATE_IDLE, STATE_PLAYING, STATE_UNKNOWN)
+from homeassistant.core import SupportsResponse, callback
+from homeassistant.exceptions import ServiceValidationError
 
 import homeassistant.util.dt as dt_util
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers import entity_platform
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from . import create_coordinator
+from .artwork import async_get_artwork_cache
+from .const import (
+    DATA_ZONE_ENTITIES,
+    EVENT_NOW_PLAYING,
+    FADE_MAX_DURATION,
+    NOW_PLAYING_RDS_DEBOUNCE,
+    SOURCE_MAPPING,
+)
+from .fade import VolumeFade
+from .listing import ATTR_CONTAINER, ATTR_ITEM, PAGE_SIZE
+from .macro import STEP_POWER, STEP_SOURCE, STEP_VOLUME, MacroRunner
+from .navigation import NavigationError, join_path, split_path
+from .now_playing import NowPlayingTracker
+from .receiver import (
+    MAIN_ZONE, PRIORITY_BACKGROUND, display_name, input_command, mute_command,
+    playback_command, power_command, preset_command, request_priority, volume_command)
+from .services import ATTR_STEPS, MACRO_STEPS, async_setup_services
+from .tuner import BANDS, tune_command
 
 DOMAIN = 'yamaha_rn301'
 
@@ -32,10 +58,19 @@ ATTR_ENABLED = 'enabled'
 ATTR_PORT = 'port'
 DATA_YAMAHA = 'yamaha_known_receivers'
 DEFAULT_NAME = 'Yamaha R-N301'
-DEFAULT_TIMEOUT = 5
-BASE_URL = 'http://{0}/YamahaRemoteControl/ctrl'
 
 SERVICE_ENABLE_OUTPUT = 'yamaha_enable_output'
+SERVICE_RUN_MACRO = 'run_macro'
+SERVICE_FADE_VOLUME = 'fade_volume'
+SERVICE_SCAN_TUNER = 'scan_tuner'
+ATTR_DURATION = 'duration'
+ATTR_BAND = 'band'
+ATTR_STEP = 'step'
+# play_media type for Tuner stations; the id is "FM:9870" or a station or preset name
+MEDIA_TYPE_TUNER = 'tuner'
+ATTR_WAKE_TIME = 'wake_time'
+# Content IDs of the form "station:Line_3" from before named paths
+LEGACY_LINE_ID = re.compile(r'Line_\d+')
 SUPPORT_YAMAHA = MediaPlayerEntityFeature.VOLUME_SET | MediaPlayerEntityFeature.VOLUME_MUTE | MediaPlayerEntityFeature.TURN_ON | MediaPlayerEntityFeature.TURN_OFF | \
                  MediaPlayerEntityFeature.SELECT_SOURCE | MediaPlayerEntityFeature.PLAY | MediaPlayerEntityFeature.PAUSE | MediaPlayerEntityFeature.STOP | \
                  MediaPlayerEntityFeature.NEXT_TRACK | MediaPlayerEntityFeature.PREVIOUS_TRACK | MediaPlayerEntityFeature.SHUFFLE_SET
@@ -44,7 +79,8 @@ SUPPORTED_PLAYBACK = MediaPlayerEntityFeature.VOLUME_SET | MediaPlayerEntityFeat
                      MediaPlayerEntityFeature.SELECT_SOURCE | MediaPlayerEntityFeature.SHUFFLE_SET
 
 SUPPORT_TUNER = MediaPlayerEntityFeature.VOLUME_SET | MediaPlayerEntityFeature.VOLUME_MUTE | MediaPlayerEntityFeature.TURN_ON | MediaPlayerEntityFeature.TURN_OFF | \
-                MediaPlayerEntityFeature.SELECT_SOURCE | MediaPlayerEntityFeature.PLAY_MEDIA | MediaPlayerEntityFeature.NEXT_TRACK | MediaPlayerEntityFeature.PREVIOUS_TRACK
+                MediaPlayerEntityFeature.SELECT_SOURCE | MediaPlayerEntityFeature.PLAY_MEDIA | MediaPlayerEntityFeature.NEXT_TRACK | MediaPlayerEntityFeature.PREVIOUS_TRACK | \
+                MediaPlayerEntityFeature.BROWSE_MEDIA
 
 SUPPORT_NET_RADIO = MediaPlayerEntityFeature.VOLUME_SET | MediaPlayerEntityFeature.VOLUME_MUTE | MediaPlayerEntityFeature.TURN_ON | MediaPlayerEntityFeature.TURN_OFF | \
                     MediaPlayerEntityFeature.SELECT_SOURCE | MediaPlayerEntityFeature.PLAY_MEDIA | MediaPlayerEntityFeature.BROWSE_MEDIA
@@ -54,97 +90,331 @@ SUPPORT_SERVER = MediaPlayerEntityFeature.VOLUME_SET | MediaPlayerEntityFeature.
                  MediaPlayerEntityFeature.PLAY | MediaPlayerEntityFeature.PAUSE | MediaPlayerEntityFeature.STOP | \
                  MediaPlayerEntityFeature.NEXT_TRACK | MediaPlayerEntityFeature.PREVIOUS_TRACK | MediaPlayerEntityFeature.SHUFFLE_SET
 
+SOURCE_FEATURES = {
+    'Tuner': SUPPORT_TUNER,
+    'Net Radio': SUPPORT_NET_RADIO,
+    'Server': SUPPORT_SERVER,
+    'Optical': SUPPORTED_PLAYBACK,
+    'CD': SUPPORTED_PLAYBACK,
+    'Line 1': SUPPORTED_PLAYBACK,
+    'Line 2': SUPPORTED_PLAYBACK,
+    'Line 3': SUPPORTED_PLAYBACK,
+}
+
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
     vol.Required(CONF_HOST): cv.string
 })
-SOURCE_MAPPING = {
-    'Optical': 'OPTICAL',
-    'CD': 'CD',
-    'Spotify': 'Spotify',
-    'Line 1': 'LINE1',
-    'Line 2': 'LINE2',
-    'Line 3': 'LINE3',
-    'Net Radio': 'NET RADIO',
-    'Server': 'SERVER',
-    'Tuner': 'TUNER'
-}
+
+# Seconds the reported Play_Time may differ from the extrapolated position
+# before it is treated as a seek/track change (covers Play_Time granularity
+# and request latency)
+POSITION_DRIFT_TOLERANCE = 2.5
+
+# When both a song and a frequency are known, the title shows the song for
+# one interval and the frequency for the next TITLE_ALTERNATE_PHASES - 1
+TITLE_ALTERNATE_INTERVAL = timedelta(seconds=20)
+TITLE_ALTERNATE_PHASES = 3
 
 _LOGGER = logging.getLogger(__name__)
 
-def setup_platform(hass, config, add_devices, discovery_info=None):
-    devices = []
-    device = YamahaRn301MP(config.get(CONF_NAME), config.get(CONF_HOST))
-    devices.append(device)
-    add_devices(devices)
+
+class MediaSnapshot:
+    """Immutable per-poll view of source-dependent entity attributes"""
+
+    __slots__ = ('supported_features', 'content_type', 'title', 'alternate_title', 'album', 'artist')
+
+    def __init__(self, supported_features, content_type, title=None, alternate_title=None,
+                 album=None, artist=None):
+        object.__setattr__(self, 'supported_features', supported_features)
+        object.__setattr__(self, 'content_type', content_type)
+        object.__setattr__(self, 'title', title)
+        object.__setattr__(self, 'alternate_title', alternate_title)
+        object.__setattr__(self, 'album', album)
+        object.__setattr__(self, 'artist', artist)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MediaSnapshot is immutable")
+
+    @classmethod
+    def build(cls, source, meta, current_preset, source_features=SOURCE_FEATURES, preset_title=None):
+        """Compute the snapshot for a source and its parsed Meta_Info"""
+        supported_features = source_features.get(source, SUPPORT_YAMAHA)
+        if source in ("Net Radio", "Tuner"):
+            content_type = MediaType.CHANNEL
+        else:
+            content_type = MediaType.PLAYLIST
+
+        song = meta.get("song")
+        freq = meta.get("frequency")
+        alternate_title = None
+        if source == "Tuner":
+            parts = [f"#{current_preset}" if current_preset else "Tuner"]
+            if meta.get("station") or preset_title:
+                # RDS name when received, else the name stored with the preset
+                parts.append(meta.get("station") or preset_title)
+            if song:
+                parts.append(f"• {song}")
+            if freq:
+                parts.append(f"({freq})")
+            title = " ".join(parts)
+        elif song and freq:
+            title = song
+            alternate_title = freq
+        else:
+            title = song or freq
+
+        return cls(supported_features, content_type, title, alternate_title,
+                   meta.get('album'), meta.get('artist'))
+
+
+EMPTY_SNAPSHOT = MediaSnapshot(SUPPORT_YAMAHA, MediaType.PLAYLIST)
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """Set up the media player platform from YAML"""
+    coordinator = create_coordinator(hass, config.get(CONF_HOST))
+    _add_zone_entities(coordinator, config.get(CONF_NAME), async_add_entities)
+    _async_register_services()
+    async_setup_services(hass)
+    hass.async_create_background_task(
+        coordinator.async_initialize(), f"{DOMAIN} initialize {config.get(CONF_HOST)}")
 
 async def async_setup_entry(hass, entry, async_add_entities):
     """Set up the media player platform from a config entry."""
-    host = entry.data[CONF_HOST]
+    coordinator = hass.data[DOMAIN][entry.entry_id]
     name = entry.data.get(CONF_NAME, DEFAULT_NAME)
-    player = YamahaRn301MP(name, host)
-    async_add_entities([player], True)
-
-class YamahaRn301MP(MediaPlayerEntity):
-
-    def __init__(self, name, host):
-        self._data = None
+    entry.async_on_unload(_add_zone_entities(coordinator, name, async_add_entities))
+    _async_register_services()
+
+@callback
+def _async_register_services():
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(
+        SERVICE_RUN_MACRO,
+        {vol.Required(ATTR_STEPS): MACRO_STEPS},
+        "async_run_macro",
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    platform.async_register_entity_service(
+        SERVICE_FADE_VOLUME,
+        {
+            vol.Required(ATTR_MEDIA_VOLUME_LEVEL): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+            vol.Optional(ATTR_DURATION, default=5): vol.All(vol.Coerce(float), vol.Range(min=0, max=FADE_MAX_DURATION)),
+        },
+        "async_fade_volume",
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    platform.async_register_entity_service(
+        SERVICE_SCAN_TUNER,
+        {
+            vol.Optional(ATTR_BAND, default="FM"): vol.In(list(BANDS)),
+            vol.Optional(ATTR_STEP): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+        },
+        "async_scan_tuner",
+    )
+
+def _add_zone_entities(coordinator, name, async_add_entities):
+    """One entity per zone the receiver reports, all fed by the shared poll
+
+    Entities for the zones known now are added immediately; zones that only
+    show up once the device configuration has been read are added then.
+    """
+    added = set()
+
+    @callback
+    def add_new_zones():
+        new_zones = [zone for zone in coordinator.receiver.config.zones if zone not in added]
+        added.update(new_zones)
+        if new_zones:
+            async_add_entities([YamahaRn301MP(coordinator, name, zone) for zone in new_zones])
+
+    add_new_zones()
+    return coordinator.async_add_config_listener(add_new_zones)
+
+def _parse_server_content_id(content_id):
+    """"server_menu:root:1:12@17" -> ((1, 12), 17); raises ValueError when malformed
+
+    Legacy "Line_N" elements count from the first page, as they did when issued.
+    """
+    body, _, line = content_id.partition("@")
+    path = tuple(
+        int(part[len("Line_"):] if part.startswith("Line_") else part)
+        for part in body.split(":")[2:] if part
+    )
+    return path, int(line) if line else None
+
+def _preset_key(item):
+    """Numeric preset order; Param values the firmware doesn't number go last"""
+    number = item[0]
+    return (0, int(number), "") if number.isdigit() else (1, 0, number)
+
+def _source_features(inputs):
+    """Feature table for a zone's inputs; unknown inputs with a Play_Info section get playback controls"""
+    return {
+        item.name: SOURCE_FEATURES.get(item.name, SUPPORT_YAMAHA if item.src_name else SUPPORTED_PLAYBACK)
+        for item in inputs
+    }
+
+class YamahaRn301MP(CoordinatorEntity, MediaPlayerEntity, RestoreEntity):
+
+    def __init__(self, coordinator, name, zone=MAIN_ZONE):
+        super().__init__(coordinator)
+        self._receiver = coordinator.receiver
+        self._zone = zone
+        self._host = self._receiver.host
+        self._unique_id = coordinator.zone_unique_id(zone)
+        if zone != MAIN_ZONE:
+            name = f"{name} {zone.replace('_', ' ')}"
         self._name = name
-        self._host = host
-        self._unique_id = f"yamaha_rn301_{host.replace('.', '_')}"
-        self._base_url = BASE_URL.format(self._host)
         self._pwstate = STATE_UNKNOWN
         self._volume = 0
         self._muted = False
-        self._is_on = None
-        self._current_state = -1
-        self._current_operation = ''
-        self._set_state = None
         self._source = None
         self._device_source = None
-        self._source_list = list(SOURCE_MAPPING.keys())
-        self._reverse_mapping = {val: key for key, val in SOURCE_MAPPING.items()}
-        self._operation_list = ['On', 'Vol']
+        self._play_info_section = None
+        self._config = None
+        self._source_list = []
+        self._source_features = {}
+        self._load_source_tables()
 
         self._media_meta = {}
         self._media_playing = False
         self._media_play_position = None
         self._media_play_position_updated = None
+        self._media_position_advancing = False
         self._media_play_shuffle = None
         self._media_play_repeat = None
-        self._media_play_artist = None
-        self._media_play_album = None
-        self._media_play_song = None
-        self._media_playback_state = None
-        self._session = None
         self._current_preset = None
-        self._server_navigation_path = []  # Track SERVER navigation path
+        self._snapshot = EMPTY_SNAPSHOT
+        self._title_phase = 0
+        self._verified_roots = set()
+        self._fade: Optional[VolumeFade] = None
+        self._now_playing: Optional[NowPlayingTracker] = None
+        # Attributes as last written, to skip writes when a poll changed nothing
+        self._written = None
+        if coordinator.data is not None:
+            self._apply_poll(coordinator.data)
+
+    async def async_added_to_hass(self) -> None:
+        """Register for coordinator updates and start the title alternation timer"""
+        await super().async_added_to_hass()
+        self.async_on_remove(async_track_time_interval(
+            self.hass, self._async_alternate_title, TITLE_ALTERNATE_INTERVAL))
+        # Broadcast targets; entity IDs can be renamed, so register the current one
+        zones = self.hass.data.setdefault(DATA_ZONE_ENTITIES, {})
+        zones[self.entity_id] = self
+        entity_id = self.entity_id
+        self.async_on_remove(lambda: zones.pop(entity_id, None))
+        self.async_on_remove(lambda: self._fade.cancel() if self._fade is not None else None)
+        self._now_playing = NowPlayingTracker(self.hass, self._fire_now_playing, NOW_PLAYING_RDS_DEBOUNCE)
+        self.async_on_remove(self._now_playing.async_cancel)
+        if self.coordinator.data is not None:
+            self._track_now_playing()
+        if self.coordinator.data is None:
+            await self._async_restore_last_state()
+
+    async def _async_restore_last_state(self) -> None:
+        """Show the last known state until the first poll completes"""
+        last_state = await self.async_get_last_state()
+        if last_state is None:
+            return
+        if last_state.state in (STATE_OFF, STATE_IDLE, STATE_PLAYING):
+            self._pwstate = last_state.state
+        attributes = last_state.attributes
+        self._volume = attributes.get(ATTR_MEDIA_VOLUME_LEVEL, self._volume)
+        self._muted = attributes.get(ATTR_MEDIA_VOLUME_MUTED, self._muted)
+        self._source = attributes.get(ATTR_INPUT_SOURCE, self._source)
+        snapshot = MediaSnapshot.build(self._source, {}, None, self._source_features)
+        self._snapshot = MediaSnapshot(
+            snapshot.supported_features, snapshot.content_type,
+            attributes.get(ATTR_MEDIA_TITLE), None,
+            attributes.get(ATTR_MEDIA_ALBUM_NAME), attributes.get(ATTR_MEDIA_ARTIST))
+
+    def _load_source_tables(self) -> None:
+        """(Re)build source list and feature table when the device configuration changes"""
+        config = self._receiver.config
+        if config is self._config:
+            return
+        self._config = config
+        inputs = config.inputs.get(self._zone, ())
+        self._source_list = [item.name for item in inputs]
+        self._source_features = _source_features(inputs)
+
+    @callback
+    def _async_alternate_title(self, _now=None) -> None:
+        """Advance the song/frequency title phase"""
+        self._title_phase = (self._title_phase + 1) % TITLE_ALTERNATE_PHASES
+        if self._snapshot.alternate_title is not None and self._title_phase <= 1:
+            # Only the song <-> frequency transitions change the title
+            self.async_write_ha_state()
+
+    def _refresh_snapshot(self) -> None:
+        self._snapshot = MediaSnapshot.build(
+            self._source, self._media_meta, self._current_preset, self._source_features,
+            self._receiver.presets.get(self._current_preset) if self._current_preset else None)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        self._apply_poll(self.coordinator.data)
+        self._track_now_playing()
+        if self._state_key() != self._written:
+            self.async_write_ha_state()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        self._written = self._state_key()
+        super().async_write_ha_state()
+
+    def _state_key(self):
+        """Everything a state write would publish; compared instead of writing unchanged state"""
+        return (
+            self.available, self._pwstate, self._volume, self._muted, self._source, self._source_list,
+            self.supported_features, self.media_content_type, self.media_title, self.media_album,
+            self.media_artist, self.media_image_url, self._media_play_position,
+            self._media_play_position_updated, self._media_play_shuffle, self.extra_state_attributes,
+        )
 
-    async def async_update(self) -> None:
-        data = await self._do_api_get("<Main_Zone><Basic_Status>GetParam</Basic_Status></Main_Zone>")
-        if not data:
+    def _track_now_playing(self) -> None:
+        if self._now_playing is None:
             return
-        try:
-            tree = ET.fromstring(data)
-            for node in tree[0][0]:
-                if node.tag == "Power_Control":
-                    self._pwstate = STATE_IDLE if (node[0].text) == "On" else STATE_OFF
-                elif node.tag == "Volume":
-                    for voln in node:
-                        if voln.tag == "Lvl":
-                            self._volume = int(voln.find("Val").text) / 100
-                        elif voln.tag == "Mute":
-                            self._muted = voln.text == "On"
-                elif node.tag == "Input":
-                    txt = node.find("Input_Sel").text
-                    self._source = self._reverse_mapping[txt]
-                    self._device_source = txt.replace(" ", "_")
-            if self._pwstate != STATE_OFF:
-                await self._update_media_playing()
-        except ET.ParseError as e:
-            _LOGGER.error("Failed to parse XML response: %s", e)
-        except Exception as e:
-            _LOGGER.error("Error during update: %s", e)
+        if self._pwstate == STATE_OFF:
+            meta = {}
+        else:
+            meta = dict(self._media_meta)
+            if self._source == "Tuner":
+                meta["preset"] = self._current_preset
+        self._now_playing.update(self._source, meta)
+
+    @callback
+    def _fire_now_playing(self, data: dict) -> None:
+        self.hass.bus.async_fire(EVENT_NOW_PLAYING, {"entity_id": self.entity_id, **data})
+
+    def _apply_poll(self, data) -> None:
+        """Take this zone's Basic_Status and its source's Play_Info from the shared poll"""
+        status = data.zones.get(self._zone)
+        if status is None:
+            return
+        self._load_source_tables()
+        self._pwstate = STATE_IDLE if status.power else STATE_OFF
+        if status.volume is not None:
+            self._volume = status.volume
+        self._muted = status.muted
+        if status.input_sel:
+            item = self._receiver.config.input_by_param(self._zone, status.input_sel)
+            self._source = item.name if item else display_name(status.input_sel, None)
+            self._device_source = status.input_sel.replace(" ", "_")
+        self._play_info_section = status.src_name or None
+        if status.power:
+            if not self._play_info_section:
+                self._nullify_media_fields()
+            elif self._play_info_section in data.play_info:
+                self.coordinator.parse_timer.run_inline(
+                    self._update_media_playing, data.play_info[self._play_info_section])
+        self._refresh_snapshot()
+
+    @property
+    def zone(self) -> str:
+        return self._zone
 
     @property
     def state(self):
@@ -152,15 +422,7 @@ class YamahaRn301MP(MediaPlayerEntity):
 
     @property
     def supported_features(self):
-        if self._source == "Tuner":
-            return SUPPORT_TUNER
-        elif self._source == "Net Radio":
-            return SUPPORT_NET_RADIO
-        elif self._source == "Server":
-            return SUPPORT_SERVER
-        elif self._source in ("Optical", "CD", "Line 1", "Line 2", "Line 3"):
-            return SUPPORTED_PLAYBACK
-        return SUPPORT_YAMAHA
+        return self._snapshot.supported_features
 
     @property
     def volume_level(self):
@@ -203,46 +465,48 @@ class YamahaRn301MP(MediaPlayerEntity):
     @property
     def media_title(self):
         """Title of currently playing track"""
-        if self._source == "Tuner":
-            freq = self._media_meta.get("frequency", "")
-            station = self._media_meta.get("station", "")
-            song = self._media_meta.get("song", "")
-            
-            if self._current_preset:
-                title = f"#{self._current_preset}"
-            else:
-                title = "Tuner"
-            
-            if station:
-                title += f" {station}"
-            if song:
-                title += f" • {song}"
-            if freq:
-                title += f" ({freq})"
-            
-            return title
-        elif "song" in self._media_meta and "frequency" in self._media_meta:
-            return self._media_meta["song"] if datetime.now().second < 20 else self._media_meta["frequency"]
-        elif "song" in self._media_meta:
-            return self._media_meta.get("song")
-        elif "frequency" in self._media_meta:
-            return self._media_meta.get("frequency")
+        snapshot = self._snapshot
+        if snapshot.alternate_title is not None and self._title_phase:
+            return snapshot.alternate_title
+        return snapshot.title
 
     @property
     def media_album(self):
         """Album of currently playing track"""
-        return self._media_meta.get('album')
+        return self._snapshot.album
 
     @property
     def media_artist(self) -> Optional[str]:
         """Artist of currently playing track"""
-        return self._media_meta.get('artist')
+        return self._snapshot.artist
 
     @property
     def media_content_type(self):
-        if self._source == "Net Radio" or self._source == "Tuner":
-            return MediaType.CHANNEL
-        return MediaType.PLAYLIST
+        return self._snapshot.content_type
+
+    @property
+    def media_image_url(self):
+        """Album art or station logo; served through async_get_media_image"""
+        url = self._media_meta.get("art_url")
+        if url is None:
+            return None
+        art_id = self._media_meta.get("art_id")
+        # Distinct per image so the frontend's image hash changes with the art
+        return f"{url}?id={art_id}" if art_id else url
+
+    async def async_get_media_image(self):
+        """Serve artwork from the shared cache instead of the receiver's web server"""
+        url = self._media_meta.get("art_url")
+        if url is None:
+            return None, None
+        image = await async_get_artwork_cache(self.hass).async_get(url, self._media_meta.get("art_id"))
+        return image if image is not None else (None, None)
+
+    @property
+    def extra_state_attributes(self):
+        if self._receiver.wake_time is None:
+            return None
+        return {ATTR_WAKE_TIME: self._receiver.wake_time}
 
     @property
     def shuffle(self):
@@ -260,21 +524,55 @@ class YamahaRn301MP(MediaPlayerEntity):
         await self._set_power_state(False)
 
     async def async_set_volume_level(self, volume):
-        await self._do_api_put(
-            '<Main_Zone><Volume><Lvl><Val>{0}</Val><Exp>0</Exp><Unit></Unit></Lvl></Volume></Main_Zone>'.format(
-                int(volume * 100)))
+        await self._async_stop_fade()
+        await self._do_api_put(volume_command(self._zone, volume, self._receiver.config.volume))
 
     async def async_select_source(self, source):
-        await self._do_api_put(
-            '<Main_Zone><Input><Input_Sel>{0}</Input_Sel></Input></Main_Zone>'.format(SOURCE_MAPPING[source]))
+        if self._pwstate == STATE_OFF:
+            await self._async_wake_and_select(source)
+            return
+        item = self._receiver.config.input_by_name(self._zone, source)
+        param = item.param if item else SOURCE_MAPPING[source]
+        await self._do_api_put(input_command(self._zone, param))
+
+    async def _async_wake_and_select(self, source):
+        """Power on, select the input as soon as the unit accepts it, then poll the new source"""
+        reports = await MacroRunner(self._receiver, self._zone,
+                                    navigators=self.coordinator.list_navigator).async_run(
+            [{STEP_POWER: True}, {STEP_SOURCE: source}])
+        for report in reports:
+            if not report.ok:
+                _LOGGER.warning("Selecting %s from standby failed: %s", source, report.error)
+        _LOGGER.debug("%s woke up in %ss", self._host, self._receiver.wake_time)
+        # Not debounced: fetch Basic_Status and the new source's Play_Info now
+        await self.coordinator.async_refresh()
+
+    async def async_fade_volume(self, volume_level, duration):
+        """Ramp the volume to volume_level over duration seconds; other volume commands stop it"""
+        await self._async_stop_fade()
+        fade = self._fade = VolumeFade(self._receiver, self._zone, self._volume, volume_level, duration)
+        try:
+            result = await fade.async_run()
+        finally:
+            if self._fade is fade:
+                self._fade = None
+        self._volume = result["volume"]
+        self.async_write_ha_state()
+        return result
+
+    async def _async_stop_fade(self) -> None:
+        """Cancel a running fade so the next volume command isn't overwritten by it"""
+        fade = self._fade
+        if fade is not None:
+            self._fade = None
+            await fade.async_cancel()
 
     async def async_mute_volume(self, mute):
-        await self._do_api_put('<System><Volume><Mute>{0}</Mute></Volume></System>'.format('On' if mute else 'Off'))
+        await self._do_api_put(mute_command(self._zone, mute))
         self._muted = mute
 
     async def _media_play_control(self, command):
-        await self._do_api_put(
-            '<{0}><Play_Control><Playback>{1}</Playback></Play_Control></{0}>'.format(self._device_source, command))
+        await self._do_api_put(playback_command(self._device_source, command))
 
     async def async_media_play(self):
         """Play media"""
@@ -303,8 +601,15 @@ class YamahaRn301MP(MediaPlayerEntity):
     async def async_play_media(self, media_type, media_id, **kwargs):
         """Play media - for TUNER presets, NET RADIO stations, and SERVER tracks"""
         if self._source == "Tuner" and media_type == "preset":
-            await self._do_api_put(f'<Tuner><Play_Control><Preset><Preset_Sel>{media_id}</Preset_Sel></Preset></Play_Control></Tuner>')
-        elif self._source == "Net Radio" and media_type == "station":
+            await self._do_api_put(preset_command(media_id))
+        elif media_type == MEDIA_TYPE_TUNER:
+            if self._source != "Tuner":
+                await self.async_select_source("Tuner")
+            await self._async_tune(media_id)
+        elif media_type == "station":
+            if self._source != "Net Radio":
+                # A station from an automation: switch input first
+                await self.async_select_source("Net Radio")
             # Navigate to the station and play it
             await self._navigate_and_play_station(media_id)
         elif self._source == "Server" and media_type == "music":
@@ -316,44 +621,64 @@ class YamahaRn301MP(MediaPlayerEntity):
         else:
             _LOGGER.warning("Play media not supported for source %s with type %s", self._source, media_type)
 
-    async def _set_power_state(self, on):
-        await self._do_api_put(
-            '<System><Power_Control><Power>{0}</Power></Power_Control></System>'.format("On" if on else "Standby"))
+    async def _async_tune(self, media_id):
+        """Tune to "FM:9870", a scanned station name or a preset title with one PUT"""
+        wanted = media_id.strip().casefold()
+        for station in self.coordinator.stations:
+            if wanted in (station.key.casefold(), (station.name or "").casefold()):
+                await self._do_api_put(tune_command(station.band, station.val, station.exp, station.unit))
+                break
+        else:
+            band, _, val = media_id.strip().upper().partition(":")
+            if band in BANDS and val.isdigit():
+                await self._do_api_put(tune_command(band, int(val), BANDS[band].exp, BANDS[band].unit))
+            else:
+                preset = next((number for number, title in self._receiver.presets.items()
+                               if title.casefold() == wanted), None)
+                if preset is None:
+                    _LOGGER.warning("Unknown Tuner station: %s", media_id)
+                    return
+                await self._do_api_put(preset_command(preset))
+        await self.coordinator.async_request_refresh()
+
+    async def async_scan_tuner(self, band="FM", step=None):
+        """Build the Tuner station table in the background while the Tuner is not listened to"""
+        if self.coordinator.in_standby():
+            # The Tuner rejects tuning in Standby, so the scan would stop at the first step
+            raise ServiceValidationError(
+                f"{self._receiver.host} is in Standby; switch it on (to any other input) to scan the Tuner")
+        if not self.coordinator.async_start_tuner_scan(band, step):
+            _LOGGER.warning("A Tuner scan of %s is already running", self._receiver.host)
 
-    async def _do_api_request(self, data) -> str:
-        data = '<?xml version="1.0" encoding="utf-8"?>' + data
-        try:
-            if self._session is None:
-                self._session = async_get_clientsession(self.hass)
-            
-            timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
-            async with self._session.post(self._base_url, data=data, timeout=timeout) as req:
-                if req.status != 200:
-                    _LOGGER.warning("Error doing API request, %d, %s", req.status, data)
-                else:
-                    _LOGGER.debug("API request ok %d", req.status)
-                return await req.text()
-        except aiohttp.ClientError as e:
-            _LOGGER.error("Request failed: %s", e)
-            return ""
-        except Exception as e:
-            _LOGGER.error("Unexpected error during API request: %s", e)
-            return ""
+    async def _set_power_state(self, on):
+        await self._do_api_put(power_command(self._zone, on))
+
+    async def async_run_macro(self, steps):
+        """Run a command sequence without waiting for polls in between; reports per-step timing"""
+        if any(STEP_VOLUME in step for step in steps):
+            await self._async_stop_fade()
+        runner = MacroRunner(self._receiver, self._zone, self._play_info_section,
+                             self.coordinator.list_navigator)
+        reports = await runner.async_run(steps)
+        await self.coordinator.async_request_refresh()
+        return {
+            "completed": len(reports) == len(steps) and all(report.ok for report in reports),
+            "total_ms": round(sum(report.command_ms + report.ready_ms for report in reports), 1),
+            "steps": [report.as_dict() for report in reports],
+        }
 
     async def _do_api_get(self, data) -> str:
-        request = '<YAMAHA_AV cmd="GET">' + data + '</YAMAHA_AV>'
-        response = await self._do_api_request(request)
-        return response
+        return await self._receiver.async_get(data)
 
     async def _do_api_put(self, data) -> str:
-        data = '<YAMAHA_AV cmd="PUT">' + data + '</YAMAHA_AV>'
-        return await self._do_api_request(data)
+        return await self._receiver.async_put(data)
 
     def _nullify_media_fields(self) -> None:
         """Set media fields to null as we don't require them on certain channels"""
         self._media_meta = {}
         self._media_playing = False
         self._pwstate = STATE_IDLE if self._pwstate != STATE_OFF else STATE_OFF
+        self._update_media_position(None)
         if self._source != "Tuner":
             self._current_preset = None
 
@@ -368,7 +693,33 @@ class YamahaRn301MP(MediaPlayerEntity):
         else:
             self._media_playing = False
 
-    async def _update_media_playing(self):
+    def _update_media_position(self, reported) -> None:
+        """Re-stamp the position only when it departs from the extrapolated one
+
+        Home Assistant interpolates media_position from media_position_updated_at
+        while playing, so a steadily advancing track needs no new timestamp.
+        A seek, pause/resume or track change shows up as a deviation.
+        """
+        advancing = self._media_playing and self._pwstate == STATE_PLAYING
+        if reported is None:
+            self._media_play_position = None
+            self._media_play_position_updated = None
+            self._media_position_advancing = False
+            return
+        now = dt_util.utcnow()
+        if self._media_play_position is not None and self._media_play_position_updated is not None \
+                and advancing == self._media_position_advancing:
+            expected = self._media_play_position
+            if advancing:
+                expected += (now - self._media_play_position_updated).total_seconds()
+            if abs(reported - expected) <= POSITION_DRIFT_TOLERANCE:
+                return
+        self._media_play_position = reported
+        self._media_play_position_updated = now
+        self._media_position_advancing = advancing
+
+    def _update_media_playing(self, data):
+        """Parse a Play_Info response for the current source"""
         media_meta_mapping = {
             'Artist': 'artist',
             'Station': 'song',
@@ -380,20 +731,11 @@ class YamahaRn301MP(MediaPlayerEntity):
             'Program_Type': 'genre',
             'Radio_Text_B': 'description',
         }
-        device_mapping = {
-            "Spotify": "Spotify",
-            "NET_RADIO": "NET_RADIO",
-            "SERVER": "SERVER",
-            "TUNER": "Tuner"
-        }
 
         try:
-            if self._device_source in device_mapping:
-                data = await self._do_api_get(
-                    "<{0}><Play_Info>GetParam</Play_Info></{0}>".format(device_mapping[self._device_source]))
-                if not data:
-                    return
+            if data:
                 self._media_meta = {}
+                reported_position = None
                 tree = ET.fromstring(data)
                 for node in tree[0][0]:
                     try:
@@ -401,12 +743,17 @@ class YamahaRn301MP(MediaPlayerEntity):
                             self._media_play_repeat = node.text == "On"
                             self._media_play_shuffle = node.text == "On"
                         elif node.tag == "Play_Time":
-                            self._media_play_position = int(node.text)
-                            self._media_play_position_updated = dt_util.utcnow()
+                            reported_position = int(node.text)
                         elif node.tag == "Meta_Info":
                             for meta in node:
                                 if meta.tag in media_meta_mapping and meta.text:
                                     self._media_meta[media_meta_mapping[meta.tag]] = meta.text.replace('&amp;', '&')
+                        elif node.tag == "Album_ART":
+                            url = node.findtext("URL")
+                            if url:
+                                # Relative to the receiver; the ID changes with the image, the URL may not
+                                self._media_meta["art_url"] = f"http://{self._receiver.host}{url}"
+                                self._media_meta["art_id"] = node.findtext("ID")
                         elif node.tag == "Playback_Info":
                             self._set_playback_info(node.text)
                         elif node.tag == "Signal_Info":
@@ -435,9 +782,8 @@ class YamahaRn301MP(MediaPlayerEntity):
                                 self._current_preset = preset_node.text
                     except Exception as e:
                         _LOGGER.warning("Error parsing media node: %s", e)
-
-            else:
-                self._nullify_media_fields()
+                # Applied after the loop as Playback_Info may follow Play_Time
+                self._update_media_position(reported_position)
         except ET.ParseError as e:
             _LOGGER.error("Failed to parse XML response in media update: %s", e)
         except Exception as e:
@@ -453,9 +799,9 @@ class YamahaRn301MP(MediaPlayerEntity):
             
             next_preset = (current % 8) + 1  # Cycle 1-8
             
-            await self._do_api_put(f'<Tuner><Play_Control><Preset><Preset_Sel>{next_preset}</Preset_Sel></Preset></Play_Control></Tuner>')
+            await self._do_api_put(preset_command(next_preset))
             self._current_preset = str(next_preset)
-            await self.async_update()
+            await self.coordinator.async_request_refresh()
         except (ValueError, TypeError) as e:
             _LOGGER.warning("Error switching to next preset: %s", e)
 
@@ -469,14 +815,16 @@ class YamahaRn301MP(MediaPlayerEntity):
             
             prev_preset = ((current - 2) % 8) + 1  # Cycle 1-8
             
-            await self._do_api_put(f'<Tuner><Play_Control><Preset><Preset_Sel>{prev_preset}</Preset_Sel></Preset></Play_Control></Tuner>')
+            await self._do_api_put(preset_command(prev_preset))
             self._current_preset = str(prev_preset)
-            await self.async_update()
+            await self.coordinator.async_request_refresh()
         except (ValueError, TypeError) as e:
             _LOGGER.warning("Error switching to previous preset: %s", e)
 
     async def async_browse_media(self, media_content_type=None, media_content_id=None):
-        """Browse NET RADIO stations and SERVER media"""
+        """Browse NET RADIO stations, SERVER media and Tuner presets and scanned stations"""
+        if self._source == "Tuner":
+            return self._browse_tuner()
         if self._source == "Net Radio":
             try:
                 if media_content_id is None:
@@ -502,254 +850,187 @@ class YamahaRn301MP(MediaPlayerEntity):
         else:
             return None
 
+    async def _async_root_page(self, source, fetch):
+        """Top-level ListPage of a source, served from the persisted cache once per session
+
+        The first browse after a restart returns the cached page at once and
+        re-reads the device in the background; later browses are always live.
+        """
+        store = self.coordinator.store
+        cached = store.root_listing(source) if store is not None else None
+        if cached is not None and source not in self._verified_roots:
+            self._verified_roots.add(source)
+            self.hass.async_create_task(self._async_revalidate_root_page(source, fetch))
+            return cached
+        self._verified_roots.add(source)
+        return await self._async_fetch_root_page(source, fetch)
+
+    async def _async_revalidate_root_page(self, source, fetch):
+        with request_priority(PRIORITY_BACKGROUND):
+            await self._async_fetch_root_page(source, fetch)
+
+    async def _async_fetch_root_page(self, source, fetch):
+        page = await fetch()
+        if page is not None and self.coordinator.store is not None:
+            self.coordinator.store.async_set_root_listing(source, page)
+        return page
+
+    async def _fetch_net_radio_root_page(self):
+        try:
+            return await self.coordinator.net_radio.async_open(())
+        except NavigationError as e:
+            _LOGGER.warning("NET RADIO browse failed: %s", e)
+            return None
+
     async def _browse_net_radio_root(self):
         """Browse NET RADIO root menu"""
-        data = await self._do_api_get("<NET_RADIO><List_Info>GetParam</List_Info></NET_RADIO>")
-        if not data:
-            _LOGGER.warning("No data received from NET RADIO browse")
+        page = await self._async_root_page("NET_RADIO", self._fetch_net_radio_root_page)
+        if page is None:
             return None
+
+        children = await self.coordinator.parse_timer.async_build(
+            self._create_net_radio_children, len(page), page, (), (ATTR_CONTAINER,))
         
-        try:
-            tree = ET.fromstring(data)
-            children = []
-            
-            for node in tree[0][0]:
-                if node.tag == "Current_List":
-                    for line in node:
-                        if line.tag.startswith("Line_"):
-                            txt_node = line.find("Txt")
-                            attr_node = line.find("Attribute")
-                            
-                            if txt_node is not None and attr_node is not None:
-                                title = txt_node.text
-                                attr = attr_node.text
-                                
-                                if title and attr == "Container":
-                                    children.append(BrowseMedia(
-                                        media_class=MediaClass.DIRECTORY,
-                                        media_content_id=f"menu:{line.tag}",
-                                        media_content_type="folder",
-                                        title=title,
-                                        can_play=False,
-                                        can_expand=True,
-                                    ))
-            
-            if not children:
-                _LOGGER.warning("No browsable items found in NET RADIO menu")
-                return BrowseMedia(
-                    media_class=MediaClass.DIRECTORY,
-                    media_content_id="root",
-                    media_content_type="folder",
-                    title="NET RADIO",
-                    can_play=False,
-                    can_expand=False,
-                    children=[BrowseMedia(
-                        media_class=MediaClass.DIRECTORY,
-                        media_content_id="empty",
-                        media_content_type="info",
-                        title="No stations available",
-                        can_play=False,
-                        can_expand=False,
-                    )],
-                )
-            
+        if not children:
+            _LOGGER.warning("No browsable items found in NET RADIO menu")
             return BrowseMedia(
                 media_class=MediaClass.DIRECTORY,
                 media_content_id="root",
                 media_content_type="folder",
                 title="NET RADIO",
                 can_play=False,
-                can_expand=True,
-                children=children,
+                can_expand=False,
+                children=[BrowseMedia(
+                    media_class=MediaClass.DIRECTORY,
+                    media_content_id="empty",
+                    media_content_type="info",
+                    title="No stations available",
+                    can_play=False,
+                    can_expand=False,
+                )],
             )
-        except ET.ParseError as e:
-            _LOGGER.error("Failed to parse XML response in browse: %s", e)
-            return None
+        
+        return BrowseMedia(
+            media_class=MediaClass.DIRECTORY,
+            media_content_id="root",
+            media_content_type="folder",
+            title="NET RADIO",
+            can_play=False,
+            can_expand=True,
+            children=children,
+        )
 
     async def _browse_net_radio_item(self, media_content_id):
         """Browse specific NET RADIO menu item"""
         if not media_content_id.startswith("menu:"):
             return None
         
-        line_id = media_content_id.split(":", 1)[1]
+        names = split_path(media_content_id.split(":", 1)[1])
         
-        # Navigate to the menu item
-        await self._do_api_put(f'<NET_RADIO><List_Control><Direct_Sel>{line_id}</Direct_Sel></List_Control></NET_RADIO>')
-        
-        # Get the new list
-        data = await self._do_api_get("<NET_RADIO><List_Info>GetParam</List_Info></NET_RADIO>")
-        if not data:
+        # Open the folder by name, wherever the device cursor is
+        try:
+            page = await self.coordinator.net_radio.async_open(names)
+        except NavigationError as e:
+            _LOGGER.warning("NET RADIO browse failed: %s", e)
             return None
         
-        try:
-            tree = ET.fromstring(data)
-            children = []
-            menu_name = "NET RADIO"
-            
-            for node in tree[0][0]:
-                if node.tag == "Menu_Name":
-                    menu_name = node.text
-                elif node.tag == "Current_List":
-                    for line in node:
-                        if line.tag.startswith("Line_"):
-                            txt_node = line.find("Txt")
-                            attr_node = line.find("Attribute")
-                            
-                            if txt_node is not None and attr_node is not None:
-                                title = txt_node.text
-                                attr = attr_node.text
-                                
-                                if title:
-                                    if attr == "Container":
-                                        children.append(BrowseMedia(
-                                            media_class=MediaClass.DIRECTORY,
-                                            media_content_id=f"menu:{line.tag}",
-                                            media_content_type="folder",
-                                            title=title,
-                                            can_play=False,
-                                            can_expand=True,
-                                        ))
-                                    elif attr == "Item":
-                                        children.append(BrowseMedia(
-                                            media_class=MediaClass.TRACK,
-                                            media_content_id=f"station:{line.tag}",
-                                            media_content_type="station",
-                                            title=title,
-                                            can_play=True,
-                                            can_expand=False,
-                                        ))
-            
+        children = await self.coordinator.parse_timer.async_build(
+            self._create_net_radio_children, len(page), page, names, (ATTR_CONTAINER, ATTR_ITEM))
+        
+        return BrowseMedia(
+            media_class=MediaClass.DIRECTORY,
+            media_content_id=media_content_id,
+            media_content_type="folder",
+            title=page.menu_name,
+            can_play=False,
+            can_expand=True,
+            children=children,
+        )
+
+    def _create_net_radio_children(self, page, parent, attributes):
+        return [
+            self._create_net_radio_browse_media(item, parent)
+            for item in page.items
+            if item.attribute in attributes
+        ]
+
+    def _create_net_radio_browse_media(self, item, parent):
+        """Create BrowseMedia object for a NET RADIO folder or station
+
+        Content IDs carry the title path (e.g. "station:Bookmarks/Jazz FM"),
+        which stays valid wherever the device cursor is.
+        """
+        path = join_path(parent + (item.title,))
+        if item.attribute == ATTR_CONTAINER:
             return BrowseMedia(
                 media_class=MediaClass.DIRECTORY,
-                media_content_id=media_content_id,
+                media_content_id=f"menu:{path}",
                 media_content_type="folder",
-                title=menu_name,
+                title=item.title,
                 can_play=False,
                 can_expand=True,
-                children=children,
             )
-        except ET.ParseError as e:
-            _LOGGER.error("Failed to parse XML response in browse item: %s", e)
-            return None
+        return BrowseMedia(
+            media_class=MediaClass.TRACK,
+            media_content_id=f"station:{path}",
+            media_content_type="station",
+            title=item.title,
+            can_play=True,
+            can_expand=False,
+        )
 
     async def _navigate_and_play_station(self, media_id):
-        """Navigate to and play a NET RADIO station"""
-        if not media_id.startswith("station:"):
+        """Play a NET RADIO station by title path, e.g. "Bookmarks/Jazz FM" """
+        path = media_id.split(":", 1)[1] if media_id.startswith("station:") else media_id
+        try:
+            if LEGACY_LINE_ID.fullmatch(path):
+                # Line ID relative to the current device menu
+                await self.coordinator.net_radio.async_select_line(int(path[len("Line_"):]), play=True)
+            else:
+                await self.coordinator.net_radio.async_play(split_path(path))
+        except NavigationError as e:
+            _LOGGER.warning("Could not play NET RADIO station %s: %s", path, e)
             return
-        
-        line_id = media_id.split(":", 1)[1]
-        
-        # Select the station
-        await self._do_api_put(f'<NET_RADIO><List_Control><Direct_Sel>{line_id}</Direct_Sel></List_Control></NET_RADIO>')
-        
-        # Start playing
-        await self._do_api_put('<NET_RADIO><Play_Control><Playback>Play</Playback></Play_Control></NET_RADIO>')
+        await self.coordinator.async_request_refresh()
 
     async def _navigate_and_play_track(self, media_id):
         """Navigate to and play a SERVER track"""
         if not media_id.startswith("server_track:"):
             return
         
-        
-        line_id = self._extract_line_id_from_path(media_id)
-        if not line_id:
-            _LOGGER.warning(f"Could not extract line_id from {media_id}")
+        try:
+            path, _line = _parse_server_content_id(media_id)
+        except ValueError:
+            path = ()
+        if not path:
+            _LOGGER.warning("Could not extract track position from %s", media_id)
             return
         
-        
-        # Play the track directly - API should be in correct location
-        await self._do_api_put(f'<SERVER><List_Control><Direct_Sel>{line_id}</Direct_Sel></List_Control></SERVER>')
-        await asyncio.sleep(0.2)
-        
-        # Start playing
-        await self._do_api_put('<SERVER><Play_Control><Playback>Play</Playback></Play_Control></SERVER>')
-
-    def _extract_line_id_from_path(self, media_id):
-        """Extract Line_X from media path"""
-        parts = media_id.split(":")
-        if len(parts) < 3:
-            return None
-        
-        # Extract Line_X from the path - it should be the last part
-        line_id = parts[-1] if parts[-1].startswith("Line_") else None
-        
-        if not line_id:
-            # Fallback - find any part that looks like Line_X
-            for part in reversed(parts):
-                if part.startswith("Line_"):
-                    line_id = part
-                    break
-        
-        return line_id
-
-    async def _parse_server_xml_response(self, data, base_path=""):
-        """Parse SERVER XML response and return structured data"""
         try:
-            tree = ET.fromstring(data)
-            menu_name = "Server"
-            menu_layer = 1
-            current_line = 1
-            max_line = 1
-            items = []
-            
-            for node in tree[0][0]:
-                if node.tag == "Menu_Name":
-                    menu_name = node.text or "Server"
-                elif node.tag == "Menu_Layer":
-                    menu_layer = int(node.text) if node.text else 1
-                elif node.tag == "Cursor_Position":
-                    for cursor_node in node:
-                        if cursor_node.tag == "Current_Line":
-                            current_line = int(cursor_node.text) if cursor_node.text else 1
-                        elif cursor_node.tag == "Max_Line":
-                            max_line = int(cursor_node.text) if cursor_node.text else 1
-                elif node.tag == "Current_List":
-                    for line in node:
-                        if line.tag.startswith("Line_"):
-                            txt_node = line.find("Txt")
-                            attr_node = line.find("Attribute")
-                            
-                            if txt_node is not None and attr_node is not None and txt_node.text:
-                                items.append({
-                                    'line_id': line.tag,
-                                    'title': txt_node.text,
-                                    'attribute': attr_node.text
-                                })
-            
-            return {
-                'menu_name': menu_name,
-                'menu_layer': menu_layer,
-                'current_line': current_line,
-                'max_line': max_line,
-                'items': items
-            }
-        except ET.ParseError as e:
-            _LOGGER.error("Failed to parse SERVER XML response: %s", e)
-            return None
+            await self.coordinator.server.async_play(path)
+        except NavigationError as e:
+            _LOGGER.warning("Could not play SERVER track %s: %s", media_id, e)
+            return
+        await self.coordinator.async_request_refresh()
 
-    def _create_browse_media_children(self, items, base_path="", menu_layer=1):
-        """Create BrowseMedia children from parsed items"""
+    def _create_browse_media_children(self, page):
+        """Create BrowseMedia children for every item of a ListPage"""
         children = []
-        
-        for item in items:
-            title = item['title']
-            line_id = item['line_id']
-            attribute = item['attribute']
-            
-            if attribute == "Container":
+        album_level = page.menu_layer > 4
+
+        for item in page.items:
+            if item.attribute == ATTR_CONTAINER:
                 # Folder/Album - extend current path
-                new_path = f"{base_path}:{line_id}" if base_path else line_id
                 children.append(self._create_folder_browse_media(
-                    title=title,
-                    content_id=f"server_menu:root:{new_path}",
-                    media_type="album" if menu_layer > 4 else "folder"
+                    title=item.title,
+                    content_id=f"server_menu:root:{page.item_path(item)}",
+                    media_type="album" if album_level else "folder"
                 ))
-            elif attribute == "Item":
+            elif item.attribute == ATTR_ITEM:
                 # Track/File
-                track_path = f"{base_path}:{line_id}" if base_path else line_id
                 children.append(self._create_track_browse_media(
-                    title=title,
-                    content_id=f"server_track:root:{track_path}"
+                    title=item.title,
+                    content_id=f"server_track:root:{page.item_path(item)}"
                 ))
         
         return children
@@ -780,14 +1061,15 @@ class YamahaRn301MP(MediaPlayerEntity):
             thumbnail=None,
         )
 
-    def _add_pagination_controls(self, children, current_line, max_line, base_content_id):
+    def _add_pagination_controls(self, children, page, path):
         """Add pagination controls to children list"""
-        if max_line > 8:
+        if page.max_line > PAGE_SIZE:
+            base_content_id = f"server_menu:root:{page.base_path}" if path else "server_menu:root:"
             # Add "Previous Page" if not on first page
-            if current_line > 1:
+            if page.first_line > 1:
                 children.append(BrowseMedia(
                     media_class=MediaClass.DIRECTORY,
-                    media_content_id=f"server_page_up:{base_content_id}",
+                    media_content_id=f"{base_content_id}@{page.first_line - PAGE_SIZE}",
                     media_content_type="info",
                     title="⬆️ Previous Page",
                     can_play=False,
@@ -796,10 +1078,10 @@ class YamahaRn301MP(MediaPlayerEntity):
                 ))
             
             # Add "Next Page" if not on last page
-            if current_line + 7 < max_line:
+            if page.first_line + PAGE_SIZE <= page.max_line:
                 children.append(BrowseMedia(
                     media_class=MediaClass.DIRECTORY,
-                    media_content_id=f"server_page_down:{base_content_id}",
+                    media_content_id=f"{base_content_id}@{page.first_line + PAGE_SIZE}",
                     media_content_type="info",
                     title="⬇️ Next Page",
                     can_play=False,
@@ -808,24 +1090,22 @@ class YamahaRn301MP(MediaPlayerEntity):
                 ))
             
             # Add page info
-            current_page = (current_line - 1) // 8 + 1
-            total_pages = (max_line - 1) // 8 + 1
+            current_page = (page.first_line - 1) // PAGE_SIZE + 1
+            total_pages = (page.max_line - 1) // PAGE_SIZE + 1
             children.append(BrowseMedia(
                 media_class=MediaClass.DIRECTORY,
                 media_content_id="page_info",
                 media_content_type="info",
-                title=f"📄 Page {current_page} of {total_pages} ({max_line} items)",
+                title=f"📄 Page {current_page} of {total_pages} ({page.max_line} items)",
                 can_play=False,
                 can_expand=False,
                 thumbnail=None,
             ))
 
-    def _add_back_navigation(self, children, menu_layer, parts):
+    def _add_back_navigation(self, children, path):
         """Add back navigation control"""
-        if menu_layer > 1:
-            # Create parent path by removing last element
-            parent_parts = parts[2:-1] if len(parts) > 3 else []
-            parent_path = ":".join(parent_parts)
+        if path:
+            parent_path = ":".join(str(line) for line in path[:-1])
             back_id = f"server_menu:root:{parent_path}" if parent_path else "server_root"
             
             children.insert(0, BrowseMedia(
@@ -837,22 +1117,53 @@ class YamahaRn301MP(MediaPlayerEntity):
                 can_expand=True,
             ))
 
+    async def _fetch_server_root_page(self):
+        try:
+            return await self.coordinator.server.async_open(())
+        except NavigationError as e:
+            _LOGGER.warning("SERVER browse failed: %s", e)
+            return None
+
+    def _browse_tuner(self):
+        """Presets, then the stations found by scan_tuner; both flat lists"""
+        children = [
+            BrowseMedia(
+                media_class=MediaClass.CHANNEL,
+                media_content_id=number,
+                media_content_type="preset",
+                title=f"#{number} {title}".strip(),
+                can_play=True,
+                can_expand=False,
+            )
+            for number, title in sorted(self._receiver.presets.items(), key=_preset_key)
+        ]
+        for station in self.coordinator.stations:
+            children.append(BrowseMedia(
+                media_class=MediaClass.CHANNEL,
+                media_content_id=station.key,
+                media_content_type=MEDIA_TYPE_TUNER,
+                title=f"{station.name} ({station.frequency})" if station.name else station.frequency,
+                can_play=True,
+                can_expand=False,
+            ))
+        return BrowseMedia(
+            media_class=MediaClass.DIRECTORY,
+            media_content_id="tuner_root",
+            media_content_type="folder",
+            title="Tuner",
+            can_play=False,
+            can_expand=True,
+            children=children,
+        )
+
     async def _browse_server_root(self):
         """Browse SERVER root menu (server selection)"""
-        # Reset to root level first
-        await self._reset_server_to_root()
-        
-        # Get current server list
-        data = await self._do_api_get("<SERVER><List_Info>GetParam</List_Info></SERVER>")
-        if not data:
-            _LOGGER.warning("No data received from SERVER browse")
-            return None
-        
-        parsed_data = await self._parse_server_xml_response(data)
+        parsed_data = await self._async_root_page("SERVER", self._fetch_server_root_page)
         if not parsed_data:
             return None
         
-        children = self._create_browse_media_children(parsed_data['items'], "", parsed_data['menu_layer'])
+        children = await self.coordinator.parse_timer.async_build(
+            self._create_browse_media_children, len(parsed_data), parsed_data)
         
         if not children:
             children.append(BrowseMedia(
@@ -868,198 +1179,56 @@ class YamahaRn301MP(MediaPlayerEntity):
             media_class=MediaClass.DIRECTORY,
             media_content_id="server_root",
             media_content_type="folder",
-            title=parsed_data['menu_name'],
+            title=parsed_data.menu_name,
             can_play=False,
             can_expand=True,
             children=children,
         )
 
     async def _browse_server_item(self, media_content_id):
-        """Browse specific SERVER menu item (folders/albums/tracks)"""
-        
-        # Handle pagination commands
-        if media_content_id.startswith("server_page_up:"):
-            original_id = media_content_id[15:]  # Remove "server_page_up:" prefix
-            await self._do_api_put('<SERVER><List_Control><Page>Up</Page></List_Control></SERVER>')
-            await asyncio.sleep(0.2)
-            return await self._get_current_server_list(original_id)
-        elif media_content_id.startswith("server_page_down:"):
-            original_id = media_content_id[17:]  # Remove "server_page_down:" prefix
-            await self._do_api_put('<SERVER><List_Control><Page>Down</Page></List_Control></SERVER>')
-            await asyncio.sleep(0.2)
-            return await self._get_current_server_list(original_id)
+        """Browse specific SERVER menu item (folders/albums/tracks)
+
+        Content IDs carry the absolute position ("server_menu:root:1:12@17" is
+        the page holding line 17 of the 12th entry of the first server), so
+        concurrent browsers each get their own view; the shared navigator
+        only moves the device cursor as far as a request needs.
+        """
+        if media_content_id.startswith(("server_page_up:", "server_page_down:")):
+            # Paging IDs from before positions were absolute: show that folder again
+            media_content_id = media_content_id.split(":", 1)[1]
         
         if not media_content_id.startswith("server_menu:"):
-            return await self._browse_server_back(media_content_id)
-        
-        # Parse the path
-        parts = media_content_id.split(":")
-        if len(parts) < 3:
             return None
         
-        # Navigate to the requested path
-        data = await self._navigate_to_server_path(parts[2:])
-        if not data:
+        try:
+            path, line = _parse_server_content_id(media_content_id)
+        except ValueError:
+            _LOGGER.warning("Invalid SERVER content ID %s", media_content_id)
             return None
         
-        # Parse the response
-        parsed_data = await self._parse_server_xml_response(data, ":".join(parts[2:]))
-        if not parsed_data:
+        try:
+            parsed_data = await self.coordinator.server.async_open(path, line)
+        except NavigationError as e:
+            _LOGGER.warning("SERVER browse failed: %s", e)
             return None
+        parsed_data.base_path = ":".join(str(part) for part in path)
         
         # Create children from items
-        children = self._create_browse_media_children(
-            parsed_data['items'], 
-            ":".join(parts[2:]), 
-            parsed_data['menu_layer']
-        )
+        children = await self.coordinator.parse_timer.async_build(
+            self._create_browse_media_children, len(parsed_data), parsed_data)
         
         # Add pagination controls
-        self._add_pagination_controls(
-            children, 
-            parsed_data['current_line'], 
-            parsed_data['max_line'], 
-            media_content_id
-        )
+        self._add_pagination_controls(children, parsed_data, path)
         
         # Add back navigation
-        self._add_back_navigation(children, parsed_data['menu_layer'], parts)
-
-        return BrowseMedia(
-            media_class=MediaClass.DIRECTORY,
-            media_content_id=media_content_id,
-            media_content_type="folder",
-            title=parsed_data['menu_name'],
-            can_play=False,
-            can_expand=True,
-            children=children,
-        )
-
-    async def _navigate_to_server_path(self, path_parts):
-        """Navigate to a specific server path and return the data"""
-        # Always reset to root first to ensure consistency
-        await self._reset_server_to_root()
-        
-        # Navigate through the path step by step
-        for step in path_parts:
-            await self._do_api_put(f'<SERVER><List_Control><Direct_Sel>{step}</Direct_Sel></List_Control></SERVER>')
-            await asyncio.sleep(0.5)
-        
-        # Get the final list after navigation - with retry for Busy status
-        for attempt in range(5):
-            data = await self._do_api_get("<SERVER><List_Info>GetParam</List_Info></SERVER>")
-            if data and 'Menu_Status>Busy<' not in data:
-                return data
-            await asyncio.sleep(0.5)
-        
-        return None
-
-    async def _browse_server_back(self, media_content_id):
-        """Handle SERVER back navigation"""
-        if media_content_id.startswith("server_back:"):
-            # Navigate back using Return command
-            await self._do_api_put('<SERVER><List_Control><Cursor>Return</Cursor></List_Control></SERVER>')
-            
-            # Get the current list after going back
-            data = await self._do_api_get("<SERVER><List_Info>GetParam</List_Info></SERVER>")
-            if not data:
-                return None
-            
-            try:
-                tree = ET.fromstring(data)
-                menu_layer = 1
-                
-                # Check menu layer to determine content ID format
-                for node in tree[0][0]:
-                    if node.tag == "Menu_Layer":
-                        menu_layer = int(node.text) if node.text else 1
-                        break
-                
-                # Return browse result for the new level
-                if menu_layer == 1:
-                    return await self._browse_server_root()
-                else:
-                    return await self._browse_server_item("server_menu:current")
-                    
-            except ET.ParseError as e:
-                _LOGGER.error("Failed to parse XML response in server back navigation: %s", e)
-                return None
-        
-        return None
+        self._add_back_navigation(children, path)
 
-    async def _get_current_server_list(self, media_content_id):
-        """Get current SERVER list without navigation reset - used for pagination"""
-        
-        # Parse the original path for context
-        parts = media_content_id.split(":")
-        
-        # Get the current list state after pagination
-        for attempt in range(5):
-            data = await self._do_api_get("<SERVER><List_Info>GetParam</List_Info></SERVER>")
-            if data and 'Menu_Status>Busy<' not in data:
-                break
-            await asyncio.sleep(0.5)
-        else:
-            _LOGGER.warning("No data received in _get_current_server_list")
-            return None
-        
-        # Parse the response
-        current_path = ":".join(parts[2:]) if len(parts) > 2 else ""
-        parsed_data = await self._parse_server_xml_response(data, current_path)
-        if not parsed_data:
-            return None
-        
-        # Create children from items
-        children = self._create_browse_media_children(
-            parsed_data['items'], 
-            current_path, 
-            parsed_data['menu_layer']
-        )
-        
-        # Add pagination controls
-        self._add_pagination_controls(
-            children, 
-            parsed_data['current_line'], 
-            parsed_data['max_line'], 
-            media_content_id
-        )
-        
-        # Add back navigation
-        self._add_back_navigation(children, parsed_data['menu_layer'], parts)
-        
         return BrowseMedia(
             media_class=MediaClass.DIRECTORY,
             media_content_id=media_content_id,
             media_content_type="folder",
-            title=parsed_data['menu_name'],
+            title=parsed_data.menu_name,
             can_play=False,
             can_expand=True,
             children=children,
         )
-
-    async def _reset_server_to_root(self):
-        """Reset SERVER navigation to root level"""
-        data = await self._do_api_get("<SERVER><List_Info>GetParam</List_Info></SERVER>")
-        if data:
-            try:
-                tree = ET.fromstring(data)
-                menu_layer = 1
-                for node in tree[0][0]:
-                    if node.tag == "Menu_Layer":
-                        menu_layer = int(node.text) if node.text else 1
-                        break
-                
-                # Navigate back to root level if not already there
-                while menu_layer > 1:
-                    await self._do_api_put('<SERVER><List_Control><Cursor>Return</Cursor></List_Control></SERVER>')
-                    data = await self._do_api_get("<SERVER><List_Info>GetParam</List_Info></SERVER>")
-                    if not data:
-                        break
-                    tree = ET.fromstring(data)
-                    menu_layer = 1
-                    for node in tree[0][0]:
-                        if node.tag == "Menu_Layer":
-                            menu_layer = int(node.text) if node.text else 1
-                            break
-            except ET.ParseError:
-                pass
@@ -0,0 +1,322 @@
+"""Path navigation of List_Info menus (NET RADIO, SERVER) sharing one device cursor."""
+import abc
+import asyncio
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+from typing import Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import quote, unquote
+
+from .const import LIST_READY_INTERVAL, LIST_READY_TIMEOUT, PLAY_VERIFY_INTERVAL, PLAY_VERIFY_TIMEOUT
+from .listing import PAGE_SIZE, ListItem, ListPage, page_start, parse_list_info
+from .receiver import (
+    PRIORITY_INTERACTIVE,
+    RequestScheduler,
+    YamahaReceiver,
+    current_request_priority,
+    direct_select_command,
+    list_info_request,
+    play_info_request,
+    playback_command,
+    response_ok,
+    response_section,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Menu depth beyond which Return is assumed not to be taking effect
+MAX_MENU_DEPTH = 16
+
+
+class NavigationError(Exception):
+    """The menu could not be read or a path element was not found"""
+
+
+class _Preempted(Exception):
+    """A more urgent navigation is waiting; the holder gives up the cursor and retries"""
+
+
+def split_path(path: str) -> Tuple[str, ...]:
+    """"Bookmarks/Jazz FM" -> ("Bookmarks", "Jazz FM"); elements may be %-quoted"""
+    return tuple(unquote(part).strip() for part in path.strip("/").split("/") if part.strip())
+
+
+def join_path(names) -> str:
+    """Inverse of split_path; "/" inside titles is quoted"""
+    return "/".join(quote(name, safe=" ") for name in names)
+
+
+async def _parse_inline(func, data, *args):
+    return func(data, *args)
+
+
+def _normalise_title(text: str) -> str:
+    return text.replace("&amp;", "&").strip().casefold()
+
+
+def play_info_titles(data: str) -> Tuple[str, ...]:
+    """Normalised Meta_Info texts (Station, Song, Album, ...) of a Play_Info response"""
+    try:
+        section = response_section(data)
+    except ET.ParseError:
+        return ()
+    meta = section.find("Meta_Info") if section is not None else None
+    if meta is None:
+        return ()
+    return tuple(_normalise_title(node.text) for node in meta if node.text and node.text.strip())
+
+
+def title_matches(title: str, reported: str) -> bool:
+    """List title and Play_Info text name the same thing; either may be cut short"""
+    title = _normalise_title(title)
+    return bool(title) and (reported.startswith(title) or title.startswith(reported))
+
+
+class _Cursor(NamedTuple):
+    keys: Tuple[Hashable, ...]   # path of the containers entered from the top menu
+    menu_name: str               # Menu_Name of the innermost one, to verify it is still open
+
+
+class ListNavigator(abc.ABC):
+    """Move one List_Info section's device cursor along paths from the top menu
+
+    The device has a single cursor per section, shared by every browse,
+    playback request and the front panel. All moves go through one lock,
+    and the menu the device was last left in is remembered: a request for
+    the position the device is already at costs one List_Info check, and
+    one for elsewhere Returns only to the common parent instead of
+    replaying the whole path from the top. If the check shows that
+    something else moved the cursor, navigation restarts from the top menu.
+
+    The lock is granted by request priority. A lower-priority holder, e.g.
+    a background revalidation, hands it over between two steps as soon as
+    a more urgent navigation waits, and then resumes from wherever the
+    cursor was left.
+    """
+
+    def __init__(self, receiver: YamahaReceiver, section: str, menu: str,
+                 parse: Optional[Callable[..., Awaitable[Optional[ListPage]]]] = None):
+        self._receiver = receiver
+        self._section = section
+        self._menu = menu
+        # Coroutine running parse_list_info(data, menu), e.g. offloading large pages
+        self._parse = parse or _parse_inline
+        self._cursor: Optional[_Cursor] = None
+        # Priority-ordered like the receiver's request slot
+        self._lock = RequestScheduler()
+        self._holder_priority = PRIORITY_INTERACTIVE
+
+    def invalidate_cursor(self) -> None:
+        """Forget the menu position after something else moved the device cursor"""
+        self._cursor = None
+
+    async def async_select_line(self, line: int, play: bool = False) -> ListPage:
+        """Select Line_<line> of the page the device shows now, as legacy IDs and macros address it
+
+        Where the selection leads is not tracked, so the next path
+        navigation re-verifies from the top menu. Returns the page after
+        the selection, or with play the page the line was selected on.
+        """
+        async def select():
+            page = await self._async_list()
+            self.invalidate_cursor()
+            await self._async_put(direct_select_command(self._section, f"Line_{line}"))
+            if play:
+                await self._async_put(playback_command(self._section, "Play"))
+                return page
+            return await self._async_list()
+
+        return await self._async_locked(select)
+
+    async def _async_locked(self, operation: Callable[[], Awaitable]):
+        """Run operation holding the cursor, restarting it after yielding to a more urgent one"""
+        priority = current_request_priority()
+        while True:
+            await self._lock.async_acquire(priority)
+            self._holder_priority = priority
+            try:
+                return await operation()
+            except _Preempted:
+                _LOGGER.debug("%s %s navigation yields to a more urgent one",
+                              self._receiver.host, self._section)
+            finally:
+                self._lock.release()
+
+    def _check_preempted(self) -> None:
+        """Called between steps, where the remembered cursor matches the device"""
+        if self._lock.urgent_waiting(self._holder_priority):
+            raise _Preempted
+
+    async def async_open(self, path: Sequence, line: Optional[int] = None) -> ListPage:
+        """Enter the container path (() for the top menu) and return the page holding line"""
+        async def open_page():
+            page = await self._async_enter(tuple(path))
+            if line is not None and page_start(line) != page.first_line:
+                page = await self._async_jump(line)
+            return page
+
+        return await self._async_locked(open_page)
+
+    async def async_play(self, path: Sequence) -> None:
+        """Select and play the item at path, then confirm Play_Info reports it
+
+        Raises NavigationError when the item is not found or the device
+        does not name it in Play_Info within PLAY_VERIFY_TIMEOUT.
+        """
+        path = tuple(path)
+        if not path:
+            raise NavigationError("Empty path")
+
+        async def play():
+            page = await self._async_enter(path[:-1])
+            page, item = await self._async_find(page, path)
+            await self._async_put(direct_select_command(self._section, item.line_id))
+            await self._async_put(playback_command(self._section, "Play"))
+            return item
+
+        item = await self._async_locked(play)
+        # Only reads Play_Info, so other navigations may move the cursor meanwhile
+        await self._async_verify_playing(item)
+
+    async def _async_verify_playing(self, item: ListItem) -> None:
+        deadline = time.monotonic() + PLAY_VERIFY_TIMEOUT
+        reported: Tuple[str, ...] = ()
+        while True:
+            data = await self._receiver.async_get(play_info_request(self._section))
+            reported = play_info_titles(data) if data else ()
+            if any(title_matches(item.title, text) for text in reported):
+                return
+            if time.monotonic() >= deadline:
+                raise NavigationError(
+                    f"{self._receiver.host} plays {' / '.join(reported) or 'nothing'} instead of {item.title}")
+            await asyncio.sleep(PLAY_VERIFY_INTERVAL)
+
+    def _key(self, element) -> Hashable:
+        """Comparable form of a path element"""
+        return element
+
+    @abc.abstractmethod
+    async def _async_find(self, page: ListPage, path: Tuple) -> Tuple[ListPage, ListItem]:
+        """Bring the last element of path onto the visible page and return it"""
+
+    async def _async_put(self, data: str) -> None:
+        if not response_ok(await self._receiver.async_put(data)):
+            self._cursor = None
+            raise NavigationError(f"{self._receiver.host} rejected {data}")
+
+    async def _async_list(self) -> ListPage:
+        """Current List_Info page, waiting out Menu_Status Busy"""
+        deadline = time.monotonic() + LIST_READY_TIMEOUT
+        while True:
+            data = await self._receiver.async_get(list_info_request(self._section))
+            try:
+                page = await self._parse(parse_list_info, data, self._menu) if data else None
+            except ET.ParseError:
+                page = None
+            if page is not None and not page.busy:
+                return page
+            if time.monotonic() >= deadline:
+                self._cursor = None
+                raise NavigationError(f"{self._section} list of {self._receiver.host} not ready")
+            await asyncio.sleep(LIST_READY_INTERVAL)
+
+    async def _async_enter(self, path: Tuple) -> ListPage:
+        page = await self._async_list()
+        cursor = self._cursor
+        if cursor is None or page.menu_layer != len(cursor.keys) + 1 or page.menu_name != cursor.menu_name:
+            # Moved elsewhere (front panel, app): start from the top menu
+            _LOGGER.debug("%s %s position unknown, returning to the top", self._receiver.host, self._section)
+            self._cursor = None
+            page = await self._async_return(page, page.menu_layer - 1)
+            cursor = self._cursor = _Cursor((), page.menu_name)
+        keys = tuple(self._key(element) for element in path)
+        common = len(os.path.commonprefix([cursor.keys, keys]))
+        if common < len(cursor.keys):
+            page = await self._async_return(page, len(cursor.keys) - common)
+        for depth in range(common, len(path)):
+            self._check_preempted()
+            page, item = await self._async_find(page, path[:depth + 1])
+            if not item.is_container:
+                raise NavigationError(f"{path[depth]} is not a folder")
+            self._cursor = None
+            await self._async_put(direct_select_command(self._section, item.line_id))
+            page = await self._async_list()
+            # Kept current per level, so a holder that yields resumes from here
+            self._cursor = _Cursor(keys[:depth + 1], page.menu_name)
+        return page
+
+    async def _async_return(self, page: ListPage, levels: int) -> ListPage:
+        for _ in range(min(levels, MAX_MENU_DEPTH)):
+            self._check_preempted()
+            cursor, self._cursor = self._cursor, None
+            await self._async_put(f"<{self._section}><List_Control><Cursor>Return</Cursor></List_Control></{self._section}>")
+            page = await self._async_list()
+            if cursor is not None:
+                self._cursor = _Cursor(cursor.keys[:-1], page.menu_name)
+        return page
+
+    async def _async_jump(self, line: int) -> ListPage:
+        self._check_preempted()
+        await self._async_put(f"<{self._section}><List_Control><Jump_Line>{line}</Jump_Line></List_Control></{self._section}>")
+        return await self._async_list()
+
+
+class TitleNavigator(ListNavigator):
+    """Paths of titles, e.g. ("Bookmarks", "Jazz FM"), matched case-insensitively
+
+    The absolute line each title was found at is remembered so the next
+    lookup jumps straight to its page. Titles are verified on the page
+    before selecting, so a reordered menu only costs a rescan.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lines: Dict[Tuple[str, ...], int] = {}
+
+    def _key(self, element) -> Hashable:
+        return element.casefold()
+
+    async def _async_find(self, page: ListPage, path: Tuple) -> Tuple[ListPage, ListItem]:
+        key = tuple(self._key(element) for element in path)
+        title = key[-1]
+
+        def match(page):
+            for item in page.items:
+                if item.title.strip().casefold() == title:
+                    return item
+            return None
+
+        # Visible page first, then the remembered one, then every page in order
+        hint = self._lines.get(key)
+        starts = [page.first_line] + ([page_start(hint)] if hint is not None else [])
+        starts += range(1, page.max_line + 1, PAGE_SIZE)
+        tried = set()
+        for start in starts:
+            if start in tried:
+                continue
+            tried.add(start)
+            if start != page.first_line:
+                page = await self._async_jump(start)
+            item = match(page)
+            if item is not None:
+                self._lines[key] = page.absolute_line(item)
+                return page, item
+        self._lines.pop(key, None)
+        raise NavigationError(f"{path[-1]} not found in {page.menu_name}")
+
+
+class LineNavigator(ListNavigator):
+    """Paths of absolute line numbers, e.g. (1, 12) for the 12th entry of the first server"""
+
+    async def _async_find(self, page: ListPage, path: Tuple) -> Tuple[ListPage, ListItem]:
+        line = path[-1]
+        if not 1 <= line <= page.max_line:
+            raise NavigationError(f"Line {line} outside {page.menu_name}")
+        if page_start(line) != page.first_line:
+            page = await self._async_jump(line)
+        line_id = f"Line_{line - page.first_line + 1}"
+        for item in page.items:
+            if item.line_id == line_id:
+                return page, item
+        raise NavigationError(f"Line {line} not found in {page.menu_name}")
@@ -0,0 +1,101 @@
+"""Turn successive now-playing snapshots of a zone into compact change events."""
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+_LOGGER = logging.getLogger(__name__)
+
+# Keys of the parsed Meta_Info / Tuning data that make up "now playing"
+FIELDS = ("station", "frequency", "preset", "artist", "album", "song", "description")
+# What identifies a station, as opposed to what is playing on it
+STATION_FIELDS = frozenset(("station", "frequency", "preset"))
+# RDS Radio_Text on the Tuner: flaps while the broadcaster cycles messages
+RDS_FIELDS = frozenset(("song", "description"))
+
+KIND_SOURCE = "source"
+KIND_STATION = "station"
+KIND_TRACK = "track"
+KIND_RDS = "rds"
+KIND_CLEARED = "cleared"
+
+NowPlaying = Tuple[Optional[str], Dict[str, Optional[str]]]   # (source, field -> value)
+
+
+class NowPlayingTracker:
+    """Diff a zone's now-playing fields against what was last reported
+
+    update() is fed after every poll. Source, station and track changes are
+    reported at once; Tuner Radio_Text changes only once the text has held
+    for `debounce` seconds, and not at all when it flips back to the
+    reported text in the meantime. The first snapshot is the baseline and
+    is not reported.
+    """
+
+    def __init__(self, hass: HomeAssistant, fire: Callable[[dict], None], debounce: float):
+        self._hass = hass
+        self._fire = fire
+        self._debounce = debounce
+        self._reported: Optional[NowPlaying] = None
+        self._pending: Optional[NowPlaying] = None
+        self._cancel_timer: Optional[CALLBACK_TYPE] = None
+
+    @callback
+    def update(self, source: Optional[str], meta: Dict[str, Optional[str]]) -> None:
+        current = (source, {field: meta.get(field) or None for field in FIELDS})
+        if self._reported is None:
+            self._reported = current
+            return
+        if current == self._reported:
+            # Unchanged, or RDS text flapped back before the debounce ran out
+            self._cancel_pending()
+            return
+        changed = self._changed(current)
+        if source == "Tuner" and source == self._reported[0] and changed <= RDS_FIELDS:
+            if current != self._pending:
+                self._cancel_pending()
+                self._pending = current
+                self._cancel_timer = async_call_later(self._hass, self._debounce, self._async_flush)
+            return
+        self._cancel_pending()
+        self._report(current, changed)
+
+    @callback
+    def async_cancel(self) -> None:
+        self._cancel_pending()
+
+    def _changed(self, current: NowPlaying) -> frozenset:
+        previous = self._reported[1]
+        return frozenset(field for field in FIELDS if current[1][field] != previous[field])
+
+    def _cancel_pending(self) -> None:
+        self._pending = None
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+
+    @callback
+    def _async_flush(self, _now=None) -> None:
+        self._cancel_timer = None
+        pending, self._pending = self._pending, None
+        if pending is not None and pending != self._reported:
+            self._report(pending, self._changed(pending))
+
+    def _report(self, current: NowPlaying, changed: frozenset) -> None:
+        source, values = current
+        if source != self._reported[0]:
+            kind = KIND_SOURCE
+        elif not any(values.values()):
+            kind = KIND_CLEARED
+        elif changed & STATION_FIELDS:
+            kind = KIND_STATION
+        elif source == "Tuner":
+            kind = KIND_RDS
+        else:
+            kind = KIND_TRACK
+        self._reported = current
+        data = {"kind": kind, "source": source, "changed": sorted(changed)}
+        data.update((field, value) for field, value in values.items() if value is not None)
+        _LOGGER.debug("Now playing %s: %s", kind, data)
+        self._fire(data)
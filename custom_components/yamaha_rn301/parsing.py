@@ -0,0 +1,74 @@
+"""Run CPU-bound parsing inline or in the executor depending on its size."""
+import time
+from typing import Callable, TypeVar
+
+from homeassistant.core import HomeAssistant
+
+from .const import EXECUTOR_ITEMS_THRESHOLD, EXECUTOR_PARSE_THRESHOLD
+
+_T = TypeVar("_T")
+
+
+class ParseTimer:
+    """Dispatch parse/build jobs and account for the event loop time they take
+
+    Jobs below the thresholds run inline, which avoids the executor hop for
+    the small Basic_Status/Play_Info responses of every poll; their duration
+    is the time the event loop was blocked. Larger jobs (big List_Info pages,
+    long BrowseMedia trees) run in the executor.
+    """
+
+    __slots__ = ('_hass', 'inline_calls', 'inline_total', 'inline_max', 'executor_calls',
+                 'executor_total', 'executor_max')
+
+    def __init__(self, hass: HomeAssistant):
+        self._hass = hass
+        self.inline_calls = 0
+        self.inline_total = 0.0
+        self.inline_max = 0.0
+        self.executor_calls = 0
+        self.executor_total = 0.0
+        self.executor_max = 0.0
+
+    def run_inline(self, func: Callable[..., _T], *args) -> _T:
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.inline_calls += 1
+            self.inline_total += elapsed
+            self.inline_max = max(self.inline_max, elapsed)
+
+    async def async_run(self, offload: bool, func: Callable[..., _T], *args) -> _T:
+        if not offload:
+            return self.run_inline(func, *args)
+        start = time.perf_counter()
+        try:
+            return await self._hass.async_add_executor_job(func, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.executor_calls += 1
+            self.executor_total += elapsed
+            self.executor_max = max(self.executor_max, elapsed)
+
+    async def async_parse(self, func: Callable[..., _T], data: str, *args) -> _T:
+        """func(data, *args), offloaded when data is at least EXECUTOR_PARSE_THRESHOLD characters"""
+        return await self.async_run(len(data) >= EXECUTOR_PARSE_THRESHOLD, func, data, *args)
+
+    async def async_build(self, func: Callable[..., _T], items: int, *args) -> _T:
+        """func(*args) building output for `items` entries, offloaded above EXECUTOR_ITEMS_THRESHOLD"""
+        return await self.async_run(items >= EXECUTOR_ITEMS_THRESHOLD, func, *args)
+
+    def as_dict(self) -> dict:
+        def ms(value: float) -> float:
+            return round(value * 1000, 2)
+
+        return {
+            "loop_blocking_calls": self.inline_calls,
+            "loop_blocking_total_ms": ms(self.inline_total),
+            "loop_blocking_max_ms": ms(self.inline_max),
+            "executor_calls": self.executor_calls,
+            "executor_total_ms": ms(self.executor_total),
+            "executor_max_ms": ms(self.executor_max),
+        }
@@ -0,0 +1,176 @@
+"""On-demand sampling profile of the integration's code paths."""
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_PROFILER, DATA_ZONE_ENTITIES, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PHASE_PARSE = "parse"
+PHASE_ENTITY_UPDATE = "entity_update"
+PHASE_OTHER = "other"
+
+# Frames that mark a sample as entity update work, unless it is parsing inside it
+_ENTITY_UPDATE_FUNCTIONS = frozenset(("_handle_coordinator_update", "async_write_ha_state",
+                                      "_async_write_ha_state"))
+_THREAD_NUMBER = re.compile(r"[_-]?\d+$")
+
+
+def _phase(stack) -> str:
+    for code in stack:
+        if code.co_name.startswith("parse_") or code.co_name == "_update_media_playing" \
+                or "xml" + os.sep + "etree" in code.co_filename:
+            return PHASE_PARSE
+    for code in stack:
+        if code.co_name in _ENTITY_UPDATE_FUNCTIONS:
+            return PHASE_ENTITY_UPDATE
+    return PHASE_OTHER
+
+
+def _frame_name(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}"
+
+
+class StackSampler:
+    """Thread sampling every thread's stack at a fixed interval
+
+    Only stacks running this integration's code are kept, cut to start at
+    its outermost frame, so loop and executor boilerplate stays out of the
+    profile while the stdlib calls made from it (ET.fromstring) stay in.
+    Suspended coroutines are not on any stack: time awaiting the receiver
+    is not sampled and is reported from the request counters instead.
+    Nothing of this exists outside a profiling window.
+    """
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=f"{DOMAIN}_profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling; blocks until the thread has exited (executor)"""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._sample(_THREAD_NUMBER.sub("", names.get(ident, "thread")), frame)
+
+    def _sample(self, thread: str, frame) -> None:
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index].co_filename.startswith(PACKAGE_DIR):
+                # Root first, from the outermost integration frame to the leaf
+                self.stacks[(thread,) + tuple(reversed(stack[:index + 1]))] += 1
+                return
+
+    def folded(self) -> str:
+        """Brendan Gregg's folded format: "thread;frame;frame count" per line"""
+        return "".join(
+            f"{';'.join((key[0],) + tuple(_frame_name(code) for code in key[1:]))} {count}\n"
+            for key, count in sorted(self.stacks.items(), key=lambda item: -item[1]))
+
+    def phases(self, elapsed: float) -> Dict[str, float]:
+        """Estimated time in ms per phase over elapsed seconds of sampling
+
+        Uses the achieved sampling period, which under GIL contention is
+        longer than the requested interval.
+        """
+        period = elapsed / self.samples if self.samples else 0.0
+        phases = Counter()
+        for key, count in self.stacks.items():
+            phases[_phase(key[1:])] += count
+        return {phase: round(count * period * 1000, 1) for phase, count in phases.items()}
+
+
+def _coordinator_totals(hass: HomeAssistant) -> Dict[str, Tuple[int, float, float, float]]:
+    """host -> (requests, device wait, inline parse, executor parse) totals"""
+    totals = {}
+    for entity in hass.data.get(DATA_ZONE_ENTITIES, {}).values():
+        coordinator = entity.coordinator
+        stats = coordinator.receiver.stats
+        timer = coordinator.parse_timer
+        totals[coordinator.receiver.host] = (stats.requests, stats.total_latency,
+                                             timer.inline_total, timer.executor_total)
+    return totals
+
+
+async def async_profile(hass: HomeAssistant, duration: float, interval: float) -> dict:
+    """Sample for duration seconds, write <config>/yamaha_rn301_profile_<time>.folded and .json"""
+    hass.data[DATA_PROFILER] = True
+    try:
+        before = _coordinator_totals(hass)
+        sampler = StackSampler(interval)
+        start = time.monotonic()
+        sampler.start()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            await hass.async_add_executor_job(sampler.stop)
+        elapsed = time.monotonic() - start
+        after = _coordinator_totals(hass)
+    finally:
+        hass.data.pop(DATA_PROFILER, None)
+
+    receivers = {}
+    for host, (requests, wait, inline, executor) in after.items():
+        base = before.get(host, (0, 0.0, 0.0, 0.0))
+        receivers[host] = {
+            "requests": requests - base[0],
+            "network_wait_ms": round((wait - base[1]) * 1000, 1),
+            "parse_inline_ms": round((inline - base[2]) * 1000, 1),
+            "parse_executor_ms": round((executor - base[3]) * 1000, 1),
+        }
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    folded_path = hass.config.path(f"{DOMAIN}_profile_{stamp}.folded")
+    summary = {
+        "duration_s": round(elapsed, 1),
+        "interval_ms": interval * 1000,
+        "samples": sampler.samples,
+        "achieved_interval_ms": round(elapsed / sampler.samples * 1000, 2) if sampler.samples else None,
+        "integration_stacks": sum(sampler.stacks.values()),
+        # CPU time seen running the integration's code, by phase
+        "sampled_ms": sampler.phases(elapsed),
+        # Wall time awaiting each receiver and parse time from the always-on counters
+        "receivers": receivers,
+        "network_wait_ms": round(sum(item["network_wait_ms"] for item in receivers.values()), 1),
+        "folded": folded_path,
+    }
+    summary_path = hass.config.path(f"{DOMAIN}_profile_{stamp}.json")
+
+    def write() -> None:
+        with open(folded_path, "w", encoding="utf-8") as file:
+            file.write(sampler.folded())
+        with open(summary_path, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+
+    await hass.async_add_executor_job(write)
+    _LOGGER.info("Profile written to %s", folded_path)
+    return {**summary, "summary": summary_path}
@@ -0,0 +1,598 @@
+"""YamahaRemoteControl protocol engine shared by all entities of one receiver."""
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import aiohttp
+
+from .const import BASE_URL, DEFAULT_TIMEOUT, SOURCE_MAPPING
+
+_LOGGER = logging.getLogger(__name__)
+
+MAIN_ZONE = 'Main_Zone'
+ZONE_TAGS = ('Main_Zone', 'Zone_2', 'Zone_3', 'Zone_4')
+
+SYSTEM_CONFIG_REQUEST = "<System><Config>GetParam</Config></System>"
+PRESET_LIST_REQUEST = "<Tuner><Play_Control><Preset><Preset_Sel_Item>GetParam</Preset_Sel_Item></Preset></Play_Control></Tuner>"
+
+_FRAGMENT_TAG = re.compile(r'\s*<([A-Za-z0-9_]+)>')
+
+# Request priority classes, most urgent first
+PRIORITY_INTERACTIVE = 0   # user commands: power, volume, input, playback, browsing
+PRIORITY_POLL = 1          # state polls
+PRIORITY_BACKGROUND = 2    # cache revalidation, scans
+PRIORITY_NAMES = ('interactive', 'poll', 'background')
+
+# Priority of the requests made by the current task and the tasks it starts
+_REQUEST_PRIORITY: ContextVar[int] = ContextVar('yamaha_rn301_request_priority', default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """Send the requests made inside the block (across awaits) at priority"""
+    token = _REQUEST_PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        _REQUEST_PRIORITY.reset(token)
+
+def current_request_priority() -> int:
+    """Priority the current task's requests are sent at"""
+    return _REQUEST_PRIORITY.get()
+
+# Play_Info section for inputs whose Basic_Status does not report a Src_Name
+LEGACY_SOURCE_SECTIONS = {
+    'Spotify': 'Spotify',
+    'NET RADIO': 'NET_RADIO',
+    'SERVER': 'SERVER',
+    'TUNER': 'Tuner',
+}
+
+
+class InputInfo(NamedTuple):
+    """One selectable input of a zone"""
+    param: str       # value for Input_Sel, e.g. "NET RADIO"
+    name: str        # display name shown in Home Assistant
+    src_name: str    # section carrying Play_Info/Play_Control, "" if none
+
+
+class ZoneStatus(NamedTuple):
+    """Parsed <zone><Basic_Status> response"""
+    power: bool
+    volume: Optional[float]
+    muted: bool
+    input_sel: Optional[str]
+    src_name: str
+
+
+class VolumeScale(NamedTuple):
+    """Range of a model's <Volume><Lvl><Val>, mapped onto volume_level 0..1"""
+    exp: int
+    unit: str
+    minimum: int
+    maximum: int
+    step: int
+
+    def to_level(self, val: int) -> float:
+        return min(1.0, max(0.0, (val - self.minimum) / (self.maximum - self.minimum)))
+
+    def to_val(self, level: float) -> int:
+        val = round((self.minimum + level * (self.maximum - self.minimum)) / self.step) * self.step
+        return min(self.maximum, max(self.minimum, val))
+
+
+# R-N series: 0..100 without a unit
+PERCENT_VOLUME = VolumeScale(0, '', 0, 100, 1)
+# AV receivers (RX-V) report dB; full scale stops at 0 dB like the receivers' own apps
+DB_VOLUME_RANGE = (-80.5, 0.0, 0.5)
+
+
+def volume_scale(exp: int, unit: Optional[str]) -> VolumeScale:
+    """Scale of a volume reported with this Exp and Unit"""
+    if unit == 'dB':
+        factor = 10 ** exp
+        minimum, maximum, step = (round(value * factor) for value in DB_VOLUME_RANGE)
+        return VolumeScale(exp, unit, minimum, maximum, max(step, 1))
+    return PERCENT_VOLUME
+
+
+class ReceiverConfig(NamedTuple):
+    """Static device description read once at startup"""
+    model: str
+    system_id: Optional[str]
+    version: Optional[str]
+    zones: Tuple[str, ...]
+    inputs: Dict[str, Tuple[InputInfo, ...]]
+    volume: VolumeScale = PERCENT_VOLUME
+
+    def input_by_param(self, zone: str, param: str) -> Optional[InputInfo]:
+        for item in self.inputs.get(zone, ()):
+            if item.param == param:
+                return item
+        return None
+
+    def input_by_name(self, zone: str, name: str) -> Optional[InputInfo]:
+        for item in self.inputs.get(zone, ()):
+            if item.name == name:
+                return item
+        return None
+
+
+def _default_inputs() -> Tuple[InputInfo, ...]:
+    return tuple(
+        InputInfo(param, name, LEGACY_SOURCE_SECTIONS.get(param, ''))
+        for name, param in SOURCE_MAPPING.items()
+    )
+
+
+DEFAULT_CONFIG = ReceiverConfig(
+    model='R-N301', system_id=None, version=None,
+    zones=(MAIN_ZONE,), inputs={MAIN_ZONE: _default_inputs()},
+)
+
+
+def display_name(param: str, title: Optional[str]) -> str:
+    """Human-readable input name, keeping the historical R-N301 names"""
+    for name, known_param in SOURCE_MAPPING.items():
+        if known_param == param:
+            return name
+    return (title or '').strip() or param
+
+
+def response_section(data: str) -> Optional[ET.Element]:
+    """Return the innermost requested element (e.g. Basic_Status) of a GET response"""
+    tree = ET.fromstring(data)
+    try:
+        return tree[0][0]
+    except IndexError:
+        return None
+
+
+def split_batched_response(data: str, tags: Sequence[str]) -> Optional[List[str]]:
+    """Split a multi-section GET response into one single-section response per tag
+
+    Returns None when the device rejected the request (RC other than "0"),
+    which one unavailable section is enough for. Raises ValueError when an
+    accepted reply does not hold exactly the requested sections in order,
+    and ET.ParseError on bad XML: how firmwares without batching support fail.
+    """
+    tree = ET.fromstring(data)
+    if tree.get("RC") != "0":
+        return None
+    received = [child.tag for child in tree]
+    if received != list(tags):
+        raise ValueError(f"Batched reply holds {received} instead of {list(tags)}")
+    responses = []
+    for child in tree:
+        wrapper = ET.Element("YAMAHA_AV", tree.attrib)
+        wrapper.append(child)
+        responses.append(ET.tostring(wrapper, encoding="unicode"))
+    return responses
+
+
+def parse_basic_status(data: str) -> Optional[ZoneStatus]:
+    """Parse a zone Basic_Status response; raises ET.ParseError on bad XML"""
+    section = response_section(data)
+    if section is None:
+        return None
+    power = section.findtext("Power_Control/Power") == "On"
+    volume = None
+    val = section.findtext("Volume/Lvl/Val")
+    if val is not None:
+        scale = volume_scale(int(section.findtext("Volume/Lvl/Exp") or 0), section.findtext("Volume/Lvl/Unit"))
+        volume = scale.to_level(int(val))
+    muted = section.findtext("Volume/Mute") == "On"
+    input_sel = section.findtext("Input/Input_Sel")
+    src_name = section.findtext("Input/Input_Sel_Item_Info/Src_Name") or \
+        LEGACY_SOURCE_SECTIONS.get(input_sel, '')
+    return ZoneStatus(power, volume, muted, input_sel, src_name)
+
+
+def parse_system_config(data: str):
+    """Return (model, system_id, version, zones, features) from <System><Config>
+
+    features is the set of Feature_Existence entries flagged "1".
+    """
+    section = response_section(data)
+    if section is None:
+        raise ET.ParseError("empty System Config response")
+    model = section.findtext("Model_Name") or DEFAULT_CONFIG.model
+    features = frozenset(
+        node.tag for node in section.findall("Feature_Existence/*") if node.text == "1"
+    )
+    zones = tuple(tag for tag in ZONE_TAGS if tag in features) or (MAIN_ZONE,)
+    return model, section.findtext("System_ID"), section.findtext("Version"), zones, features
+
+
+def parse_input_list(data: str) -> Tuple[InputInfo, ...]:
+    """Parse a <zone><Input><Input_Sel_Item> response"""
+    tree = ET.fromstring(data)
+    items = tree.find("./*/Input/Input_Sel_Item")
+    if items is None:
+        return ()
+    inputs = []
+    for item in items:
+        param = item.findtext("Param")
+        if not param:
+            continue
+        inputs.append(InputInfo(param, display_name(param, item.findtext("Title")),
+                                item.findtext("Src_Name") or LEGACY_SOURCE_SECTIONS.get(param, '')))
+    return tuple(inputs)
+
+
+def parse_preset_list(data: str) -> Dict[str, str]:
+    """Parse a Tuner Preset_Sel_Item response into {preset number: title}"""
+    tree = ET.fromstring(data)
+    items = tree.find("./*/Play_Control/Preset/Preset_Sel_Item")
+    if items is None:
+        return {}
+    presets = {}
+    for item in items:
+        param = item.findtext("Param")
+        if param:
+            presets[param] = (item.findtext("Title") or "").strip()
+    return presets
+
+
+def config_as_dict(config: ReceiverConfig) -> dict:
+    """JSON-serialisable form of a ReceiverConfig"""
+    return {
+        "model": config.model,
+        "system_id": config.system_id,
+        "version": config.version,
+        "zones": list(config.zones),
+        "inputs": {zone: [list(item) for item in items] for zone, items in config.inputs.items()},
+        "volume": list(config.volume),
+    }
+
+
+def config_from_dict(data: dict) -> ReceiverConfig:
+    return ReceiverConfig(
+        data["model"], data.get("system_id"), data.get("version"), tuple(data["zones"]),
+        {zone: tuple(InputInfo(*item) for item in items) for zone, items in data["inputs"].items()},
+        VolumeScale(*data["volume"]) if data.get("volume") else PERCENT_VOLUME,
+    )
+
+
+def basic_status_request(zone: str) -> str:
+    return f"<{zone}><Basic_Status>GetParam</Basic_Status></{zone}>"
+
+
+def power_command(zone: str, on: bool) -> str:
+    """Main_Zone power goes through System so the whole unit wakes up"""
+    power = "On" if on else "Standby"
+    if zone == MAIN_ZONE:
+        return f"<System><Power_Control><Power>{power}</Power></Power_Control></System>"
+    return f"<{zone}><Power_Control><Power>{power}</Power></Power_Control></{zone}>"
+
+
+def volume_command(zone: str, volume: float, scale: VolumeScale = PERCENT_VOLUME) -> str:
+    return (f"<{zone}><Volume><Lvl><Val>{scale.to_val(volume)}</Val><Exp>{scale.exp}</Exp>"
+            f"<Unit>{scale.unit}</Unit></Lvl></Volume></{zone}>")
+
+
+def mute_command(zone: str, mute: bool) -> str:
+    value = "On" if mute else "Off"
+    if zone == MAIN_ZONE:
+        return f"<System><Volume><Mute>{value}</Mute></Volume></System>"
+    return f"<{zone}><Volume><Mute>{value}</Mute></Volume></{zone}>"
+
+
+def input_command(zone: str, param: str) -> str:
+    return f"<{zone}><Input><Input_Sel>{param}</Input_Sel></Input></{zone}>"
+
+
+def preset_command(preset) -> str:
+    return f"<Tuner><Play_Control><Preset><Preset_Sel>{preset}</Preset_Sel></Preset></Play_Control></Tuner>"
+
+
+def playback_command(section: str, command: str) -> str:
+    return f"<{section}><Play_Control><Playback>{command}</Playback></Play_Control></{section}>"
+
+
+def direct_select_command(section: str, line_id: str) -> str:
+    return f"<{section}><List_Control><Direct_Sel>{line_id}</Direct_Sel></List_Control></{section}>"
+
+
+def list_info_request(section: str) -> str:
+    return f"<{section}><List_Info>GetParam</List_Info></{section}>"
+
+
+def play_info_request(section: str) -> str:
+    return f"<{section}><Play_Info>GetParam</Play_Info></{section}>"
+
+
+def response_ok(data: str) -> bool:
+    """True for a response with RC="0"; the device answers 200 even for rejected commands"""
+    if not data:
+        return False
+    try:
+        return ET.fromstring(data).get("RC") == "0"
+    except ET.ParseError:
+        return False
+
+
+class RequestStats:
+    """Running health counters of the HTTP requests to one receiver"""
+
+    __slots__ = ('requests', 'failures', 'consecutive_failures', 'last_latency', 'avg_latency',
+                 'total_latency', 'last_success', 'last_error', 'batch_fallbacks')
+
+    # Weight of the newest sample in the latency moving average
+    LATENCY_SMOOTHING = 0.2
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_latency: Optional[float] = None
+        self.avg_latency: Optional[float] = None
+        # Time spent waiting for the device, failed requests included
+        self.total_latency = 0.0
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        # Batched GETs answered with split requests after a rejected or bad reply
+        self.batch_fallbacks = 0
+
+    def record(self, latency: float, error: Optional[str] = None) -> None:
+        self.requests += 1
+        self.total_latency += latency
+        if error is not None:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+            return
+        self.consecutive_failures = 0
+        self.last_success = time.time()
+        self.last_latency = latency
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency += self.LATENCY_SMOOTHING * (latency - self.avg_latency)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+            "avg_latency_ms": round(self.avg_latency * 1000, 1) if self.avg_latency is not None else None,
+            "total_latency_s": round(self.total_latency, 3),
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+            "batch_fallbacks": self.batch_fallbacks,
+        }
+
+
+class RequestScheduler:
+    """Grant one receiver's single request slot by priority class, then arrival
+
+    The embedded web server handles one request at a time anyway; queueing
+    here rather than in its socket backlog lets a button press overtake
+    polls and background work that are still waiting, so it waits for at
+    most the request already in flight. Multi-step operations take the slot
+    per request, which lets more urgent requests in between their steps.
+    """
+
+    __slots__ = ('_busy', '_waiters', '_order', 'granted', 'wait_total', 'wait_max')
+
+    def __init__(self):
+        self._busy = False
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self.granted = [0] * len(PRIORITY_NAMES)
+        self.wait_total = [0.0] * len(PRIORITY_NAMES)
+        self.wait_max = [0.0] * len(PRIORITY_NAMES)
+
+    async def async_acquire(self, priority: int) -> None:
+        start = time.monotonic()
+        if self._busy or self._waiters:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._order), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Granted as the caller was cancelled: hand the slot on
+                    self.release()
+                raise
+        else:
+            self._busy = True
+        waited = time.monotonic() - start
+        self.granted[priority] += 1
+        self.wait_total[priority] += waited
+        self.wait_max[priority] = max(self.wait_max[priority], waited)
+
+    def urgent_waiting(self, priority: int) -> bool:
+        """True if a request more urgent than priority is queued"""
+        return any(waiting < priority and not future.done() for waiting, _order, future in self._waiters)
+
+    def release(self) -> None:
+        while self._waiters:
+            _priority, _order, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # The slot passes straight to the waiter; _busy stays set
+                future.set_result(None)
+                return
+        self._busy = False
+
+    def as_dict(self) -> dict:
+        return {
+            "queued": sum(1 for _p, _o, future in self._waiters if not future.done()),
+            **{name: {
+                "requests": self.granted[priority],
+                "avg_wait_ms": round(self.wait_total[priority] / self.granted[priority] * 1000, 1)
+                if self.granted[priority] else None,
+                "max_wait_ms": round(self.wait_max[priority] * 1000, 1),
+            } for priority, name in enumerate(PRIORITY_NAMES)},
+        }
+
+
+class YamahaReceiver:
+    """HTTP transport and device description for one YamahaRemoteControl host"""
+
+    def __init__(self, session: aiohttp.ClientSession, host: str):
+        self._session = session
+        self.host = host
+        self.base_url = BASE_URL.format(host)
+        self.config = DEFAULT_CONFIG
+        self.config_loaded = False
+        self.presets: Dict[str, str] = {}
+        # None until the first multi-section GET shows whether the firmware accepts it
+        self.batch_supported: Optional[bool] = None
+        # Seconds from the last power-on command until Basic_Status reported On
+        self.wake_time: Optional[float] = None
+        self.stats = RequestStats()
+        self.scheduler = RequestScheduler()
+
+    async def async_request(self, data) -> str:
+        """POST one request once the scheduler grants the slot at the current request_priority"""
+        data = '<?xml version="1.0" encoding="utf-8"?>' + data
+        await self.scheduler.async_acquire(_REQUEST_PRIORITY.get())
+        try:
+            return await self._async_post(data)
+        finally:
+            self.scheduler.release()
+
+    async def _async_post(self, data) -> str:
+        start = time.monotonic()
+        try:
+            timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+            async with self._session.post(self.base_url, data=data, timeout=timeout) as req:
+                if req.status != 200:
+                    _LOGGER.warning("Error doing API request, %d, %s", req.status, data)
+                else:
+                    _LOGGER.debug("API request ok %d", req.status)
+                text = await req.text()
+            self.stats.record(time.monotonic() - start, None if req.status == 200 else f"HTTP {req.status}")
+            return text
+        except aiohttp.ClientError as e:
+            _LOGGER.error("Request failed: %s", e)
+            self.stats.record(time.monotonic() - start, str(e) or type(e).__name__)
+            return ""
+        except asyncio.TimeoutError:
+            _LOGGER.error("Request to %s timed out", self.host)
+            self.stats.record(time.monotonic() - start, "timeout")
+            return ""
+        except Exception as e:
+            _LOGGER.error("Unexpected error during API request: %s", e)
+            self.stats.record(time.monotonic() - start, str(e) or type(e).__name__)
+            return ""
+
+    async def async_get(self, data) -> str:
+        return await self.async_request('<YAMAHA_AV cmd="GET">' + data + '</YAMAHA_AV>')
+
+    async def async_put(self, data) -> str:
+        return await self.async_request('<YAMAHA_AV cmd="PUT">' + data + '</YAMAHA_AV>')
+
+    async def async_get_many(self, fragments: Sequence[str]) -> List[str]:
+        """GET several sections, in one envelope when the device supports it
+
+        Returns one single-section response string per fragment ("" on
+        failure), so callers can parse them like individual GETs.
+        """
+        tags = []
+        for fragment in fragments:
+            match = _FRAGMENT_TAG.match(fragment)
+            tags.append(match.group(1) if match else None)
+        # Repeated top-level sections are not answered reliably in one envelope
+        if len(fragments) > 1 and self.batch_supported is not False and None not in tags \
+                and len(set(tags)) == len(tags):
+            data = await self.async_get("".join(fragments))
+            if not data:
+                # Unreachable; split requests would only time out one by one
+                return [""] * len(fragments)
+            try:
+                responses = split_batched_response(data, tags)
+            except (ET.ParseError, ValueError) as e:
+                self.stats.batch_fallbacks += 1
+                if self.batch_supported is None:
+                    # Malformed or mis-split reply while probing: the firmware cannot batch
+                    _LOGGER.debug("%s cannot answer batched GET requests (%s), using split requests",
+                                  self.host, e)
+                    self.batch_supported = False
+                else:
+                    # Batching works on this unit; a truncated reply only costs this call
+                    _LOGGER.debug("Bad batched reply from %s (%s), using split requests once", self.host, e)
+                return [await self.async_get(fragment) for fragment in fragments]
+            if responses is not None:
+                if self.batch_supported is None:
+                    _LOGGER.debug("%s accepts batched GET requests", self.host)
+                self.batch_supported = True
+                return responses
+            # Rejected as a whole; split requests answer the sections that are available
+            self.stats.batch_fallbacks += 1
+            responses = [await self.async_get(fragment) for fragment in fragments]
+            if self.batch_supported is None and all(response_ok(response) for response in responses):
+                # Every section is fine on its own, so it was the envelope that was refused
+                _LOGGER.debug("%s rejected a batched GET, using split requests", self.host)
+                self.batch_supported = False
+            return responses
+        return [await self.async_get(fragment) for fragment in fragments]
+
+    async def async_load_config(self) -> bool:
+        """Read model, zones, per-zone input lists and the Tuner presets
+
+        Keeps the current (default or cached) configuration on failure.
+        """
+        data = await self.async_get(SYSTEM_CONFIG_REQUEST)
+        if not data:
+            return False
+        return await self._async_apply_config(data)
+
+    async def async_probe(self) -> bool:
+        """Check that the host speaks YamahaRemoteControl, reading its configuration if it can
+
+        Firmwares without <System><Config> are accepted on a valid Basic_Status
+        and keep the R-N301 defaults (config_loaded stays False).
+        """
+        data = await self.async_get(SYSTEM_CONFIG_REQUEST)
+        if not data:
+            return False
+        if await self._async_apply_config(data):
+            return True
+        data = await self.async_get(basic_status_request(MAIN_ZONE))
+        try:
+            return bool(data) and parse_basic_status(data) is not None
+        except ET.ParseError:
+            return False
+
+    async def _async_apply_config(self, data) -> bool:
+        try:
+            model, system_id, version, zones, features = parse_system_config(data)
+            fragments = [
+                f"<{zone}><Input><Input_Sel_Item>GetParam</Input_Sel_Item></Input></{zone}>"
+                for zone in zones
+            ]
+            if "Tuner" in features:
+                fragments.append(PRESET_LIST_REQUEST)
+            responses = await self.async_get_many(fragments)
+            inputs = {
+                zone: (parse_input_list(zone_data) if zone_data else ()) or _default_inputs()
+                for zone, zone_data in zip(zones, responses)
+            }
+            if len(responses) > len(zones) and responses[-1]:
+                self.presets = parse_preset_list(responses[-1])
+            # The volume's Exp/Unit tell percent (R-N) from dB (RX-V) models. A
+            # request of its own: a second <Main_Zone> in the envelope above is
+            # merged or reordered by some firmwares, failing the batching probe.
+            volume = self.config.volume
+            data = await self.async_get(basic_status_request(zones[0]))
+            section = response_section(data) if data else None
+            if section is not None and section.find("Volume/Lvl") is not None:
+                volume = volume_scale(int(section.findtext("Volume/Lvl/Exp") or 0),
+                                      section.findtext("Volume/Lvl/Unit"))
+        except ET.ParseError as e:
+            _LOGGER.warning("Could not read configuration of %s: %s", self.host, e)
+            return False
+        self.config = ReceiverConfig(model, system_id, version, zones, inputs, volume)
+        self.config_loaded = True
+        _LOGGER.debug("%s is a %s with zones %s", self.host, model, ", ".join(zones))
+        return True
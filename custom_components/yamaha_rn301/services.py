@@ -0,0 +1,138 @@
+"""Integration-wide services."""
+import asyncio
+import logging
+import time
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .const import (
+    BROADCAST_MAX_PARALLEL,
+    BROADCAST_TIMEOUT,
+    DATA_PROFILER,
+    DATA_ZONE_ENTITIES,
+    DOMAIN,
+    PROFILE_DEFAULT_DURATION,
+    PROFILE_INTERVAL,
+    PROFILE_MAX_DURATION,
+)
+from .macro import (
+    STEP_DELAY,
+    STEP_LINE,
+    STEP_MUTE,
+    STEP_PLAYBACK,
+    STEP_POWER,
+    STEP_PRESET,
+    STEP_SOURCE,
+    STEP_VOLUME,
+)
+from .profiling import async_profile
+from .receiver import MAIN_ZONE
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_BROADCAST = 'broadcast'
+SERVICE_PROFILE = 'profile'
+ATTR_STEPS = 'steps'
+ATTR_MAX_PARALLEL = 'max_parallel'
+ATTR_TIMEOUT = 'timeout'
+ATTR_DURATION = 'duration'
+ATTR_INTERVAL = 'interval'
+
+# Each macro step is a single-key mapping, e.g. {"source": "Net Radio"}
+MACRO_STEP_SCHEMA = vol.Any(
+    vol.Schema({vol.Required(STEP_POWER): cv.boolean}),
+    vol.Schema({vol.Required(STEP_SOURCE): cv.string}),
+    vol.Schema({vol.Required(STEP_VOLUME): vol.All(vol.Coerce(float), vol.Range(min=0, max=1))}),
+    vol.Schema({vol.Required(STEP_MUTE): cv.boolean}),
+    vol.Schema({vol.Required(STEP_PRESET): vol.All(vol.Coerce(int), vol.Range(min=1, max=40))}),
+    vol.Schema({vol.Required(STEP_LINE): vol.All(vol.Coerce(int), vol.Range(min=1, max=8))}),
+    vol.Schema({vol.Required(STEP_PLAYBACK): vol.In(["Play", "Pause", "Stop", "Skip Fwd", "Skip Rev"])}),
+    vol.Schema({vol.Required(STEP_DELAY): vol.All(vol.Coerce(float), vol.Range(min=0, max=30))}),
+)
+
+MACRO_STEPS = vol.All(cv.ensure_list, [MACRO_STEP_SCHEMA])
+
+BROADCAST_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Required(ATTR_STEPS): MACRO_STEPS,
+    vol.Optional(ATTR_MAX_PARALLEL, default=BROADCAST_MAX_PARALLEL): vol.All(vol.Coerce(int), vol.Range(min=1, max=64)),
+    vol.Optional(ATTR_TIMEOUT, default=BROADCAST_TIMEOUT): vol.All(vol.Coerce(float), vol.Range(min=1, max=300)),
+})
+
+PROFILE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_DURATION, default=PROFILE_DEFAULT_DURATION):
+        vol.All(vol.Coerce(float), vol.Range(min=1, max=PROFILE_MAX_DURATION)),
+    vol.Optional(ATTR_INTERVAL, default=PROFILE_INTERVAL * 1000):
+        vol.All(vol.Coerce(float), vol.Range(min=1, max=1000)),
+})
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services once"""
+    if hass.services.has_service(DOMAIN, SERVICE_BROADCAST):
+        return
+
+    async def async_broadcast(call: ServiceCall):
+        """Run the same steps on many receivers at once and collect the outcome"""
+        zones = hass.data.get(DATA_ZONE_ENTITIES, {})
+        entity_ids = call.data.get(ATTR_ENTITY_ID)
+        if entity_ids:
+            unknown = [entity_id for entity_id in entity_ids if entity_id not in zones]
+            if unknown:
+                raise ServiceValidationError(f"Not a {DOMAIN} media player: {', '.join(unknown)}")
+            targets = [zones[entity_id] for entity_id in entity_ids]
+        else:
+            # Default: every receiver, addressed through its main zone
+            targets = [entity for entity in zones.values() if entity.zone == MAIN_ZONE]
+
+        steps = call.data[ATTR_STEPS]
+        timeout = call.data[ATTR_TIMEOUT]
+        semaphore = asyncio.Semaphore(call.data[ATTR_MAX_PARALLEL])
+
+        async def run(entity):
+            async with semaphore:
+                start = time.monotonic()
+                try:
+                    async with asyncio.timeout(timeout):
+                        result = await entity.async_run_macro(steps)
+                except TimeoutError:
+                    result = {"completed": False, "error": f"timed out after {timeout}s"}
+                except Exception as e:  # one broken receiver must not fail the others
+                    _LOGGER.exception("Broadcast to %s failed", entity.entity_id)
+                    result = {"completed": False, "error": str(e)}
+                result["elapsed_ms"] = round((time.monotonic() - start) * 1000, 1)
+                return entity.entity_id, result
+
+        start = time.monotonic()
+        results = dict(await asyncio.gather(*(run(entity) for entity in targets)))
+        failed = sorted(entity_id for entity_id, result in results.items() if not result["completed"])
+        if failed:
+            _LOGGER.warning("Broadcast failed on %s", ", ".join(failed))
+        return {
+            "targets": len(results),
+            "succeeded": len(results) - len(failed),
+            "failed": failed,
+            "elapsed_ms": round((time.monotonic() - start) * 1000, 1),
+            "results": results,
+        }
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_BROADCAST, async_broadcast, schema=BROADCAST_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_run_profile(call: ServiceCall):
+        """Sample the integration for a fixed window and write a folded-stack profile"""
+        if hass.data.get(DATA_PROFILER):
+            raise ServiceValidationError("A profile is already running")
+        return await async_profile(hass, call.data[ATTR_DURATION], call.data[ATTR_INTERVAL] / 1000)
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE, async_run_profile, schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
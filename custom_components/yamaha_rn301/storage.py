@@ -0,0 +1,125 @@
+"""Persisted per-entry cache of device capabilities, listings and last state."""
+import logging
+from typing import List, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, STORAGE_SAVE_DELAY, STORAGE_VERSION
+from .listing import ListPage
+from .receiver import ReceiverConfig, ZoneStatus, config_as_dict, config_from_dict
+from .tuner import TunerStation
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class YamahaStore:
+    """Versioned cache that lets a restart render and browse before the device answers"""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+        self._data = {}
+        self._save_pending = False
+
+    async def async_load(self) -> None:
+        data = await self._store.async_load()
+        if isinstance(data, dict):
+            self._data = data
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
+
+    def _data_to_save(self) -> dict:
+        # Called by Store when the write actually happens
+        self._save_pending = False
+        return self._data
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Write within STORAGE_SAVE_DELAY of the first unsaved change
+
+        async_delay_save restarts its timer on every call, so calling it on
+        each poll would postpone the write until shutdown. A pending save
+        is left alone and picks up later changes when it runs.
+        """
+        if not self._save_pending:
+            self._save_pending = True
+            self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    @callback
+    def _async_save_now(self) -> None:
+        """Write on the next loop iteration; for data that rarely changes"""
+        self._save_pending = True
+        self._store.async_delay_save(self._data_to_save, 0)
+
+    @property
+    def config(self) -> Optional[ReceiverConfig]:
+        try:
+            return config_from_dict(self._data["config"]) if "config" in self._data else None
+        except (KeyError, TypeError, ValueError) as e:
+            _LOGGER.debug("Ignoring unreadable cached configuration: %s", e)
+            return None
+
+    @property
+    def presets(self) -> dict:
+        return self._data.get("presets", {})
+
+    @callback
+    def async_set_config(self, config: ReceiverConfig, presets: dict) -> None:
+        data = config_as_dict(config)
+        if data == self._data.get("config") and presets == self._data.get("presets"):
+            return
+        self._data["config"] = data
+        self._data["presets"] = dict(presets)
+        self._async_save_now()
+
+    def root_listing(self, source: str) -> Optional[ListPage]:
+        """Cached top-level browse page of a source (e.g. SERVER, NET_RADIO)"""
+        data = self._data.get("browse", {}).get(source)
+        try:
+            return ListPage.from_dict(data) if data else None
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    @callback
+    def async_set_root_listing(self, source: str, page: ListPage) -> None:
+        data = page.as_dict()
+        listings = self._data.setdefault("browse", {})
+        if listings.get(source) == data:
+            return
+        listings[source] = data
+        self._async_save_now()
+
+    @property
+    def state(self):
+        """Last poll as ({zone: ZoneStatus}, {section: Play_Info XML}), or None"""
+        data = self._data.get("state")
+        try:
+            zones = {zone: ZoneStatus(*status) for zone, status in data["zones"].items()}
+            return zones, dict(data["play_info"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    @callback
+    def async_set_state(self, zones: dict, play_info: dict) -> None:
+        state = {
+            "zones": {zone: list(status) for zone, status in zones.items()},
+            "play_info": dict(play_info),
+        }
+        if state == self._data.get("state"):
+            return
+        self._data["state"] = state
+        self._async_schedule_save()
+
+    @property
+    def stations(self) -> List[TunerStation]:
+        """Station table of the last Tuner scans"""
+        try:
+            return [TunerStation(*station) for station in self._data.get("stations", ())]
+        except TypeError:
+            return []
+
+    @callback
+    def async_set_stations(self, stations: List[TunerStation]) -> None:
+        self._data["stations"] = [list(station) for station in stations]
+        self._async_save_now()
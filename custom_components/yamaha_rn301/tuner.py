@@ -0,0 +1,194 @@
+"""Tuner band scan building a table of receivable FM/AM stations."""
+import asyncio
+import logging
+import time
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from .const import (
+    TUNER_SCAN_IDLE_RECHECK,
+    TUNER_SCAN_MAX_REJECTS,
+    TUNER_SCAN_RDS_INTERVAL,
+    TUNER_SCAN_RDS_WAIT,
+    TUNER_SCAN_SETTLE,
+)
+from .receiver import YamahaReceiver, response_ok, response_section
+
+_LOGGER = logging.getLogger(__name__)
+
+TUNER_PLAY_INFO_REQUEST = "<Tuner><Play_Info>GetParam</Play_Info></Tuner>"
+
+
+class Band(NamedTuple):
+    start: int   # in device units: 10 kHz for FM (Exp 2, MHz), kHz for AM
+    end: int
+    step: int    # default raster; 0.1 MHz covers both the EU and US FM plans
+    exp: int
+    unit: str
+
+
+BANDS: Dict[str, Band] = {
+    "FM": Band(8750, 10800, 10, 2, "MHz"),
+    "AM": Band(531, 1611, 9, 0, "kHz"),
+}
+
+
+class TunerStation(NamedTuple):
+    band: str
+    val: int
+    exp: int
+    unit: str
+    name: Optional[str] = None   # RDS Program_Service, FM only
+    stereo: bool = False
+
+    @property
+    def key(self) -> str:
+        """media_content_id form, e.g. "FM:9870" """
+        return f"{self.band}:{self.val}"
+
+    @property
+    def frequency(self) -> str:
+        return f"{self.band} {self.val / 10 ** self.exp:g} {self.unit}"
+
+
+class TunerInfo(NamedTuple):
+    """The parts of Tuner Play_Info a scan needs"""
+    band: Optional[str]
+    val: Optional[int]
+    exp: int
+    unit: str
+    tuned: bool
+    stereo: bool
+    name: Optional[str]
+
+
+class TunerScanError(Exception):
+    """The receiver refused to tune, e.g. because it is in standby"""
+
+
+def tune_command(band: str, val: int, exp: int, unit: str) -> str:
+    return (f"<Tuner><Play_Control><Tuning><Band>{band}</Band><Freq><{band}><Val>{val}</Val>"
+            f"<Exp>{exp}</Exp><Unit>{unit}</Unit></{band}></Freq></Tuning></Play_Control></Tuner>")
+
+
+def parse_tuner_info(data: str) -> Optional[TunerInfo]:
+    """Parse a Tuner Play_Info response; raises ET.ParseError on bad XML"""
+    section = response_section(data)
+    if section is None:
+        return None
+    val = section.findtext("Tuning/Freq/Current/Val")
+    name = (section.findtext("Meta_Info/Program_Service") or "").strip()
+    return TunerInfo(
+        section.findtext("Tuning/Band"),
+        int(val) if val and val.isdigit() else None,
+        int(section.findtext("Tuning/Freq/Current/Exp") or 0),
+        section.findtext("Tuning/Freq/Current/Unit") or "",
+        section.findtext("Signal_Info/Tuned") == "Assert",
+        section.findtext("Signal_Info/Stereo") == "Assert",
+        name or None,
+    )
+
+
+def merge_hits(hits: List[TunerStation], step: int) -> List[TunerStation]:
+    """One entry per station from consecutive tuned steps
+
+    A strong transmitter also locks on its neighbouring steps. Each run of
+    adjacent hits yields one entry per distinct RDS name (or one unnamed
+    entry), at the middle of the frequencies where that name was seen.
+    """
+    stations = []
+    run: List[TunerStation] = []
+
+    def flush():
+        names = {hit.name for hit in run if hit.name}
+        for name in sorted(names) if names else [None]:
+            matching = [hit for hit in run if hit.name == name] if name else run
+            stations.append(matching[len(matching) // 2])
+
+    for hit in hits:
+        if run and hit.val - run[-1].val > step:
+            flush()
+            run = []
+        run.append(hit)
+    if run:
+        flush()
+    return stations
+
+
+class TunerScanner:
+    """Step one band while nobody listens to the Tuner, recording what it locks on
+
+    Tuning is only audible on zones set to the Tuner, so the scan runs while
+    every zone is on another input or off, and pauses whenever busy() reports
+    a zone listening. The frequency the Tuner was on is restored at the end.
+    The unit itself must be on: in Standby it rejects tuning, and a scan that
+    meets TUNER_SCAN_MAX_REJECTS rejections in a row stops with TunerScanError.
+    """
+
+    def __init__(self, receiver: YamahaReceiver, busy: Callable[[], bool], band: str,
+                 step: Optional[int] = None):
+        self._receiver = receiver
+        self._busy = busy
+        self.band = band
+        self._range = BANDS[band]
+        self._step = step or self._range.step
+        self.progress = 0.0
+        self.hits = 0
+
+    async def _async_info(self) -> Optional[TunerInfo]:
+        data = await self._receiver.async_get(TUNER_PLAY_INFO_REQUEST)
+        try:
+            return parse_tuner_info(data) if data else None
+        except ET.ParseError:
+            return None
+
+    async def _async_tune(self, band: str, val: int, exp: int, unit: str) -> bool:
+        return response_ok(await self._receiver.async_put(tune_command(band, val, exp, unit)))
+
+    async def _async_wait_idle(self) -> bool:
+        """Wait until no zone listens to the Tuner; True if that meant pausing"""
+        paused = False
+        while self._busy():
+            if not paused:
+                _LOGGER.debug("%s Tuner in use, pausing scan", self._receiver.host)
+            paused = True
+            await asyncio.sleep(TUNER_SCAN_IDLE_RECHECK)
+        return paused
+
+    async def async_run(self) -> List[TunerStation]:
+        band = self._range
+        frequencies = range(band.start, band.end + 1, self._step)
+        await self._async_wait_idle()
+        restore = await self._async_info()
+        hits = []
+        rejects = 0
+        try:
+            for index, val in enumerate(frequencies):
+                if await self._async_wait_idle():
+                    # Someone listened meanwhile: keep what they left it on
+                    restore = await self._async_info()
+                if not await self._async_tune(self.band, val, band.exp, band.unit):
+                    rejects += 1
+                    if rejects >= TUNER_SCAN_MAX_REJECTS:
+                        raise TunerScanError(f"{self._receiver.host} rejected tuning (switched to Standby?)")
+                    continue
+                rejects = 0
+                await asyncio.sleep(TUNER_SCAN_SETTLE)
+                info = await self._async_info()
+                if info is not None and info.tuned:
+                    name = info.name
+                    deadline = time.monotonic() + TUNER_SCAN_RDS_WAIT
+                    # RDS Program_Service takes a few seconds after the lock
+                    while self.band == "FM" and not name and time.monotonic() < deadline:
+                        await asyncio.sleep(TUNER_SCAN_RDS_INTERVAL)
+                        info = await self._async_info()
+                        name = info.name if info is not None else None
+                    hits.append(TunerStation(self.band, val, band.exp, band.unit, name,
+                                             info.stereo if info is not None else False))
+                    self.hits = len(hits)
+                self.progress = (index + 1) / len(frequencies)
+        finally:
+            if restore is not None and restore.band in BANDS and restore.val is not None \
+                    and not self._busy():
+                await self._async_tune(restore.band, restore.val, restore.exp, restore.unit)
+        return merge_hits(hits, self._step)
@@ -0,0 +1,305 @@
+"""UPnP GENA event subscription for Yamaha network receivers."""
+import asyncio
+import logging
+import socket
+import xml.etree.ElementTree as ET
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+from aiohttp import web
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DEFAULT_TIMEOUT,
+    DOMAIN,
+    UPNP_DESCRIPTION_URL,
+    UPNP_RESUBSCRIBE_INTERVAL,
+    UPNP_RESUBSCRIBE_MAX_INTERVAL,
+    UPNP_SUBSCRIPTION_TIMEOUT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_AV_TRANSPORT = "AVTransport"
+SERVICE_RENDERING_CONTROL = "RenderingControl"
+EVENTED_SERVICES = (SERVICE_AV_TRANSPORT, SERVICE_RENDERING_CONTROL)
+
+_DEVICE_NS = "{urn:schemas-upnp-org:device-1-0}"
+_EVENT_NS = "{urn:schemas-upnp-org:event-1-0}"
+
+EventCallback = Callable[[str, Dict[str, str]], Awaitable[None]]
+StateCallback = Callable[[bool], None]
+
+
+def parse_event_urls(description: str, base_url: str) -> Dict[str, str]:
+    """Return {service name: absolute eventSubURL} from a UPnP device description"""
+    urls = {}
+    tree = ET.fromstring(description)
+    for service in tree.iter(f"{_DEVICE_NS}service"):
+        service_type = service.findtext(f"{_DEVICE_NS}serviceType") or ""
+        event_url = service.findtext(f"{_DEVICE_NS}eventSubURL")
+        if not event_url:
+            continue
+        for name in EVENTED_SERVICES:
+            if f":service:{name}:" in service_type:
+                urls[name] = urljoin(base_url, event_url.strip())
+    return urls
+
+
+def parse_notify_body(body: str) -> Dict[str, str]:
+    """Flatten a NOTIFY propertyset (including LastChange) into {variable: value}"""
+    variables = {}
+    tree = ET.fromstring(body)
+    for prop in tree.iter(f"{_EVENT_NS}property"):
+        for var in prop:
+            tag = var.tag.split("}", 1)[-1]
+            if tag == "LastChange" and var.text:
+                try:
+                    event = ET.fromstring(var.text)
+                except ET.ParseError:
+                    continue
+                for instance in event:
+                    for change in instance:
+                        name = change.tag.split("}", 1)[-1]
+                        variables[name] = change.get("val", "")
+            else:
+                variables[tag] = var.text or ""
+    return variables
+
+
+def description_url_for(host: str) -> str:
+    """Device description URL; a host with an explicit port (a stand-in) serves it there"""
+    if urlparse(f"//{host}").port is not None:
+        return f"http://{host}{urlparse(UPNP_DESCRIPTION_URL).path}"
+    return UPNP_DESCRIPTION_URL.format(host)
+
+
+def _local_ip_for(host: str) -> str:
+    """Return the local address used to reach host (no packets are sent)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect((urlparse(f"//{host}").hostname, 1900))
+        return sock.getsockname()[0]
+    finally:
+        sock.close()
+
+
+class UpnpEventListener:
+    """Subscribe to a receiver's AVTransport/RenderingControl events.
+
+    NOTIFY callbacks are served from a small local HTTP server. Subscriptions
+    are renewed at half their granted lifetime; when a renewal fails the
+    listener reports itself inactive so the owner can fall back to polling,
+    and resubscribes from its own task with exponential backoff. A receiver
+    whose description lists no evented services is not asked again.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        session: aiohttp.ClientSession,
+        host: str,
+        on_event: EventCallback,
+        on_state_change: Optional[StateCallback] = None,
+        description_url: Optional[str] = None,
+        callback_host: Optional[str] = None,
+        callback_port: int = 0,
+        subscription_timeout: int = UPNP_SUBSCRIPTION_TIMEOUT,
+    ):
+        self._hass = hass
+        self._session = session
+        self._host = host
+        self._on_event = on_event
+        self._on_state_change = on_state_change
+        self._description_url = description_url or description_url_for(host)
+        self._callback_host = callback_host
+        self._callback_port = callback_port
+        self._subscription_timeout = subscription_timeout
+        self._event_urls: Dict[str, str] = {}
+        self._sids: Dict[str, str] = {}
+        # NOTIFYs that beat the SUBSCRIBE response, per service being subscribed
+        self._early_events: Dict[str, List[Tuple[Optional[str], Dict[str, str]]]] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self._callback_base = None
+        self._renew_task: Optional[asyncio.Task] = None
+        self._retry_task: Optional[asyncio.Task] = None
+        self._active = False
+        self._no_events = False
+        self.events_received = 0
+
+    @property
+    def active(self) -> bool:
+        """True while every evented service has a live subscription"""
+        return self._active
+
+    async def async_start(self) -> bool:
+        """Start the callback server and subscribe; return True on success
+
+        On failure a background task keeps retrying, so the caller (and its
+        polls) never wait on the device description or SUBSCRIBE requests.
+        """
+        if await self._async_subscribe_all():
+            return True
+        self._schedule_retry()
+        return False
+
+    async def async_stop(self) -> None:
+        """Cancel renewals and retries, unsubscribe and stop the callback server"""
+        for task in (self._renew_task, self._retry_task):
+            if task is not None:
+                task.cancel()
+        self._renew_task = self._retry_task = None
+        await self._async_unsubscribe_all()
+        self._set_active(False)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _async_subscribe_all(self) -> bool:
+        try:
+            if self._runner is None:
+                await self._async_start_server()
+            if not self._event_urls:
+                self._event_urls = await self._async_fetch_event_urls()
+            if not self._event_urls:
+                # The description was read; the model has nothing to subscribe to
+                _LOGGER.debug("No evented UPnP services found on %s", self._host)
+                self._no_events = True
+                return False
+            for url in self._event_urls.values():
+                await self._async_subscribe(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ET.ParseError, OSError) as e:
+            _LOGGER.debug("UPnP subscription to %s failed: %s", self._host, e)
+            await self._async_unsubscribe_all()
+            return False
+
+        if self._renew_task is None or self._renew_task.done():
+            self._renew_task = self._hass.async_create_background_task(
+                self._async_renew_loop(), f"{DOMAIN} UPnP renewal {self._host}")
+        self._set_active(True)
+        return True
+
+    def _schedule_retry(self) -> None:
+        if self._no_events or (self._retry_task is not None and not self._retry_task.done()):
+            return
+        self._retry_task = self._hass.async_create_background_task(
+            self._async_retry_loop(), f"{DOMAIN} UPnP resubscribe {self._host}")
+
+    async def _async_retry_loop(self) -> None:
+        """Resubscribe with exponential backoff until it works or there is nothing to subscribe to"""
+        delay = UPNP_RESUBSCRIBE_INTERVAL
+        while not self._no_events:
+            await asyncio.sleep(delay)
+            if await self._async_subscribe_all():
+                return
+            delay = min(delay * 2, UPNP_RESUBSCRIBE_MAX_INTERVAL)
+
+    def _set_active(self, active: bool) -> None:
+        if active == self._active:
+            return
+        self._active = active
+        _LOGGER.debug("UPnP events for %s %s", self._host, "active" if active else "lapsed")
+        if self._on_state_change is not None:
+            self._on_state_change(active)
+
+    async def _async_start_server(self) -> None:
+        app = web.Application()
+        app.router.add_route("NOTIFY", "/{service}", self._handle_notify)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        callback_host = self._callback_host or _local_ip_for(self._host)
+        site = web.TCPSite(runner, callback_host, self._callback_port)
+        await site.start()
+        port = runner.addresses[0][1]
+        self._runner = runner
+        self._callback_base = f"http://{callback_host}:{port}"
+
+    async def _async_fetch_event_urls(self) -> Dict[str, str]:
+        timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+        async with self._session.get(self._description_url, timeout=timeout) as resp:
+            if resp.status != 200:
+                raise aiohttp.ClientError(f"GET {self._description_url} returned {resp.status}")
+            body = await resp.text()
+        parsed = urlparse(self._description_url)
+        return parse_event_urls(body, f"{parsed.scheme}://{parsed.netloc}/")
+
+    async def _async_subscribe(self, url: str, sid: Optional[str] = None) -> str:
+        """Subscribe (or renew sid) and remember the granted SID
+
+        The device sends the initial NOTIFY (SEQ 0) right after answering, so
+        it can arrive before the SID is known; those are held and delivered
+        here once the SID matches.
+        """
+        service = next(name for name, u in self._event_urls.items() if u == url)
+        headers = {"TIMEOUT": f"Second-{self._subscription_timeout}"}
+        if sid:
+            headers["SID"] = sid
+        else:
+            headers["CALLBACK"] = f"<{self._callback_base}/{service}>"
+            headers["NT"] = "upnp:event"
+            self._early_events[service] = []
+        timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+        try:
+            async with self._session.request("SUBSCRIBE", url, headers=headers, timeout=timeout) as resp:
+                if resp.status != 200 or "SID" not in resp.headers:
+                    raise aiohttp.ClientError(f"SUBSCRIBE {url} returned {resp.status}")
+                self._sids[service] = resp.headers["SID"]
+        finally:
+            early = self._early_events.pop(service, []) if not sid else []
+        for early_sid, variables in early:
+            if early_sid == self._sids.get(service):
+                await self._async_deliver(service, variables)
+        return self._sids[service]
+
+    async def _async_unsubscribe_all(self) -> None:
+        timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+        for service, sid in list(self._sids.items()):
+            try:
+                async with self._session.request(
+                    "UNSUBSCRIBE", self._event_urls[service], headers={"SID": sid}, timeout=timeout
+                ):
+                    pass
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+        self._sids.clear()
+
+    async def _async_renew_loop(self) -> None:
+        while True:
+            await asyncio.sleep(max(self._subscription_timeout // 2, 1))
+            try:
+                for service, sid in list(self._sids.items()):
+                    await self._async_subscribe(self._event_urls[service], sid)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # SID may have expired on the device; start over with a fresh one
+                self._sids.clear()
+                try:
+                    for url in self._event_urls.values():
+                        await self._async_subscribe(url)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    _LOGGER.debug("UPnP renewal for %s failed: %s", self._host, e)
+                    self._sids.clear()
+                    self._set_active(False)
+                    self._schedule_retry()
+                    return
+
+    async def _handle_notify(self, request: web.Request) -> web.Response:
+        service = request.match_info["service"]
+        sid = request.headers.get("SID")
+        early = self._early_events.get(service)
+        if early is None and (service not in self._sids or sid != self._sids[service]):
+            return web.Response(status=412)
+        try:
+            variables = parse_notify_body(await request.text())
+        except ET.ParseError:
+            return web.Response(status=400)
+        if early is not None and sid != self._sids.get(service):
+            # SUBSCRIBE still in flight; checked against the SID once it is granted
+            early.append((sid, variables))
+        else:
+            await self._async_deliver(service, variables)
+        return web.Response(status=200)
+
+    async def _async_deliver(self, service: str, variables: Dict[str, str]) -> None:
+        self.events_received += 1
+        await self._on_event(service, variables)
@@ -0,0 +1,33 @@
+"""Bulk state export of all configured receivers for dashboards and monitoring."""
+import time
+
+from aiohttp import web
+from homeassistant.components.http import KEY_HASS, HomeAssistantView
+from homeassistant.const import CONF_NAME
+
+from .const import DOMAIN, STATE_VIEW_URL
+
+
+class YamahaStateView(HomeAssistantView):
+    """GET /api/yamaha_rn301/state: every receiver in one response
+
+    Built only from coordinator data and counters; never contacts a device,
+    so a scrape costs the same whether receivers are up or not.
+    """
+
+    url = STATE_VIEW_URL
+    name = f"api:{DOMAIN}:state"
+    requires_auth = True
+
+    async def get(self, request: web.Request) -> web.Response:
+        hass = request.app[KEY_HASS]
+        receivers = []
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            coordinator = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+            if coordinator is None:
+                continue
+            snapshot = coordinator.as_dict()
+            snapshot["entry_id"] = entry.entry_id
+            snapshot["name"] = entry.data.get(CONF_NAME, entry.title)
+            receivers.append(snapshot)
+        return self.json({"time": time.time(), "receivers": receivers})
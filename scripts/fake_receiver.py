@@ -0,0 +1,396 @@
+"""Minimal YamahaRemoteControl server for soak and load runs without hardware.
+
+Answers the requests the integration sends: System Config, inputs, Tuner
+presets, Basic_Status, Play_Info (with rotating metadata and album art),
+List_Info/List_Control menus for NET RADIO and SERVER, and the power,
+volume, mute, input and playback PUTs. Multi-section GETs are answered in
+one envelope like current firmwares.
+
+It also stands in for the UPnP side on the same port: desc.xml with
+AVTransport and RenderingControl event URLs (none with --no-events),
+SUBSCRIBE/UNSUBSCRIBE, and NOTIFYs for the initial state and for every
+PUT that changes something. The initial NOTIFY is sent before the
+SUBSCRIBE response, the race real receivers can produce.
+
+    python scripts/fake_receiver.py --port 8080
+
+To be found by discovery the way a real unit is (control API on port 80),
+serve it on port 80 of a loopback alias and announce it with fake_ssdp.py:
+
+    python scripts/fake_receiver.py --host 127.0.0.2 --port 80
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import uuid
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+PAGE_SIZE = 8
+
+INPUTS = (
+    ("NET RADIO", "NET RADIO", "NET_RADIO"),
+    ("SERVER", "SERVER", "SERVER"),
+    ("TUNER", "TUNER", "Tuner"),
+    ("OPTICAL", "OPTICAL", ""),
+)
+
+# 1x1 PNG served as album art
+ART = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR4nGNgYGD4DwABBAEAHnOcQAAAAABJRU5ErkJggg==")
+ART_URL = "/YamahaRemoteControl/AlbumART/AlbumART.png"
+
+DESC_URL = "/MediaRenderer/desc.xml"
+EVENT_URL = "/MediaRenderer/event/{service}"
+EVENTED_SERVICES = ("AVTransport", "RenderingControl")
+
+
+def udn_for(host: str) -> str:
+    """Stable device UUID of the fake served at host ("address:port")"""
+    if ":" not in host:
+        host = f"{host}:80"
+    return f"uuid:{uuid.uuid5(uuid.NAMESPACE_URL, host)}"
+
+
+def _menu(prefix: str, width: int, depth: int):
+    """Nested menu: width entries per level, folders down to depth, then playable items"""
+    if depth == 0:
+        return {f"{prefix} {i}": None for i in range(1, width + 1)}
+    return {f"{prefix} {i}": _menu(f"{prefix} {i}.", width, depth - 1) for i in range(1, width + 1)}
+
+
+class ListState:
+    """Menu cursor of one List_Info section"""
+
+    def __init__(self, title: str, tree: dict):
+        self.title = title
+        self.tree = tree
+        self.stack: List[str] = []
+        self.line = 1
+        self.playing: Optional[str] = None
+
+    def node(self) -> dict:
+        node = self.tree
+        for key in self.stack:
+            node = node[key]
+        return node
+
+    def list_info(self) -> str:
+        node = self.node()
+        keys = list(node)
+        start = (self.line - 1) // PAGE_SIZE * PAGE_SIZE
+        lines = "".join(
+            f"<Line_{i + 1}><Txt>{_escape(key)}</Txt>"
+            f"<Attribute>{'Container' if node[key] is not None else 'Item'}</Attribute></Line_{i + 1}>"
+            for i, key in enumerate(keys[start:start + PAGE_SIZE]))
+        name = self.stack[-1] if self.stack else self.title
+        return (f"<List_Info><Menu_Status>Ready</Menu_Status><Menu_Layer>{len(self.stack) + 1}</Menu_Layer>"
+                f"<Menu_Name>{_escape(name)}</Menu_Name><Current_List>{lines}</Current_List>"
+                f"<Cursor_Position><Current_Line>{self.line}</Current_Line>"
+                f"<Max_Line>{len(keys)}</Max_Line></Cursor_Position></List_Info>")
+
+    def control(self, control: ET.Element) -> bool:
+        node = self.node()
+        keys = list(node)
+        selected = control.findtext("Direct_Sel")
+        if selected:
+            index = (self.line - 1) // PAGE_SIZE * PAGE_SIZE + int(selected[len("Line_"):]) - 1
+            if not 0 <= index < len(keys):
+                return False
+            key = keys[index]
+            if node[key] is None:
+                self.playing = key
+            else:
+                self.stack.append(key)
+                self.line = 1
+            return True
+        jump = control.findtext("Jump_Line")
+        if jump:
+            self.line = max(1, min(int(jump), len(keys) or 1))
+            return True
+        if control.findtext("Cursor") == "Return":
+            if self.stack:
+                self.stack.pop()
+            self.line = 1
+            return True
+        return False
+
+
+def _evented_service(section: ET.Element) -> Optional[str]:
+    """UPnP service whose state a successful PUT changes"""
+    node = section[0] if len(section) else None
+    if node is None:
+        return None
+    if node.tag in ("Power_Control", "Volume"):
+        return "RenderingControl"
+    if node.tag in ("Input", "Play_Control", "List_Control"):
+        return "AVTransport"
+    return None
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class FakeReceiver:
+    """State and request handling of one fake R-N301"""
+
+    _serials = itertools.count()
+
+    def __init__(self, latency: float = 0.0, track_every: int = 5, events: bool = True):
+        self.latency = latency
+        # Distinct per instance, so several fakes are several devices to the config flow
+        self.system_id = f"0FAKE{next(self._serials):03d}"
+        self.events = events
+        # SID -> (service, callback URL, next SEQ)
+        self.subscriptions: Dict[str, Tuple[str, str, int]] = {}
+        self._sids = itertools.count(1)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.notifies = 0
+        # Play_Info metadata changes every track_every Play_Info requests
+        self._track_every = track_every
+        self._play_info_requests = itertools.count()
+        self.power = True
+        self.volume = 40
+        self.muted = False
+        self.input = "NET RADIO"
+        self.playback = "Play"
+        self.preset = 1
+        self.lists = {
+            "NET_RADIO": ListState("NET RADIO", {
+                "Bookmarks": {f"Station {i}": None for i in range(1, 30)},
+                "Locations": _menu("Region", 4, 2),
+            }),
+            "SERVER": ListState("Server", {
+                "NAS": {"Music": _menu("Album", 12, 1), "Playlists": _menu("List", 20, 0)},
+            }),
+        }
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/YamahaRemoteControl/ctrl", self._handle_ctrl)
+        app.router.add_get(ART_URL, self._handle_art)
+        app.router.add_get(DESC_URL, self._handle_desc)
+        app.router.add_route("SUBSCRIBE", EVENT_URL, self._handle_subscribe)
+        app.router.add_route("UNSUBSCRIBE", EVENT_URL, self._handle_unsubscribe)
+        app.on_cleanup.append(self._async_close)
+        return app
+
+    async def _async_close(self, _app) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    async def _handle_desc(self, request: web.Request) -> web.Response:
+        services = "".join(
+            f"<service><serviceType>urn:schemas-upnp-org:service:{service}:1</serviceType>"
+            f"<eventSubURL>{EVENT_URL.format(service=service)}</eventSubURL></service>"
+            for service in (EVENTED_SERVICES if self.events else ()))
+        return web.Response(
+            text=('<root xmlns="urn:schemas-upnp-org:device-1-0"><device>'
+                  "<deviceType>urn:schemas-upnp-org:device:MediaRenderer:1</deviceType>"
+                  "<friendlyName>Fake R-N301</friendlyName><manufacturer>Yamaha Corporation</manufacturer>"
+                  f"<modelName>R-N301</modelName><UDN>{udn_for(request.host)}</UDN>"
+                  f"<serviceList>{services}</serviceList>"
+                  "</device></root>"),
+            content_type="text/xml")
+
+    async def _handle_subscribe(self, request: web.Request) -> web.Response:
+        service = request.match_info["service"]
+        if not self.events or service not in EVENTED_SERVICES:
+            return web.Response(status=404)
+        timeout = request.headers.get("TIMEOUT", "Second-1800")
+        sid = request.headers.get("SID")
+        if sid:
+            return web.Response(status=200 if sid in self.subscriptions else 412,
+                                headers={"SID": sid, "TIMEOUT": timeout})
+        callback = request.headers.get("CALLBACK", "").strip("<>")
+        if not callback or request.headers.get("NT") != "upnp:event":
+            return web.Response(status=412)
+        sid = f"uuid:fake-{next(self._sids)}"
+        self.subscriptions[sid] = (service, callback, 0)
+        asyncio.ensure_future(self._async_notify(sid))
+        # Let the initial NOTIFY go out ahead of this response
+        await asyncio.sleep(0.01)
+        return web.Response(status=200, headers={"SID": sid, "TIMEOUT": timeout})
+
+    async def _handle_unsubscribe(self, request: web.Request) -> web.Response:
+        found = self.subscriptions.pop(request.headers.get("SID", ""), None)
+        return web.Response(status=200 if found else 412)
+
+    def _notify_changed(self, service: str) -> None:
+        for sid, (subscribed, _callback, _seq) in list(self.subscriptions.items()):
+            if subscribed == service:
+                asyncio.ensure_future(self._async_notify(sid))
+
+    async def _async_notify(self, sid: str) -> None:
+        if sid not in self.subscriptions:
+            return
+        service, callback, seq = self.subscriptions[sid]
+        self.subscriptions[sid] = (service, callback, seq + 1)
+        if service == "RenderingControl":
+            changes = (f'<Volume channel="Master" val="{self.volume}"/>'
+                       f'<Mute channel="Master" val="{int(self.muted)}"/>')
+        else:
+            state = "PLAYING" if self.power and self.playback == "Play" else "STOPPED"
+            changes = f'<TransportState val="{state}"/>'
+        last_change = _escape(f'<Event><InstanceID val="0">{changes}</InstanceID></Event>')
+        body = ('<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0"><e:property>'
+                f"<LastChange>{last_change}</LastChange></e:property></e:propertyset>")
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        try:
+            async with self._session.request(
+                "NOTIFY", callback, data=body,
+                headers={"NT": "upnp:event", "NTS": "upnp:propchange", "SID": sid, "SEQ": str(seq),
+                         "Content-Type": 'text/xml; charset="utf-8"'},
+                timeout=aiohttp.ClientTimeout(total=5),
+            ) as resp:
+                if resp.status == 412:
+                    # Subscriber no longer knows the SID
+                    self.subscriptions.pop(sid, None)
+            self.notifies += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+
+    async def _handle_art(self, request: web.Request) -> web.Response:
+        if request.headers.get("If-None-Match") == '"art"':
+            return web.Response(status=304)
+        return web.Response(body=ART, content_type="image/png", headers={"ETag": '"art"'})
+
+    async def _handle_ctrl(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        root = ET.fromstring(await request.text())
+        if root.get("cmd") == "GET":
+            body = "".join(self._get(section) for section in root)
+            rc = "0"
+        else:
+            body = ""
+            changed = [section for section in root if self._put(section)]
+            rc = "0" if len(changed) == len(root) else "3"
+            for service in {_evented_service(section) for section in changed} - {None}:
+                self._notify_changed(service)
+        return web.Response(text=f'<YAMAHA_AV rsp="{root.get("cmd")}" RC="{rc}">{body}</YAMAHA_AV>',
+                            content_type="text/xml")
+
+    def _get(self, section: ET.Element) -> str:
+        tag = section.tag
+        inner = section[0] if len(section) else None
+        what = inner.tag if inner is not None else None
+        if tag == "System" and what == "Config":
+            body = (f"<Config><Model_Name>R-N301</Model_Name><System_ID>{self.system_id}</System_ID>"
+                    "<Version>1.00</Version><Feature_Existence><Main_Zone>1</Main_Zone><Tuner>1</Tuner>"
+                    "<NET_RADIO>1</NET_RADIO><SERVER>1</SERVER></Feature_Existence></Config>")
+        elif what == "Input":
+            items = "".join(
+                f"<Item_{i}><Param>{param}</Param><Title>{title}</Title><Src_Name>{src}</Src_Name></Item_{i}>"
+                for i, (param, title, src) in enumerate(INPUTS, 1))
+            body = f"<Input><Input_Sel_Item>{items}</Input_Sel_Item></Input>"
+        elif what == "Basic_Status":
+            src = next((item[2] for item in INPUTS if item[0] == self.input), "")
+            body = (f"<Basic_Status><Power_Control><Power>{'On' if self.power else 'Standby'}</Power></Power_Control>"
+                    f"<Volume><Lvl><Val>{self.volume}</Val><Exp>0</Exp><Unit></Unit></Lvl>"
+                    f"<Mute>{'On' if self.muted else 'Off'}</Mute></Volume>"
+                    f"<Input><Input_Sel>{self.input}</Input_Sel>"
+                    f"<Input_Sel_Item_Info><Src_Name>{src}</Src_Name></Input_Sel_Item_Info></Input></Basic_Status>")
+        elif what == "Play_Control" and tag == "Tuner":
+            items = "".join(f"<Item_{i}><Param>{i}</Param><Title>Preset {i}</Title></Item_{i}>" for i in range(1, 9))
+            body = f"<Play_Control><Preset><Preset_Sel_Item>{items}</Preset_Sel_Item></Preset></Play_Control>"
+        elif what == "Play_Info":
+            body = self._play_info(tag)
+        elif what == "List_Info" and tag in self.lists:
+            body = self.lists[tag].list_info()
+        else:
+            body = f"<{what}></{what}>" if what else ""
+        return f"<{tag}>{body}</{tag}>"
+
+    def _play_info(self, tag: str) -> str:
+        if tag == "Tuner":
+            return (f"<Play_Info><Signal_Info><Tuned>Assert</Tuned></Signal_Info>"
+                    f"<Tuning><Band>FM</Band><Freq><Current><Val>{8750 + self.preset * 100}</Val>"
+                    f"<Exp>2</Exp><Unit>MHz</Unit></Current></Freq></Tuning>"
+                    f"<Preset><Preset_Sel>{self.preset}</Preset_Sel></Preset>"
+                    f"<Meta_Info><Program_Service>FAKE FM</Program_Service>"
+                    f"<Radio_Text_A>Song {self.preset}</Radio_Text_A></Meta_Info></Play_Info>")
+        track = next(self._play_info_requests) // self._track_every
+        playing = self.lists[tag].playing if tag in self.lists else None
+        if tag == "NET_RADIO":
+            # The selected station, with the song it is on
+            meta = (f"<Station>{_escape(playing or 'Station')}</Station><Album>Album</Album>"
+                    f"<Song>Song {track}</Song>")
+        else:
+            meta = (f"<Artist>Artist {track % 50}</Artist><Album>Album {track // 10}</Album>"
+                    f"<Song>{_escape(playing or f'Song {track}')}</Song>")
+        return (f"<Play_Info><Playback_Info>{self.playback}</Playback_Info>"
+                f"<Meta_Info>{meta}</Meta_Info><Play_Time>{track % 300}</Play_Time>"
+                f"<Album_ART><URL>{ART_URL}</URL><ID>{track % 20}</ID><Format>PNG</Format></Album_ART>"
+                f"</Play_Info>")
+
+    def _put(self, section: ET.Element) -> bool:
+        tag = section.tag
+        node = section[0] if len(section) else None
+        if node is None:
+            return False
+        if node.tag == "Power_Control":
+            self.power = node.findtext("Power") == "On"
+        elif node.tag == "Volume":
+            if node.findtext("Lvl/Val") is not None:
+                self.volume = int(node.findtext("Lvl/Val"))
+            if node.findtext("Mute") is not None:
+                self.muted = node.findtext("Mute") == "On"
+        elif node.tag == "Input":
+            param = node.findtext("Input_Sel")
+            if param not in {item[0] for item in INPUTS}:
+                return False
+            self.input = param
+        elif node.tag == "List_Control" and tag in self.lists:
+            return self.lists[tag].control(node)
+        elif node.tag == "Play_Control":
+            if node.findtext("Playback"):
+                self.playback = node.findtext("Playback")
+            elif node.findtext("Preset/Preset_Sel"):
+                self.preset = int(node.findtext("Preset/Preset_Sel"))
+        else:
+            return False
+        return True
+
+
+async def async_start(port: int = 0, latency: float = 0.0, events: bool = True,
+                      address: str = "127.0.0.1") -> "tuple[FakeReceiver, web.AppRunner, str]":
+    """Serve a FakeReceiver on address; returns (receiver, runner, "address:port")"""
+    receiver = FakeReceiver(latency, events=events)
+    runner = web.AppRunner(receiver.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, address, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return receiver, runner, f"{address}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--no-events", action="store_true", help="describe no evented UPnP services")
+    args = parser.parse_args()
+
+    async def serve():
+        _receiver, _runner, host = await async_start(args.port, args.latency, not args.no_events, args.host)
+        print(f"Fake receiver on http://{host}/YamahaRemoteControl/ctrl")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""SSDP stand-in announcing fake receivers as Yamaha MediaRenderers.
+
+Answers M-SEARCH requests for the MediaRenderer device type (and
+ssdp:all / upnp:rootdevice) with one response per receiver, and sends
+ssdp:alive NOTIFYs on start and every --interval seconds, so both the
+setup form's scan step and Home Assistant's SSDP discovery find them.
+LOCATION points at the fake_receiver.py desc.xml of each receiver.
+
+The integration probes the control API on port 80 of the announced
+address, so run the fakes there, one loopback alias each:
+
+    python scripts/fake_receiver.py --host 127.0.0.2 --port 80 &
+    python scripts/fake_receiver.py --host 127.0.0.3 --port 80 &
+    python scripts/fake_ssdp.py 127.0.0.2:80 127.0.0.3:80
+
+The default port 1900 also receives multicast M-SEARCHes; with --port
+another value only unicast searches sent to that port are answered.
+"""
+import argparse
+import asyncio
+import logging
+import socket
+import struct
+from typing import List, Optional, Tuple
+
+import fake_receiver
+
+_LOGGER = logging.getLogger("fake_ssdp")
+
+SSDP_GROUP = "239.255.255.250"
+SSDP_PORT = 1900
+DEVICE_TYPE = "urn:schemas-upnp-org:device:MediaRenderer:1"
+SEARCH_TARGETS = (DEVICE_TYPE, "ssdp:all", "upnp:rootdevice")
+MAX_AGE = 1800
+
+
+def _location(host: str) -> str:
+    return f"http://{host}{fake_receiver.DESC_URL}"
+
+
+def _parse(data: bytes) -> Tuple[str, dict]:
+    lines = data.decode("utf-8", "replace").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        key, sep, value = line.partition(":")
+        if sep:
+            headers[key.strip().upper()] = value.strip()
+    return lines[0], headers
+
+
+class SsdpResponder(asyncio.DatagramProtocol):
+    """Answer M-SEARCH for every announced receiver"""
+
+    def __init__(self, hosts: List[str]):
+        self.hosts = hosts
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.searches = 0
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        request_line, headers = _parse(data)
+        if not request_line.startswith("M-SEARCH") or headers.get("MAN", "").strip('"') != "ssdp:discover":
+            return
+        target = headers.get("ST", "")
+        if target not in SEARCH_TARGETS:
+            return
+        self.searches += 1
+        _LOGGER.debug("M-SEARCH %s from %s:%s", target, *addr)
+        for host in self.hosts:
+            self.transport.sendto(self._response(host, target), addr)
+
+    def _response(self, host: str, target: str) -> bytes:
+        st = DEVICE_TYPE if target == "ssdp:all" else target
+        return "\r\n".join([
+            "HTTP/1.1 200 OK",
+            f"CACHE-CONTROL: max-age={MAX_AGE}",
+            "EXT:",
+            f"LOCATION: {_location(host)}",
+            "SERVER: Linux/2.6 UPnP/1.0 fake_ssdp/1.0",
+            f"ST: {st}",
+            f"USN: {fake_receiver.udn_for(host)}::{st}",
+            "", "",
+        ]).encode()
+
+    def announce(self) -> None:
+        """Multicast ssdp:alive for every receiver"""
+        for host in self.hosts:
+            message = "\r\n".join([
+                "NOTIFY * HTTP/1.1",
+                f"HOST: {SSDP_GROUP}:{SSDP_PORT}",
+                f"CACHE-CONTROL: max-age={MAX_AGE}",
+                f"LOCATION: {_location(host)}",
+                f"NT: {DEVICE_TYPE}",
+                "NTS: ssdp:alive",
+                "SERVER: Linux/2.6 UPnP/1.0 fake_ssdp/1.0",
+                f"USN: {fake_receiver.udn_for(host)}::{DEVICE_TYPE}",
+                "", "",
+            ]).encode()
+            self.transport.sendto(message, (SSDP_GROUP, SSDP_PORT))
+
+
+def _socket(address: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((address, port))
+    if port == SSDP_PORT:
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                            struct.pack("4s4s", socket.inet_aton(SSDP_GROUP), socket.inet_aton("0.0.0.0")))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        except OSError as e:
+            # No multicast route (containers); unicast searches still work
+            _LOGGER.warning("Not joining %s: %s", SSDP_GROUP, e)
+    sock.setblocking(False)
+    return sock
+
+
+async def async_start(hosts: List[str], port: int = SSDP_PORT,
+                      address: str = "0.0.0.0") -> Tuple[asyncio.DatagramTransport, SsdpResponder]:
+    """Answer searches on address:port; returns (transport, responder)"""
+    loop = asyncio.get_running_loop()
+    return await loop.create_datagram_endpoint(lambda: SsdpResponder(hosts), sock=_socket(address, port))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("hosts", nargs="+", help='receivers to announce, "address:port" of fake_receiver.py')
+    parser.add_argument("--port", type=int, default=SSDP_PORT)
+    parser.add_argument("--interval", type=float, default=60, help="seconds between ssdp:alive announcements")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    async def serve():
+        transport, responder = await async_start(args.hosts, args.port)
+        print(f"Answering SSDP searches on port {args.port} for {', '.join(args.hosts)}")
+        try:
+            while True:
+                try:
+                    responder.announce()
+                except OSError as e:
+                    _LOGGER.debug("ssdp:alive not sent: %s", e)
+                await asyncio.sleep(args.interval)
+        finally:
+            transport.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
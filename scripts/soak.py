@@ -0,0 +1,368 @@
+"""Soak run of the integration against fake receivers, watching for leaks and event loop lag.
+
+Bootstraps a throwaway Home Assistant instance (2024.3 or later) the way
+`hass -c` does, with the integration set up from YAML against
+scripts/fake_receiver.py. Polls run
+at an accelerated interval while browse walks and command bursts keep the
+navigators, the artwork cache and the entities busy. Samples traced memory,
+Python object counts and event loop lag, fits a line through the samples
+taken after warm-up, and exits 1 when memory, the integration's own objects
+or lag keep growing.
+
+    python scripts/soak.py --duration 3600 --receivers 4 --poll-interval 0.05
+
+At --poll-interval 0.05 every wall-clock minute is about 3.3 hours of the
+default 10 s polling.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import timedelta
+from typing import List, NamedTuple, Optional, Sequence
+
+from homeassistant import bootstrap, core, runner
+from homeassistant.components.media_player import MediaPlayerEntityFeature
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_receiver  # noqa: E402
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOMAIN = "yamaha_rn301"
+PACKAGE = f"custom_components.{DOMAIN}"
+# Poll interval the accelerated run stands in for (const.DEFAULT_SCAN_INTERVAL)
+REAL_POLL_INTERVAL = 10
+
+_LOGGER = logging.getLogger("soak")
+
+
+class Sample(NamedTuple):
+    elapsed: float         # seconds since start
+    polls: int             # polls of all receivers so far
+    traced_bytes: int      # tracemalloc current size
+    objects: int           # gc-tracked objects
+    package_objects: int   # instances of classes defined by the integration
+    lag_max_ms: float      # worst event loop lag since the previous sample
+    lag_avg_ms: float
+
+
+class LagMonitor:
+    """Measure how late a short sleep wakes up: time the event loop was busy elsewhere"""
+
+    def __init__(self, interval: float = 0.02):
+        self._interval = interval
+        self._lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            self._lags.append(max(0.0, time.perf_counter() - start - self._interval))
+
+    def collect(self):
+        """(max, mean) lag in ms since the last call"""
+        lags, self._lags = self._lags, []
+        if not lags:
+            return 0.0, 0.0
+        return max(lags) * 1000, sum(lags) / len(lags) * 1000
+
+
+def package_object_counts() -> Counter:
+    counts = Counter()
+    for obj in gc.get_objects():
+        cls = type(obj)
+        # Some extension types expose __module__ as a descriptor, not a str
+        module = cls.__dict__.get("__module__")
+        if isinstance(module, str) and module.startswith(PACKAGE):
+            counts[cls.__qualname__] += 1
+    return counts
+
+
+def slope(xs: Sequence[float], ys: Sequence[float]) -> float:
+    """Least-squares slope of ys over xs"""
+    n = len(xs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var = sum((x - mean_x) ** 2 for x in xs)
+    if not var:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def async_start_hass(config_dir: str, hosts: Sequence[str]) -> core.HomeAssistant:
+    """Bootstrap a full instance (config entries, auth, storage) from a generated configuration.yaml"""
+    os.symlink(os.path.join(REPO, "custom_components"), os.path.join(config_dir, "custom_components"))
+    config = {
+        "http": {"server_host": ["127.0.0.1"], "server_port": _free_port()},
+        "media_player": [
+            {"platform": DOMAIN, "host": host, "name": f"Soak {index}"} for index, host in enumerate(hosts)
+        ],
+    }
+    with open(os.path.join(config_dir, "configuration.yaml"), "w", encoding="utf-8") as file:
+        json.dump(config, file)   # JSON is valid YAML
+    hass = await bootstrap.async_setup_hass(
+        runner.RuntimeConfig(config_dir=config_dir, log_no_color=True))
+    if hass is None:
+        raise RuntimeError(f"Home Assistant did not start, see {config_dir}/home-assistant.log")
+    await hass.async_start()
+    # Bootstrap installs its own logging; keep the soak report readable
+    logging.getLogger("homeassistant").setLevel(logging.WARNING)
+    _LOGGER.setLevel(logging.INFO)
+    return hass
+
+
+class Workload:
+    """Browse walks and command bursts against every main zone entity"""
+
+    def __init__(self, hass: core.HomeAssistant, entities, args):
+        self._hass = hass
+        self._entities = entities
+        self._args = args
+        self._random = random.Random(args.seed)
+        self.browses = 0
+        self.commands = 0
+        self.errors = 0
+
+    async def _call(self, service: str, entity, **data) -> None:
+        self.commands += 1
+        try:
+            await self._hass.services.async_call(
+                "media_player", service, {"entity_id": entity.entity_id, **data}, blocking=True)
+        except Exception:  # keep soaking; the count shows up in the report
+            self.errors += 1
+            _LOGGER.debug("%s on %s failed", service, entity.entity_id, exc_info=True)
+
+    async def _walk(self, entity, source: str) -> None:
+        """Random descent through the source's menus, sometimes playing what it ends on"""
+        await self._call("select_source", entity, source=source)
+        # The entity follows the input on the (debounced) refresh, as the frontend does
+        for _ in range(50):
+            if entity.source == source:
+                break
+            await asyncio.sleep(0.1)
+        else:
+            self.errors += 1
+            return
+        content_id = None
+        for _ in range(self._random.randint(1, 5)):
+            self.browses += 1
+            media = await entity.async_browse_media(None, content_id)
+            if media is None:
+                self.errors += 1
+                return
+            children = [child for child in media.children or () if child.can_expand or child.can_play]
+            if not children:
+                return
+            child = self._random.choice(children)
+            if child.can_play:
+                await self._call("play_media", entity, media_content_type=child.media_content_type,
+                                 media_content_id=child.media_content_id)
+                return
+            content_id = child.media_content_id
+
+    async def _burst(self, entity) -> None:
+        calls = []
+        for _ in range(self._args.burst_size):
+            choice = self._random.random()
+            if 0.6 <= choice < 0.8:
+                calls.append(self._call("volume_mute", entity, is_volume_muted=self._random.random() < 0.5))
+            elif choice >= 0.8 and entity.supported_features & MediaPlayerEntityFeature.PAUSE:
+                # Only sources with transport controls (Server); Net Radio has none
+                calls.append(self._call("media_play_pause", entity))
+            else:
+                calls.append(self._call("volume_set", entity, volume_level=round(self._random.random(), 2)))
+        await asyncio.gather(*calls)
+
+    async def async_run(self) -> None:
+        while True:
+            for entity in self._entities:
+                await self._walk(entity, self._random.choice(("Net Radio", "Server")))
+                await self._burst(entity)
+            if self._random.random() < 0.1:
+                # Occasionally a source without lists, leaving the menus elsewhere
+                await asyncio.gather(*(self._call("select_source", entity, source="Tuner")
+                                       for entity in self._entities))
+            await asyncio.sleep(self._args.workload_interval)
+
+
+async def async_soak(args) -> int:
+    tracemalloc.start(args.traceback_depth)
+    config_dir = tempfile.mkdtemp(prefix="yamaha_soak_")
+    runners = []
+    hass = None
+    try:
+        hosts = []
+        fakes = []
+        for _ in range(args.receivers):
+            fake, runner, host = await fake_receiver.async_start(latency=args.latency)
+            fakes.append(fake)
+            runners.append(runner)
+            hosts.append(host)
+        hass = await async_start_hass(config_dir, hosts)
+
+        from custom_components.yamaha_rn301.const import DATA_ZONE_ENTITIES
+        deadline = time.monotonic() + 30
+        while len(hass.data.get(DATA_ZONE_ENTITIES, {})) < args.receivers:
+            if time.monotonic() > deadline:
+                _LOGGER.error("Entities did not come up")
+                return 2
+            await asyncio.sleep(0.1)
+        entities = list(hass.data[DATA_ZONE_ENTITIES].values())
+        coordinators = {id(entity.coordinator): entity.coordinator for entity in entities}.values()
+        for coordinator in coordinators:
+            coordinator.update_interval = timedelta(seconds=args.poll_interval)
+
+        lag = LagMonitor()
+        lag.start()
+        workload = Workload(hass, entities, args)
+        workload_task = hass.loop.create_task(workload.async_run())
+
+        start = time.monotonic()
+        warmup_end = start + args.duration * args.warmup
+        samples: List[Sample] = []
+        baseline = None
+        while time.monotonic() - start < args.duration:
+            await asyncio.sleep(args.sample_interval)
+            if workload_task.done():
+                workload_task.result()
+            gc.collect()
+            lag_max, lag_avg = lag.collect()
+            packages = package_object_counts()
+            polls = sum(coordinator.polls for coordinator in coordinators)
+            sample = Sample(time.monotonic() - start, polls, tracemalloc.get_traced_memory()[0],
+                            len(gc.get_objects()), sum(packages.values()), lag_max, lag_avg)
+            samples.append(sample)
+            if baseline is None and time.monotonic() >= warmup_end:
+                baseline = (tracemalloc.take_snapshot(), packages)
+            _LOGGER.info(
+                "%6.0fs polls=%d (~%.1f h) traced=%.1f MB objects=%d integration=%d lag max=%.1f ms avg=%.2f ms",
+                sample.elapsed, polls, polls * REAL_POLL_INTERVAL / 3600 / args.receivers,
+                sample.traced_bytes / 1e6, sample.objects, sample.package_objects, lag_max, lag_avg)
+
+        workload_task.cancel()
+        lag.stop()
+        for coordinator in coordinators:
+            # Stop the accelerated polls before Home Assistant closes the shared session
+            await coordinator.async_shutdown()
+        # and let polls already in flight finish before the report blocks the loop
+        await hass.async_block_till_done()
+        return report(args, samples, baseline, workload, fakes)
+    finally:
+        if hass is not None:
+            await hass.async_stop()
+        for site in runners:
+            await site.cleanup()
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+
+def report(args, samples: List[Sample], baseline, workload: Workload, fakes) -> int:
+    steady = [sample for sample in samples if sample.elapsed >= args.duration * args.warmup]
+    if len(steady) < 5:
+        _LOGGER.error("Only %d samples after warm-up; run longer or sample more often", len(steady))
+        return 2
+    polls = [sample.polls for sample in steady]
+    times = [sample.elapsed for sample in steady]
+    span = times[-1] - times[0]
+    # Leaks grow with work done, so memory and objects are judged per 1000 polls
+    memory_growth = slope(polls, [sample.traced_bytes for sample in steady]) * 1000
+    object_growth = slope(polls, [sample.package_objects for sample in steady]) * 1000
+    lag_growth = slope(times, [sample.lag_max_ms for sample in steady]) * span
+    failures = []
+    if memory_growth > args.max_memory_growth * 1024:
+        failures.append(f"memory grows {memory_growth / 1024:.1f} KiB per 1000 polls")
+    if object_growth > args.max_object_growth:
+        failures.append(f"integration objects grow {object_growth:.1f} per 1000 polls")
+    if lag_growth > args.max_lag_growth:
+        failures.append(f"worst loop lag grew {lag_growth:.1f} ms over the run")
+
+    if baseline is not None:
+        snapshot, packages = baseline
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")]
+        stats = tracemalloc.take_snapshot().filter_traces(filters).compare_to(
+            snapshot.filter_traces(filters), "lineno")
+        _LOGGER.info("Largest allocation growth since warm-up:")
+        for stat in stats[:args.top]:
+            _LOGGER.info("  %s", stat)
+        grown = package_object_counts()
+        grown.subtract(packages)
+        for name, delta in grown.most_common(args.top):
+            if delta > 0:
+                _LOGGER.info("  %s: +%d", name, delta)
+
+    result = {
+        "duration_s": round(samples[-1].elapsed, 1),
+        "receivers": args.receivers,
+        "polls": samples[-1].polls,
+        "simulated_hours": round(samples[-1].polls * REAL_POLL_INTERVAL / 3600 / args.receivers, 1),
+        "browses": workload.browses,
+        "commands": workload.commands,
+        "errors": workload.errors,
+        "device_requests": sum(fake.requests for fake in fakes),
+        "memory_growth_kib_per_1000_polls": round(memory_growth / 1024, 2),
+        "object_growth_per_1000_polls": round(object_growth, 2),
+        "lag_growth_ms": round(lag_growth, 2),
+        "lag_max_ms": round(max(sample.lag_max_ms for sample in samples), 2),
+        "failures": failures,
+        "samples": [sample._asdict() for sample in samples],
+    }
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+    summary = {key: value for key, value in result.items() if key != "samples"}
+    print(json.dumps(summary, indent=2))
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=1800, help="seconds to run")
+    parser.add_argument("--receivers", type=int, default=2)
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="accelerated poll interval (s)")
+    parser.add_argument("--latency", type=float, default=0.005, help="fake receiver response delay (s)")
+    parser.add_argument("--workload-interval", type=float, default=0.5,
+                        help="pause between browse/command rounds (s)")
+    parser.add_argument("--burst-size", type=int, default=5, help="concurrent commands per burst")
+    parser.add_argument("--sample-interval", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=0.2, help="fraction of the run ignored for trends")
+    parser.add_argument("--max-memory-growth", type=float, default=64, help="KiB per 1000 polls")
+    parser.add_argument("--max-object-growth", type=float, default=20, help="integration objects per 1000 polls")
+    parser.add_argument("--max-lag-growth", type=float, default=20, help="ms over the run")
+    parser.add_argument("--traceback-depth", type=int, default=1)
+    parser.add_argument("--top", type=int, default=15, help="allocation sites to list")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--report", help="write samples and verdict as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(name)s %(message)s")
+    if not args.verbose:
+        logging.getLogger("homeassistant").setLevel(logging.WARNING)
+    sys.exit(asyncio.run(async_soak(args)))
+
+
+if __name__ == "__main__":
+    main()